@@ -1,45 +1,70 @@
 # backend/app/config/chroma.py
 
+import os
+
+# Must be set before chromadb is imported: its Settings read these at import/startup
+os.environ.setdefault('ANONYMIZED_TELEMETRY', 'False')
+os.environ.setdefault('CHROMA_TELEMETRY', 'False')
+
 import chromadb
 from chromadb.config import Settings
+from chromadb.telemetry.product import ProductTelemetryClient, ProductTelemetryEvent
+from overrides import override
+import logging
+import threading
 import warnings
-import os
 
-os.environ['ANONYMIZED_TELEMETRY'] = 'False'
 warnings.filterwarnings('ignore', message='.*telemetry.*')
 warnings.filterwarnings('ignore', message='.*capture.*')
 
+logger = logging.getLogger(__name__)
+
+CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", "./chroma_data")
+
+
+class NoopProductTelemetry(ProductTelemetryClient):
+    """Telemetry client that drops every event, so posthog is never imported."""
+    
+    @override
+    def capture(self, event: ProductTelemetryEvent) -> None:
+        pass
+
+
+_chroma_settings = Settings(
+    anonymized_telemetry=False,  # Disable telemetry
+    chroma_product_telemetry_impl="app.config.chroma.NoopProductTelemetry",
+    chroma_telemetry_impl="app.config.chroma.NoopProductTelemetry",
+    allow_reset=True
+)
 _chroma_client = None
+_chroma_lock = threading.Lock()
 
 def get_chroma_client():
     """
     Get or create ChromaDB client singleton.
+    Thread-safe: concurrent first calls share a single client.
     """
     global _chroma_client
     
-    if _chroma_client is None:
-        try:
-            # Use persistent client with local storage
-            _chroma_client = chromadb.PersistentClient(
-                path="./chroma_data",
-                settings=Settings(
-                    anonymized_telemetry=False,  # Disable telemetry
-                    allow_reset=True
-                )
-            )
-            print("✅ ChromaDB client initialized (persistent)")
-        except Exception as e:
-            print(f"⚠️  ChromaDB initialization failed: {e}")
-            # Fallback to ephemeral client
+    if _chroma_client is not None:
+        return _chroma_client
+    
+    with _chroma_lock:
+        if _chroma_client is None:
             try:
-                _chroma_client = chromadb.Client(
-                    Settings(
-                        anonymized_telemetry=False,
-                        is_persistent=False
-                    )
+                # Use persistent client with local storage
+                _chroma_client = chromadb.PersistentClient(
+                    path=CHROMA_PERSIST_DIR,
+                    settings=_chroma_settings
                 )
-                print("⚠️  Using ephemeral ChromaDB client (data won't persist)")
-            except:
-                _chroma_client = None
+                logger.info("✅ ChromaDB client initialized (persistent)")
+            except Exception as e:
+                logger.warning("⚠️  ChromaDB initialization failed: %s", e)
+                # Fallback to ephemeral client
+                try:
+                    _chroma_client = chromadb.EphemeralClient(settings=_chroma_settings)
+                    logger.warning("⚠️  Using ephemeral ChromaDB client (data won't persist)")
+                except:
+                    _chroma_client = None
     
     return _chroma_client
\ No newline at end of file
@@ -0,0 +1,32 @@
+# backend/app/config/logging_config.py
+
+import logging
+import logging.handlers
+import os
+import queue
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Records are handed to a queue on the calling thread; the listener thread
+# does the actual (blocking) stream writes.
+_log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+
+_stream_handler = logging.StreamHandler()
+_stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+log_listener = logging.handlers.QueueListener(_log_queue, _stream_handler, respect_handler_level=True)
+
+
+def setup_logging() -> None:
+    """
+    Route the root logger through a QueueHandler. Safe to call more than once.
+    Records logged before log_listener.start() are buffered, not lost.
+    """
+    root = logging.getLogger()
+    if any(isinstance(h, logging.handlers.QueueHandler) for h in root.handlers):
+        return
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(logging.handlers.QueueHandler(_log_queue))
+
+
+setup_logging()
@@ -1,6 +1,50 @@
 # backend/app/config/search_config.py
 
-from typing import List
+from types import MappingProxyType
+from typing import List, Mapping
+
+# File extension -> language, built once at import (read-only)
+LANG_BY_EXT: Mapping[str, str] = MappingProxyType({
+    '.py': 'python',
+    '.js': 'javascript',
+    '.jsx': 'javascript',
+    '.ts': 'typescript',
+    '.tsx': 'typescript',
+    '.java': 'java',
+    '.c': 'c',
+    '.cpp': 'cpp',
+    '.cc': 'cpp',
+    '.cxx': 'cpp',
+    '.h': 'c',
+    '.hpp': 'cpp',
+    '.cs': 'csharp',
+    '.go': 'go',
+    '.rs': 'rust',
+    '.rb': 'ruby',
+    '.php': 'php',
+    '.swift': 'swift',
+    '.kt': 'kotlin',
+    '.scala': 'scala',
+    '.r': 'r',
+    '.m': 'objective-c',
+    '.sql': 'sql',
+    '.sh': 'bash',
+    '.bash': 'bash',
+    '.zsh': 'zsh',
+    '.html': 'html',
+    '.css': 'css',
+    '.scss': 'scss',
+    '.sass': 'sass',
+    '.json': 'json',
+    '.xml': 'xml',
+    '.yaml': 'yaml',
+    '.yml': 'yaml',
+    '.md': 'markdown',
+    '.txt': 'text',
+    '.vue': 'vue',
+    '.dart': 'dart',
+})
+
 
 class SearchConfig:
     """Configuration for search feature"""
@@ -9,6 +53,8 @@ class SearchConfig:
     SEMANTIC_WEIGHT: float = 0.6  # α
     KEYWORD_WEIGHT: float = 0.3   # β
     SYMBOL_WEIGHT: float = 0.1    # γ
+    HYBRID_FUSION: str = "weighted"  # "weighted" (scores × weights above) or "rrf" (reciprocal rank fusion)
+    RRF_K: int = 60
     
     # Search parameters
     SEMANTIC_TOP_K: int = 50
@@ -33,6 +79,10 @@ class SearchConfig:
     REGEX_TIMEOUT: int = 5             # seconds
     MAX_REGEX_MATCHES: int = 1000
     BATCH_SIZE: int = 100
+    EMBED_BATCH_SIZE: int = 256  # chunks per Ollama embedding request (across files)
+    VECTOR_ADD_BATCH_SIZE: int = 1000  # chunks per ChromaDB collection.add
+    PROGRESS_LOG_INTERVAL: int = 50  # files between INFO progress lines in per-file loops
+    EMBEDDING_CACHE_SIZE: int = 10000  # chunk vectors kept in memory
     
     # Security
     IGNORE_PATTERNS: List[str] = [
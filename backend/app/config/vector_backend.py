@@ -0,0 +1,535 @@
+# backend/app/config/vector_backend.py
+
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from cachetools import TTLCache
+
+from app.config.chroma import get_chroma_client
+
+try:
+    import faiss
+except ImportError:  # FAISS is optional; Chroma is used for large repos without it
+    faiss = None
+
+FAISS_INDEX_DIR = os.getenv("FAISS_INDEX_DIR", "./faiss_index")
+FAISS_MIN_CHUNKS = int(os.getenv("FAISS_MIN_CHUNKS", "100000"))
+# int8 scalar quantizer is trained on the first FAISS_TRAIN_SIZE vectors;
+# the top FAISS_RERANK_K candidates are re-ranked against the FP32 originals
+FAISS_TRAIN_SIZE = int(os.getenv("FAISS_TRAIN_SIZE", "100000"))
+FAISS_RERANK_K = 200
+# Repos up to this many chunks use an exact brute-force scan instead of HNSW
+FLAT_MAX_CHUNKS = int(os.getenv("FLAT_MAX_CHUNKS", "50000"))
+# In-memory HNSW mirror of Chroma collections used on the query path
+FAISS_HNSW_M = 32
+FAISS_EF_SEARCH = 64
+MIRROR_TRAIN_SIZE = int(os.getenv("MIRROR_TRAIN_SIZE", "50000"))
+MIRROR_PAGE_SIZE = 5000
+
+# Packed chunk ids: "c_" + base62((repo_id << 48) | (file_id << 24) | chunk_index)
+CHUNK_ID_PREFIX = "c_"
+LEGACY_CHUNK_ID_PREFIX = "chunk_"
+BASE62_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+_BASE62_VALUES = {char: value for value, char in enumerate(BASE62_ALPHABET)}
+_FIELD_MASK = (1 << 24) - 1
+
+_stores: Dict[str, "SidecarStore"] = {}
+_mirrors: Dict[str, "ChromaMirror"] = {}
+# Mirrors are built in the background; queries use the plain Chroma
+# collection until theirs is ready. Maps name -> token of the pending build
+_mirror_builds: Dict[str, object] = {}
+MIRROR_BUILD_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mirror")
+# Vector counts per collection (None when missing), for stats polling
+VECTOR_COUNT_TTL = 5  # seconds
+_counts: TTLCache = TTLCache(maxsize=1024, ttl=VECTOR_COUNT_TTL)
+_stores_lock = threading.RLock()
+
+
+def encode_chunk_id(repo_id: int, file_id: int, chunk_index: int) -> str:
+    """
+    Build the vector-store id of a chunk. Ids that don't fit the packed
+    16/24/24-bit layout fall back to chunk_{repo_id}_{file_id}_{chunk_index}.
+    """
+    if repo_id >> 16 or file_id >> 24 or chunk_index >> 24:
+        return f"{LEGACY_CHUNK_ID_PREFIX}{repo_id}_{file_id}_{chunk_index}"
+    packed = (repo_id << 48) | (file_id << 24) | chunk_index
+    digits = []
+    while True:
+        packed, remainder = divmod(packed, 62)
+        digits.append(BASE62_ALPHABET[remainder])
+        if not packed:
+            break
+    return CHUNK_ID_PREFIX + "".join(reversed(digits))
+
+
+def decode_chunk_id(chunk_id: str) -> Optional[Tuple[int, int, int]]:
+    """
+    Parse a chunk id from encode_chunk_id (packed or legacy format).
+    Returns (repo_id, file_id, chunk_index), or None if it isn't one.
+    """
+    if chunk_id.startswith(LEGACY_CHUNK_ID_PREFIX):
+        parts = chunk_id[len(LEGACY_CHUNK_ID_PREFIX):].split("_")
+        if len(parts) != 3 or not all(part.isdigit() for part in parts):
+            return None
+        return int(parts[0]), int(parts[1]), int(parts[2])
+    if not chunk_id.startswith(CHUNK_ID_PREFIX) or len(chunk_id) == len(CHUNK_ID_PREFIX):
+        return None
+    packed = 0
+    for char in chunk_id[len(CHUNK_ID_PREFIX):]:
+        value = _BASE62_VALUES.get(char)
+        if value is None:
+            return None
+        packed = packed * 62 + value
+    if packed >> 64:
+        return None
+    return packed >> 48, (packed >> 24) & _FIELD_MASK, packed & _FIELD_MASK
+
+
+class SidecarStore(ABC):
+    """
+    Base for local vector stores: FP32 vectors in an append-only vectors.f32
+    file plus a sidecar SQLite table for ids, documents and metadata.
+    Exposes the subset of the Chroma collection API used by the services
+    (add, query, get, count) so callers don't need to know the backend.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.path = os.path.join(FAISS_INDEX_DIR, name)
+        os.makedirs(self.path, exist_ok=True)
+        self._vectors_path = os.path.join(self.path, "vectors.f32")
+        self._db = sqlite3.connect(os.path.join(self.path, "docs.sqlite"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "pos INTEGER PRIMARY KEY, id TEXT UNIQUE, document TEXT, metadata TEXT)"
+        )
+        # Serialises writes and reads on the shared connection, so queries
+        # never see docs rows whose vectors aren't in vectors.f32 yet
+        self._lock = threading.RLock()
+
+    def add(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: List[str],
+        metadatas: List[Dict]
+    ) -> None:
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        with self._lock:
+            start = self._stored_count()
+            # vectors.f32 must stay row-aligned with docs: insert the rows
+            # first, append the vectors only once that worked, and undo both
+            # if anything fails before the commit
+            try:
+                self._db.executemany(
+                    "INSERT INTO docs (pos, id, document, metadata) VALUES (?, ?, ?, ?)",
+                    [
+                        (start + i, chunk_id, doc, json.dumps(meta))
+                        for i, (chunk_id, doc, meta) in enumerate(zip(ids, documents, metadatas))
+                    ]
+                )
+                with open(self._vectors_path, "ab") as f:
+                    end = f.tell()
+                    try:
+                        f.write(vectors.tobytes())
+                        f.flush()
+                        self._db.commit()
+                    except Exception:
+                        f.truncate(end)
+                        raise
+            except Exception:
+                self._db.rollback()
+                raise
+            self._add_vectors(vectors)
+
+    def _add_vectors(self, vectors: np.ndarray) -> None:
+        """Hook for subclasses that maintain an index alongside vectors.f32."""
+
+    def persist(self) -> None:
+        """Flush anything held in memory to disk."""
+
+    def count(self) -> int:
+        with self._lock:
+            return self._stored_count()
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 10,
+        where: Optional[Dict] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        Nearest-neighbour search returning Chroma-shaped results.
+        Distances are squared L2, like Chroma's default space.
+        """
+        with self._lock:
+            queries = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+            # Over-fetch when filtering so enough rows survive the metadata filter
+            k = min(self.count(), n_results * 4 if where else n_results)
+            fp32 = self._fp32_vectors()
+
+            results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+            for query, row_positions in zip(queries, self._candidates(queries, k)):
+                row_positions = np.sort(row_positions[row_positions >= 0])
+                # Exact squared L2 on the original vectors gives full precision ordering
+                row_distances = ((fp32[row_positions] - query) ** 2).sum(axis=1)
+                order = np.argsort(row_distances, kind="stable")
+                row_distances, row_positions = row_distances[order], row_positions[order]
+                rows = self._fetch(row_positions.tolist())
+                ids, documents, metadatas, kept = [], [], [], []
+                for distance, pos in zip(row_distances, row_positions.tolist()):
+                    if pos not in rows:
+                        continue
+                    chunk_id, document, metadata = rows[pos]
+                    if where and any(metadata.get(key) != value for key, value in where.items()):
+                        continue
+                    ids.append(chunk_id)
+                    documents.append(document)
+                    metadatas.append(metadata)
+                    kept.append(float(distance))
+                    if len(ids) == n_results:
+                        break
+                results["ids"].append(ids)
+                results["documents"].append(documents)
+                results["metadatas"].append(metadatas)
+                results["distances"].append(kept)
+            return results
+
+    @abstractmethod
+    def _candidates(self, queries: np.ndarray, k: int) -> np.ndarray:
+        """Return a (len(queries), >=k) array of candidate positions."""
+
+    def get(self, ids: Optional[List[str]] = None, limit: Optional[int] = None, include=None) -> Dict:
+        sql = "SELECT id, document, metadata FROM docs"
+        params: list = []
+        if ids is not None:
+            sql += f" WHERE id IN ({','.join('?' * len(ids))})"
+            params.extend(ids)
+        sql += " ORDER BY pos"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return {
+            "ids": [r[0] for r in rows],
+            "documents": [r[1] for r in rows],
+            "metadatas": [json.loads(r[2]) for r in rows],
+        }
+
+    def _stored_count(self) -> int:
+        row = self._db.execute("SELECT COALESCE(MAX(pos) + 1, 0) FROM docs").fetchone()
+        return row[0]
+
+    def _fp32_vectors(self) -> np.ndarray:
+        count = self._stored_count()
+        if count == 0:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.memmap(self._vectors_path, dtype=np.float32, mode="r").reshape(count, -1)
+
+    def _fetch(self, positions: List[int]) -> Dict[int, tuple]:
+        if not positions:
+            return {}
+        rows = self._db.execute(
+            f"SELECT pos, id, document, metadata FROM docs WHERE pos IN ({','.join('?' * len(positions))})",
+            positions
+        ).fetchall()
+        return {r[0]: (r[1], r[2], json.loads(r[3])) for r in rows}
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class FlatStore(SidecarStore):
+    """
+    Exact brute-force store for small repos. A single vectorised scan over
+    the memory-mapped vectors is faster than HNSW at this size and has no
+    graph to build or persist.
+    """
+
+    @classmethod
+    def exists(cls, name: str) -> bool:
+        path = os.path.join(FAISS_INDEX_DIR, name)
+        return (
+            os.path.exists(os.path.join(path, "vectors.f32"))
+            and not os.path.exists(os.path.join(path, "index.faiss"))
+        )
+
+    def _candidates(self, queries: np.ndarray, k: int) -> np.ndarray:
+        fp32 = self._fp32_vectors()
+        if k >= len(fp32):
+            return np.tile(np.arange(len(fp32)), (len(queries), 1))
+        # ||x - q||^2 ranks the same as ||x||^2 - 2 x.q
+        scores = (fp32 ** 2).sum(axis=1) - 2 * (queries @ fp32.T)
+        return np.argpartition(scores, k - 1, axis=1)[:, :k]
+
+
+class FaissStore(SidecarStore):
+    """
+    int8 scalar-quantized FAISS index for very large repos. FP32 vectors are
+    only read back to re-rank the top candidates of each query.
+    """
+
+    def __init__(self, name: str, index=None):
+        super().__init__(name)
+        self.index = index
+        self._pending: List[np.ndarray] = []
+
+    @classmethod
+    def exists(cls, name: str) -> bool:
+        return os.path.exists(os.path.join(FAISS_INDEX_DIR, name, "index.faiss"))
+
+    @classmethod
+    def load(cls, name: str) -> "FaissStore":
+        index = faiss.read_index(os.path.join(FAISS_INDEX_DIR, name, "index.faiss"))
+        return cls(name, index)
+
+    def _add_vectors(self, vectors: np.ndarray) -> None:
+        if self.index is not None and self.index.is_trained:
+            self.index.add(vectors)
+        else:
+            # Hold vectors back until there are enough to train the quantizer
+            self._pending.append(vectors)
+            if sum(len(v) for v in self._pending) >= FAISS_TRAIN_SIZE:
+                self._train_and_flush()
+
+    def _train_and_flush(self) -> None:
+        """Train the int8 quantizer on the buffered vectors, then add them."""
+        sample = np.concatenate(self._pending)
+        self._pending = []
+        if self.index is None:
+            self.index = faiss.IndexScalarQuantizer(
+                sample.shape[1], faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2
+            )
+        if not self.index.is_trained:
+            self.index.train(sample[:FAISS_TRAIN_SIZE])
+        self.index.add(sample)
+
+    def persist(self) -> None:
+        """Write the index to disk next to its sidecar table."""
+        with self._lock:
+            if self._pending:
+                self._train_and_flush()
+            if self.index is not None:
+                faiss.write_index(self.index, os.path.join(self.path, "index.faiss"))
+
+    def count(self) -> int:
+        with self._lock:
+            if self._pending:
+                self._train_and_flush()
+        return self.index.ntotal if self.index is not None else 0
+
+    def _candidates(self, queries: np.ndarray, k: int) -> np.ndarray:
+        # Always pull enough candidates to re-rank against FP32
+        _, positions = self.index.search(queries, min(self.count(), max(k, FAISS_RERANK_K)))
+        return positions
+
+
+class ChromaMirror:
+    """
+    Read-only FAISS HNSW copy of a Chroma collection. Chroma stays the
+    persistence layer and takes all writes; searches run against the
+    in-process graph and only the final hits' documents and metadata are
+    loaded back from Chroma. Vectors are held as int8 scalar-quantized
+    codes (4x smaller than FP32); hits are re-scored against their FP32
+    embeddings from Chroma. Exposes the same query/count surface as the
+    other stores.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        ids, vectors = [], []
+        offset = 0
+        while True:
+            page = collection.get(include=["embeddings"], limit=MIRROR_PAGE_SIZE, offset=offset)
+            if not page["ids"]:
+                break
+            ids.extend(page["ids"])
+            vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+            offset += len(page["ids"])
+        self.ids = np.array(ids, dtype=object)
+        self.index = None
+        if ids:
+            vectors = np.concatenate(vectors)
+            self.index = faiss.IndexHNSWSQ(vectors.shape[1], faiss.ScalarQuantizer.QT_8bit, FAISS_HNSW_M)
+            self.index.hnsw.efSearch = FAISS_EF_SEARCH
+            self.index.train(vectors[:MIRROR_TRAIN_SIZE])
+            self.index.add(vectors)
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 10,
+        where: Optional[Dict] = None,
+        include: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        Nearest-neighbour search returning Chroma-shaped results.
+        Distances are squared L2, like Chroma's default space.
+        """
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if self.index is None:
+            return {key: [[] for _ in query_embeddings] for key in results}
+
+        queries = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+        # Over-fetch when filtering so enough rows survive the metadata filter
+        k = min(self.count(), n_results * 4 if where else n_results)
+        _, positions = self.index.search(queries, k)
+
+        for query, row_positions in zip(queries, positions):
+            row_ids = self.ids[row_positions[row_positions >= 0]].tolist()
+            if not row_ids:
+                for key in results:
+                    results[key].append([])
+                continue
+            page = self.collection.get(ids=row_ids, include=["embeddings", "documents", "metadatas"])
+            # Exact squared L2 on the FP32 originals restores full precision ordering
+            row_distances = ((np.asarray(page["embeddings"], dtype=np.float32) - query) ** 2).sum(axis=1)
+            order = np.argsort(row_distances, kind="stable")
+            ids, documents, metadatas, kept = [], [], [], []
+            for i in order.tolist():
+                chunk_id, document, metadata = page["ids"][i], page["documents"][i], page["metadatas"][i]
+                distance = float(row_distances[i])
+                if where and any(metadata.get(key) != value for key, value in where.items()):
+                    continue
+                ids.append(chunk_id)
+                documents.append(document)
+                metadatas.append(metadata)
+                kept.append(distance)
+                if len(ids) == n_results:
+                    break
+            results["ids"].append(ids)
+            results["documents"].append(documents)
+            results["metadatas"].append(metadatas)
+            results["distances"].append(kept)
+        return results
+
+
+def create_vector_store(name: str, expected_count: int, metadata: Optional[Dict] = None):
+    """
+    Create an empty vector store for a collection, replacing any existing one.
+    Small collections get an exact flat store, very large ones go to FAISS
+    when it is installed, and everything in between to Chroma.
+    """
+    delete_vector_store(name)
+    if expected_count <= FLAT_MAX_CHUNKS:
+        store = FlatStore(name)
+    elif faiss is not None and expected_count >= FAISS_MIN_CHUNKS:
+        store = FaissStore(name)
+    else:
+        return get_chroma_client().create_collection(name=name, metadata=metadata)
+    with _stores_lock:
+        _stores[name] = store
+    return store
+
+
+def get_vector_store(name: str):
+    """
+    Get the vector store for a collection from whichever backend holds it.
+    Raises ValueError if it doesn't exist (same as Chroma's get_collection).
+    """
+    with _stores_lock:
+        if name in _stores:
+            return _stores[name]
+        store = None
+        if faiss is not None and FaissStore.exists(name):
+            store = FaissStore.load(name)
+        elif FlatStore.exists(name):
+            store = FlatStore(name)
+        if store is not None:
+            _stores[name] = store
+            return store
+    return get_chroma_client().get_collection(name=name)
+
+
+def get_search_index(name: str):
+    """
+    Get the store to run similarity queries against for a collection.
+    Same as get_vector_store, except that Chroma collections are searched
+    through a ChromaMirror when FAISS is installed. The mirror is built in
+    the background on first use; until it is ready the Chroma collection
+    itself is returned. Persisting or deleting the collection drops it.
+    """
+    store = get_vector_store(name)
+    if faiss is None or isinstance(store, SidecarStore):
+        return store
+    with _stores_lock:
+        mirror = _mirrors.get(name)
+        if mirror is not None:
+            return mirror
+        if name not in _mirror_builds:
+            token = object()
+            _mirror_builds[name] = token
+            MIRROR_BUILD_POOL.submit(_build_mirror, name, store, token)
+    return store
+
+
+def _build_mirror(name: str, collection, token: object) -> None:
+    """Build a collection's mirror, dropping it if invalidated meanwhile."""
+    try:
+        mirror = ChromaMirror(collection)
+    except Exception as e:
+        print(f"⚠️  Failed to build search mirror for {name}: {e}")
+        mirror = None
+    with _stores_lock:
+        if _mirror_builds.get(name) is not token:
+            return
+        del _mirror_builds[name]
+        if mirror is not None:
+            _mirrors[name] = mirror
+
+
+def get_vector_store_count(name: str) -> Optional[int]:
+    """
+    Number of vectors in a collection, or None if it doesn't exist.
+    Cached for VECTOR_COUNT_TTL seconds; persisting or deleting the
+    collection drops the cached value.
+    """
+    with _stores_lock:
+        if name in _counts:
+            return _counts[name]
+    try:
+        count = get_vector_store(name).count()
+    except Exception:
+        count = None
+    with _stores_lock:
+        _counts[name] = count
+    return count
+
+
+def persist_vector_store(store) -> None:
+    """Flush a store to disk (Chroma persists on write already)."""
+    if isinstance(store, SidecarStore):
+        store.persist()
+    with _stores_lock:
+        _counts.pop(store.name, None)
+        # Rebuild the query-side mirror from the freshly written collection
+        _mirrors.pop(store.name, None)
+        _mirror_builds.pop(store.name, None)
+
+
+def delete_vector_store(name: str) -> None:
+    """Delete a collection from every backend, ignoring missing ones."""
+    with _stores_lock:
+        _counts.pop(name, None)
+        _mirrors.pop(name, None)
+        _mirror_builds.pop(name, None)
+        store = _stores.pop(name, None)
+        if store is not None:
+            store.close()
+        shutil.rmtree(os.path.join(FAISS_INDEX_DIR, name), ignore_errors=True)
+    try:
+        get_chroma_client().delete_collection(name=name)
+    except ValueError:
+        pass
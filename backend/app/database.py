@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -13,17 +15,63 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
+# Rows per multi-row INSERT when executemany is rewritten by "insertmanyvalues"
+INSERT_PAGE_SIZE = int(os.getenv("DB_INSERT_PAGE_SIZE", "5000"))
+
+# psycopg2 batches executemany INSERT/UPDATE into multi-row statements
+_engine_options = {"insertmanyvalues_page_size": INSERT_PAGE_SIZE}
+if make_url(DATABASE_URL).get_driver_name() == "psycopg2":
+    _engine_options["executemany_mode"] = "values_plus_batch"
+
 # Create SQLAlchemy engine
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,  # Enable connection health checks
     pool_size=10,
-    max_overflow=20
+    max_overflow=20,
+    **_engine_options
 )
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _to_async_url(url: str):
+    """
+    Map the sync DATABASE_URL onto the matching asyncio driver
+    (postgresql -> asyncpg, sqlite -> aiosqlite).
+    """
+    url_obj = make_url(url)
+    backend = url_obj.get_backend_name()
+    if backend == "postgresql":
+        return url_obj.set(drivername="postgresql+asyncpg")
+    if backend == "sqlite":
+        return url_obj.set(drivername="sqlite+aiosqlite")
+    return url_obj
+
+
+# Async engine for request handlers that should not block the event loop
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _to_async_url(DATABASE_URL)
+
+# aiosqlite runs on a NullPool, which rejects pool sizing arguments
+_async_engine_options = {"insertmanyvalues_page_size": INSERT_PAGE_SIZE}
+if make_url(ASYNC_DATABASE_URL).get_backend_name() != "sqlite":
+    _async_engine_options.update(pool_size=10, max_overflow=20)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    **_async_engine_options
+)
+
+# Create AsyncSessionLocal class
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Create Base class for models
 Base = declarative_base()
 
@@ -41,6 +89,16 @@ def get_db():
         db.close()
 
 
+# Dependency to get async DB session
+async def get_async_db():
+    """
+    Async database session dependency for FastAPI.
+    Yields an AsyncSession and ensures it's closed after use.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 # Function to initialize database
 def init_db():
     """
@@ -1,60 +1,121 @@
 # backend/app/main.py
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
 from dotenv import load_dotenv
+import logging
 import os
 
+from app.config.logging_config import log_listener
+from app.config.chroma import get_chroma_client
 from app.database import init_db
 from app.routers import repositories_router
 from app.routers import files
 from app.routers import search
+from app.services.embedding_service import embeddings, get_collection
+from app.services.search_log import search_log
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Initialize database tables on startup and clean up on shutdown.
+    """
+    log_listener.start()
+    
+    logger.info("🚀 Initializing database...")
+    init_db()
+    logger.info("✅ Database initialized successfully!")
+    
+    # Preload the vector store so the first request doesn't pay for it
+    get_chroma_client()
+    search_log.start()
+    logger.info(
+        "📡 Server running on http://%s:%s",
+        os.getenv('API_HOST', '0.0.0.0'), os.getenv('API_PORT', '8000')
+    )
+    
+    yield
+    
+    logger.info("👋 Shutting down CodeMind AI API...")
+    await search_log.stop()
+    await embeddings.aclose()
+    log_listener.stop()
+
+
 # Create FastAPI application
 app = FastAPI(
     title="CodeMind AI API",
     description="RAG-based platform for chatting with GitHub repositories + Full Code Search",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
+
+class StreamingAwareGZipResponder(GZipResponder):
+    """GZip responder that sends server-sent event streams uncompressed."""
+    
+    async def send_with_gzip(self, message) -> None:
+        await super().send_with_gzip(message)
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            if content_type.startswith("text/event-stream"):
+                # Reuse the pass-through path for already-encoded bodies so
+                # each event is flushed as soon as it is produced
+                self.content_encoding_set = True
+
+
+class StreamingAwareGZipMiddleware(GZipMiddleware):
+    """
+    Compress large JSON/text responses (file contents, trees, search
+    results) for clients that accept gzip, leaving SSE streams alone.
+    """
+    
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("Accept-Encoding", ""):
+            responder = StreamingAwareGZipResponder(
+                self.app, self.minimum_size, compresslevel=self.compresslevel
+            )
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+# Responses smaller than this aren't worth compressing
+GZIP_MINIMUM_SIZE = 1024
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+
+# Configure CORS (comma-separated CORS_ORIGINS, defaults to the Next.js dev servers)
+CORS_ORIGINS = frozenset(
+    origin.strip()
+    for origin in os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:3001").split(",")
+    if origin.strip()
 )
+CORS_METHODS = ["GET", "POST", "DELETE", "OPTIONS"]
 
-# Configure CORS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://localhost:3001"],  # Next.js frontend
+    allow_origins=sorted(CORS_ORIGINS),
     allow_credentials=True,
-    allow_methods=["*"],
+    allow_methods=CORS_METHODS,
     allow_headers=["*"],
 )
+app.add_middleware(StreamingAwareGZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_LEVEL)
 
 # Include routers
 app.include_router(repositories_router)
 app.include_router(files.router)
 app.include_router(search.router) 
 
-# Application startup event
-@app.on_event("startup")
-async def startup_event():
-    """
-    Initialize database tables on application startup.
-    """
-    print("🚀 Initializing database...")
-    init_db()
-    print("✅ Database initialized successfully!")
-    print(f"📡 Server running on http://{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('API_PORT', '8000')}")
-
-
-# Application shutdown event
-@app.on_event("shutdown")
-async def shutdown_event():
-    """
-    Cleanup on application shutdown.
-    """
-    print("👋 Shutting down CodeMind AI API...")
-
-
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -88,8 +149,6 @@ async def root():
 @app.get("/debug/repo/{repo_id}/collection")
 async def debug_collection(repo_id: int):
     """Debug endpoint to check collection contents."""
-    from app.services.embedding_service import get_collection
-    
     try:
         collection = get_collection(repo_id)
         if not collection:
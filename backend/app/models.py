@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Boolean, Index, Float
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy import DDL, event, Column, Integer, String, Text, DateTime, ForeignKey, JSON, Boolean, Index, Float
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.sql import func, text
 from app.database import Base
 
 
@@ -44,6 +44,10 @@ class RepositoryFile(Base):
     
     repository = relationship("Repository", back_populates="repository_files")
     
+    __table_args__ = (
+        Index('idx_repo_parent', 'repo_id', 'parent_path'),
+    )
+    
     def __repr__(self):
         return f"<RepositoryFile(id={self.id}, path={self.file_path}, type={self.file_type})>"
 
@@ -55,7 +59,8 @@ class CodeFile(Base):
     id = Column(Integer, primary_key=True, index=True)
     repo_id = Column(Integer, ForeignKey("repositories.id"), nullable=False, index=True)
     file_path = Column(String(1000), nullable=False)
-    content = Column(Text, nullable=False)
+    # Deferred: only loaded by endpoints that actually read file content
+    content = deferred(Column(Text, nullable=False))
     language = Column(String(50), nullable=False, index=True)
     
     # Use file_metadata (same as database column)
@@ -86,6 +91,10 @@ class ChatMessage(Base):
     
     repository = relationship("Repository", back_populates="chat_messages")
     
+    __table_args__ = (
+        Index('idx_chat_repo_created', repo_id, created_at.desc()),
+    )
+    
     def __repr__(self):
         return f"<ChatMessage(id={self.id}, repo_id={self.repo_id})>"
 
@@ -147,9 +156,36 @@ class Symbol(Base):
         Index('idx_symbol_name', 'name', 'symbol_type'),
         Index('idx_repo_symbol', 'repo_id', 'name'),
         Index('idx_file_symbol', 'file_id', 'start_line'),
+        Index('idx_symbols_repo_lang_type', 'repo_id', 'language', 'symbol_type'),
+        # Lets the symbol search list be answered from the index alone
+        Index(
+            'idx_symbols_covering', 'repo_id',
+            postgresql_include=[
+                'file_id', 'name', 'qualified_name', 'symbol_type',
+                'language', 'start_line', 'end_line', 'scope'
+            ]
+        ).ddl_if(dialect='postgresql'),
+        # Substring ILIKE '%q%' lookups (pg_trgm); prefix LIKE 'q%' lookups
+        Index(
+            'idx_symbols_name_trgm', name, qualified_name,
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops', 'qualified_name': 'gin_trgm_ops'}
+        ).ddl_if(dialect='postgresql'),
+        Index(
+            'idx_symbols_name_prefix', repo_id, func.lower(name).label('name_lower'),
+            postgresql_ops={'name_lower': 'text_pattern_ops'}
+        ),
     )
 
 
+# The trigram index needs pg_trgm before the symbols table is created
+event.listen(
+    Symbol.__table__,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
+
+
 class IndexJob(Base):
     """Tracks indexing jobs for repositories."""
     __tablename__ = "index_jobs"
@@ -170,6 +206,15 @@ class IndexJob(Base):
     error_message = Column(Text)
     
     repository = relationship("Repository")
+    
+    __table_args__ = (
+        # Only in-flight jobs are looked up by status; finished jobs stay out of the index
+        Index(
+            'idx_active_jobs', 'repo_id',
+            postgresql_where=text("status IN ('pending', 'running')"),
+            sqlite_where=text("status IN ('pending', 'running')")
+        ),
+    )
 
 
 class SearchQuery(Base):
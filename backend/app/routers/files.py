@@ -1,11 +1,14 @@
 # backend/app/routers/files.py
 
+import os
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi.responses import FileResponse, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app.database import get_db
+from app.database import get_async_db
 from app.services.file_service import FileService
+from app.services.repo_cache import get_repo_local_path, invalidate_repo
 from app.schemas.repository import FileTreeNode, FileContentResponse
 
 router = APIRouter(
@@ -14,9 +17,9 @@ router = APIRouter(
 )
 
 @router.get("/tree", response_model=FileTreeNode)
-def get_file_tree(
+async def get_file_tree(
     repo_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Returns the complete file tree structure for the repository.
@@ -27,7 +30,9 @@ def get_file_tree(
     - Files have `extension` and `size` properties
     """
     try:
-        return FileService.get_file_tree(repo_id, db)
+        # Already serialized (and cached) by the service
+        tree_json = await FileService.get_file_tree(repo_id, db)
+        return Response(content=tree_json, media_type="application/json")
     except HTTPException:
         raise
     except Exception as e:
@@ -37,10 +42,10 @@ def get_file_tree(
         )
 
 @router.get("/content", response_model=FileContentResponse)
-def get_file_content(
+async def get_file_content(
     repo_id: int,
     path: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Returns the content of a specific file.
@@ -54,7 +59,7 @@ def get_file_content(
     - File metadata (size, line count)
     """
     try:
-        return FileService.get_file_content(repo_id, path, db)
+        return await FileService.get_file_content(repo_id, path, db)
     except HTTPException:
         raise
     except Exception as e:
@@ -63,31 +68,43 @@ def get_file_content(
             detail=f"Failed to retrieve file content: {str(e)}"
         )
 
+@router.get("/raw")
+async def get_raw_file(
+    repo_id: int,
+    path: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Streams a file's raw bytes straight from disk.
+    
+    Used for files too large for the JSON `/content` endpoint; the body is
+    sent with sendfile instead of being decoded and re-encoded in Python.
+    """
+    _, full_path = await FileService.resolve_file_path(repo_id, path, db)
+    return FileResponse(full_path, media_type="text/plain")
+
 @router.post("/rescan")
-def rescan_repository_files(
+async def rescan_repository_files(
     repo_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Rescans the repository directory and updates file metadata.
     Useful after repository updates.
     """
     try:
-        from app.models import Repository
-        repo = db.query(Repository).filter(Repository.id == repo_id).first()
-        if not repo:
-            raise HTTPException(status_code=404, detail="Repository not found")
-        
-        if not repo.local_path or not os.path.exists(repo.local_path):
+        local_path = await get_repo_local_path(repo_id, db)
+        if not local_path or not os.path.exists(local_path):
             raise HTTPException(
                 status_code=400,
                 detail="Repository local path not available"
             )
         
-        files = FileService.scan_repository_files(repo_id, repo.local_path, db)
+        files_count = await FileService.scan_repository_files_async(repo_id, local_path, db)
+        invalidate_repo(repo_id)
         return {
             "message": "Repository files rescanned successfully",
-            "files_count": len(files)
+            "files_count": files_count
         }
     except HTTPException:
         raise
@@ -1,14 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, insert, text
 from sqlalchemy.orm import Session
-from typing import List
-import traceback
-import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, List, Optional
+import asyncio
+import queue
+import logging
+import orjson
 import os      
-import shutil
+import uuid
 
-from app.database import get_db
-from app.models import Repository, CodeFile, ChatMessage
+from app.database import get_db, SessionLocal
+from app.models import (
+    Repository, CodeFile, ChatMessage, CodeChunk, Symbol, IndexJob, SearchQuery, RepositoryFile
+)
 from app.schemas import (
     RepositoryIngestRequest,
     RepositoryIngestResponse,
@@ -22,10 +29,12 @@ from app.schemas import (
     CodeChunkResponse
 )
 from app.services.github_service import (
+    cleanup_repository,
     clone_repository,
     get_repo_metadata
 )
-from app.services.code_parser import parse_repository_files
+from app.services.code_parser import iter_repository_files
+from app.services.repo_cache import get_ready_repo, invalidate_repo
 from app.services.embedding_service import create_embeddings
 from app.services.rag_service import (
     query_codebase,
@@ -41,17 +50,202 @@ router = APIRouter(
     tags=["repositories"]
 )
 
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT statement when saving parsed files
+INSERT_BATCH_SIZE = 1000
+
+# Runs ingestion jobs off the event loop; bounded so concurrent ingests
+# don't exhaust the DB pool or memory
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_POOL = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+# Embedding stage of each ingestion pipeline (one per running ingest, so it never starves)
+EMBED_POOL = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest-embed")
+# File tree scan of each ingestion pipeline, run alongside parsing
+SCAN_STAGE_POOL = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest-scan")
+
+# Server-sent event framing, pre-encoded so each token costs one concatenation
+SSE_DATA_PREFIX = b"data: "
+SSE_EVENT_END = b"\n\n"
+
+# Tables with a repo_id column, children before parents (FK order)
+REPO_CHILD_MODELS = (
+    SearchQuery, IndexJob, Symbol, CodeChunk, RepositoryFile, CodeFile, ChatMessage
+)
+# Rows rebuilt by a re-ingest (search history and index jobs are kept)
+REINGEST_MODELS = (Symbol, CodeChunk, RepositoryFile, CodeFile, ChatMessage)
+
+
+def delete_repository_rows(
+    db: Session,
+    repo_id: int,
+    models: tuple = REPO_CHILD_MODELS,
+    delete_repository: bool = False
+) -> Dict[str, int]:
+    """
+    Delete every row that belongs to a repository.
+    
+    On PostgreSQL this is a single statement: one data-modifying CTE per
+    table, with the row counts selected from their RETURNING output.
+    Other databases get one DELETE per table and use the rowcount.
+    
+    Args:
+        db: Database session (caller commits)
+        repo_id: Repository ID
+        models: Models whose rows to delete, children before parents
+        delete_repository: Also delete the repositories row itself
+        
+    Returns:
+        Dict of table name -> number of rows deleted
+    """
+    tables = [model.__table__ for model in models]
+    if delete_repository:
+        tables.append(Repository.__table__)
+    
+    if db.bind.dialect.name == "postgresql":
+        ctes = ", ".join(
+            f"d_{table.name} AS (DELETE FROM {table.name} WHERE "
+            f"{'id' if table is Repository.__table__ else 'repo_id'} = :repo_id RETURNING 1)"
+            for table in tables
+        )
+        counts = ", ".join(f"(SELECT count(*) FROM d_{table.name}) AS {table.name}" for table in tables)
+        row = db.execute(text(f"WITH {ctes} SELECT {counts}"), {"repo_id": repo_id}).mappings().one()
+        return dict(row)
+    
+    counts = {}
+    for table in tables:
+        key_column = table.c.id if table is Repository.__table__ else table.c.repo_id
+        counts[table.name] = db.execute(delete(table).where(key_column == repo_id)).rowcount
+    return counts
+
 
-def process_repository_ingestion(repo_id: int, github_url: str, db: Session):
+def process_repository_ingestion(repo_id: int, github_url: str):
     """
     Background task to process repository ingestion.
     This runs asynchronously to avoid blocking the API.
+    
+    Takes only primitive args: the request's session is closed once the
+    response is sent, so the task opens (and closes) its own session.
+    
+    Args:
+        repo_id: Repository ID
+        github_url: GitHub repository URL
+    """
+    with SessionLocal() as db:
+        _run_repository_ingestion(repo_id, github_url, db)
+
+
+def get_recent_chat_history(db: Session, repo_id: int, limit: int = 3) -> List[Dict[str, str]]:
+    """
+    Load the last `limit` question/answer pairs, oldest first.
+    Selects only the two columns (plain tuples, no ORM objects) so the
+    idx_chat_repo_created index serves the ORDER BY ... LIMIT directly.
+    """
+    recent_messages = db.query(ChatMessage.question, ChatMessage.answer)\
+        .filter(ChatMessage.repo_id == repo_id)\
+        .order_by(ChatMessage.created_at.desc())\
+        .limit(limit)\
+        .all()
+    
+    return [
+        {"question": question, "answer": answer}
+        for question, answer in reversed(recent_messages)
+    ]
+
+
+def save_chat_message(
+    db: Session,
+    repo_id: int,
+    question: str,
+    answer: str,
+    sources: List[Dict],
+    metadata: Optional[Dict]
+):
+    """
+    Insert a chat message and commit.
+    
+    Args:
+        db: Database session
+        repo_id: Repository ID
+        question: User question
+        answer: Generated answer
+        sources: Source dicts (see source_dicts)
+        metadata: Query metadata stored in message_metadata
+        
+    Returns:
+        Row with the generated id and created_at (from INSERT ... RETURNING)
     """
+    row = db.execute(
+        insert(ChatMessage)
+        .values(
+            repo_id=repo_id,
+            question=question,
+            answer=answer,
+            sources=sources,
+            message_metadata=metadata
+        )
+        .returning(ChatMessage.id, ChatMessage.created_at)
+    ).one()
+    db.commit()
+    return row
+
+
+def source_dicts(sources: List[Dict]) -> List[Dict]:
+    """
+    Normalize RAG sources into the dict shape of SourceReference
+    (lines as a string) without building Pydantic models.
+    """
+    return [
+        {
+            "file_path": src["file_path"],
+            "language": src["language"],
+            "relevance_score": float(src["relevance_score"]),
+            "lines": str(src["lines"]) if src.get("lines") is not None else None
+        }
+        for src in sources
+    ]
+
+
+def remove_local_clone(local_path: str) -> None:
+    """
+    Remove a cloned repository without blocking the event loop.
+    The directory is first renamed aside (atomic, so a re-clone can reuse
+    the path immediately), then deleted on a worker thread.
+    """
+    trash_path = f"{local_path}.deleting-{uuid.uuid4().hex}"
+    try:
+        os.rename(local_path, trash_path)
+    except OSError:
+        trash_path = local_path
+    asyncio.get_running_loop().run_in_executor(None, cleanup_repository, trash_path)
+
+
+def sse_event(payload: Dict) -> bytes:
+    """Encode one server-sent event as bytes (orjson emits UTF-8 directly)."""
+    return SSE_DATA_PREFIX + orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY) + SSE_EVENT_END
+
+
+def scan_repository_files_job(repo_id: int, repo_path: str) -> int:
+    """Scan stage of an ingestion pipeline; uses its own session (runs on SCAN_STAGE_POOL)."""
+    with SessionLocal() as db:
+        return FileService.scan_repository_files(repo_id, repo_path, db)
+
+
+def submit_ingestion(repo_id: int, github_url: str) -> asyncio.Future:
+    """
+    Schedule process_repository_ingestion on INGEST_POOL.
+    Must be called from a request handler (needs the running loop).
+    """
+    return asyncio.get_running_loop().run_in_executor(
+        INGEST_POOL, process_repository_ingestion, repo_id, github_url
+    )
+
+
+def _run_repository_ingestion(repo_id: int, github_url: str, db: Session):
+    """Clone, scan, parse and embed a repository using the given session."""
     repo_path = None
     try:
-        print(f"\n{'='*60}")
-        print(f"Starting ingestion for repository ID: {repo_id}")
-        print(f"{'='*60}\n")
+        logger.info("Starting ingestion for repository ID: %s", repo_id)
         
         # Update status to processing
         repo = db.query(Repository).filter(Repository.id == repo_id).first()
@@ -59,7 +253,7 @@ def process_repository_ingestion(repo_id: int, github_url: str, db: Session):
         db.commit()
         
         # Step 1: Clone repository
-        print("🔄 Step 1: Cloning repository...")
+        logger.info("🔄 Step 1: Cloning repository...")
         repo_path = clone_repository(github_url)
         repo_meta = get_repo_metadata(github_url)
         
@@ -67,63 +261,111 @@ def process_repository_ingestion(repo_id: int, github_url: str, db: Session):
         repo.repo_metadata = repo_meta
         repo.local_path = repo_path
         db.commit()
-        
-        # Step 1.5: Scan file structure
-        print("\n📂 Step 1.5: Scanning file structure...")
-        FileService.scan_repository_files(repo_id, repo_path, db)
-        
-        # Step 2: Parse code files
-        print("\n📖 Step 2: Parsing code files...")
-        parsed_files = parse_repository_files(repo_path)
-        
-        if not parsed_files:
-            raise Exception("No code files found in repository")
-        
-        # Step 3: Save code files to database
-        print(f"\n💾 Step 3: Saving {len(parsed_files)} files to database...")
-        file_id_map = {}
-        for idx, file_info in enumerate(parsed_files):
-            code_file = CodeFile(
-                repo_id=repo_id,
-                file_path=file_info['file_path'],
-                content=file_info['content'],
-                language=file_info['language'],
-                file_metadata=file_info['metadata']
-            )
-            db.add(code_file)
-            db.flush()
-            file_id_map[idx] = code_file.id
-            parsed_files[idx]['file_id'] = code_file.id
-
-        db.commit()
-        
-        # Step 4: Create embeddings
-        print("\n🧠 Step 4: Creating embeddings...")
-        embedding_stats = create_embeddings(repo_id, parsed_files)
+        invalidate_repo(repo_id)
+        
+        # Step 1.5: Scan file structure. It only writes repository_files, so it
+        # runs alongside steps 2-4; SQLite allows a single writer, so there it
+        # runs first
+        logger.info("📂 Step 1.5: Scanning file structure...")
+        scan_future = None
+        if db.bind.dialect.name == "sqlite":
+            FileService.scan_repository_files(repo_id, repo_path, db)
+        else:
+            scan_future = SCAN_STAGE_POOL.submit(scan_repository_files_job, repo_id, repo_path)
+        
+        # Steps 2-4 run as a pipeline: files are parsed lazily, saved in
+        # batches, and handed to an embedding worker as soon as they have ids
+        logger.info("📖 Steps 2-4: Parsing, saving and embedding code files...")
+        scan_error = None
+        embed_future = None
+        try:
+            embed_queue: queue.Queue = queue.Queue()
+            embed_future = EMBED_POOL.submit(create_embeddings, repo_id, iter(embed_queue.get, None))
+            total_files = 0
+            try:
+                parsed_files = iter_repository_files(repo_path)
+                # executemany INSERT ... RETURNING id per batch, ids in parameter order.
+                # Batching keeps only one batch of parameter dicts alive at a time.
+                while batch := list(islice(parsed_files, INSERT_BATCH_SIZE)):
+                    # The embedding worker only finishes before end of stream
+                    # when it failed; stop parsing and let its error surface
+                    if embed_future.done():
+                        break
+                    file_ids = db.scalars(
+                        insert(CodeFile).returning(CodeFile.id, sort_by_parameter_order=True),
+                        [
+                            {
+                                "repo_id": repo_id,
+                                "file_path": file_info['file_path'],
+                                "content": file_info['content'],
+                                "language": file_info['language'],
+                                "file_metadata": file_info['metadata']
+                            }
+                            for file_info in batch
+                        ]
+                    ).all()
+                    db.commit()
+                    
+                    # Queue only the path: the embedding stage re-reads content when
+                    # it gets to the file, so queued files don't pin their source text
+                    for file_info, file_id in zip(batch, file_ids):
+                        del file_info['content']
+                        file_info['file_id'] = file_id
+                        file_info['source_path'] = os.path.join(repo_path, file_info['file_path'])
+                        embed_queue.put(file_info)
+                    total_files += len(batch)
+                    logger.info("💾 Saved %d files to database", total_files)
+            except BaseException:
+                # Drop files the worker hasn't picked up yet, the repo is failing
+                while True:
+                    try:
+                        embed_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                raise
+            finally:
+                # End of stream for the embedding worker
+                embed_queue.put(None)
+            
+            embedding_stats = embed_future.result()
+            
+            if not total_files:
+                raise Exception("No code files found in repository")
+        finally:
+            # Join both background stages on failure too, so neither is still
+            # writing when the repo is marked failed below
+            if embed_future is not None:
+                embed_error = embed_future.exception()
+                if embed_error is not None:
+                    logger.error("❌ Embedding failed for repository %s: %s", repo_id, embed_error)
+            if scan_future is not None:
+                scan_error = scan_future.exception()
+                if scan_error is not None:
+                    logger.error("❌ File structure scan failed for repository %s: %s", repo_id, scan_error)
+        if scan_error is not None:
+            raise scan_error
         
         # Update repository metadata with embedding stats
         current_metadata = repo.repo_metadata or {}
         current_metadata.update({
-            "total_files": len(parsed_files),
+            "total_files": total_files,
             "embedding_stats": embedding_stats
         })
         repo.repo_metadata = current_metadata
         repo.status = "completed"
         db.commit()
         
-        print(f"\n{'='*60}")
-        print(f"✅ Repository ingestion completed successfully!")
-        print(f"   Repository ID: {repo_id}")
-        print(f"   Files processed: {len(parsed_files)}")
-        print(f"   Total chunks: {embedding_stats.get('total_chunks', 0)}")
-        print(f"{'='*60}\n")
+        logger.info(
+            "✅ Repository ingestion completed: repo %s, %d files, %d chunks",
+            repo_id, total_files, embedding_stats.get('total_chunks', 0)
+        )
         
     except Exception as e:
-        print(f"\n❌ Error processing repository {repo_id}: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error processing repository %s: %s", repo_id, e)
         
         # Update status to failed
         try:
+            db.rollback()
             repo = db.query(Repository).filter(Repository.id == repo_id).first()
             if repo:
                 repo.status = "failed"
@@ -132,13 +374,12 @@ def process_repository_ingestion(repo_id: int, github_url: str, db: Session):
                 repo.repo_metadata = current_metadata
                 db.commit()
         except Exception as db_error:
-            print(f"❌ Failed to update repository status: {str(db_error)}")
+            logger.error("❌ Failed to update repository status: %s", db_error)
 
 
 @router.post("/ingest", response_model=RepositoryIngestResponse, status_code=status.HTTP_202_ACCEPTED)
 async def ingest_repository(
     request: RepositoryIngestRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
@@ -178,12 +419,7 @@ async def ingest_repository(
                 existing_repo.status = "pending"
                 db.commit()
                 
-                background_tasks.add_task(
-                    process_repository_ingestion,
-                    existing_repo.id,
-                    request.github_url,
-                    db
-                )
+                submit_ingestion(existing_repo.id, request.github_url)
                 
                 return RepositoryIngestResponse(
                     id=existing_repo.id,
@@ -193,22 +429,16 @@ async def ingest_repository(
                 )
         
         # Create new repository record
-        new_repo = Repository(
-            github_url=request.github_url,
-            status="pending",
-            metadata={}
-        )
-        db.add(new_repo)
+        # INSERT ... RETURNING gets the generated id without a refresh SELECT
+        new_repo = db.execute(
+            insert(Repository)
+            .values(github_url=request.github_url, status="pending", repo_metadata={})
+            .returning(Repository.id, Repository.github_url, Repository.status)
+        ).one()
         db.commit()
-        db.refresh(new_repo)
         
         # Start background processing
-        background_tasks.add_task(
-            process_repository_ingestion,
-            new_repo.id,
-            request.github_url,
-            db
-        )
+        submit_ingestion(new_repo.id, request.github_url)
         
         return RepositoryIngestResponse(
             id=new_repo.id,
@@ -218,7 +448,7 @@ async def ingest_repository(
         )
         
     except Exception as e:
-        print(f"❌ Error in ingest endpoint: {str(e)}")
+        logger.error("❌ Error in ingest endpoint: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to start repository ingestion: {str(e)}"
@@ -249,8 +479,8 @@ async def get_repository_status(repo_id: int, db: Session = Depends(get_db)):
 
 @router.post("/{repo_id}/chat", response_model=ChatResponse)
 async def chat_with_repository(
-    repo_id: int,
     request: ChatRequest,
+    repo_id: int = Depends(get_ready_repo),
     db: Session = Depends(get_db)
 ):
     """
@@ -269,36 +499,14 @@ async def chat_with_repository(
     - include_metadata: Whether to return query metadata
     """
     try:
-        # Check if repository exists and is ready
-        repo = db.query(Repository).filter(Repository.id == repo_id).first()
-        
-        if not repo:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Repository with ID {repo_id} not found"
-            )
-        
-        if repo.status != "completed":
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Repository is not ready for chat. Current status: {repo.status}"
-            )
-        
         # Get chat history for context (last 3 messages)
-        recent_messages = db.query(ChatMessage)\
-            .filter(ChatMessage.repo_id == repo_id)\
-            .order_by(ChatMessage.created_at.desc())\
-            .limit(3)\
-            .all()
-        
-        chat_history = [
-            {"question": msg.question, "answer": msg.answer}
-            for msg in reversed(recent_messages)
-        ]
+        chat_history = get_recent_chat_history(db, repo_id, limit=3)
         
         # Query the codebase using RAG with all parameters
-        print(f"💬 Processing chat request for repo {repo_id}: {request.question}")
-        print(f"   Settings: top_k={request.top_k}, style={request.prompt_style}")
+        logger.info(
+            "💬 Processing chat request for repo %s: %s (top_k=%s, style=%s)",
+            repo_id, request.question, request.top_k, request.prompt_style
+        )
         
         rag_result = query_codebase(
             repo_id=repo_id,
@@ -310,56 +518,34 @@ async def chat_with_repository(
             include_metadata=request.include_metadata
         )
         
-        # Convert sources to schema format with type safety
-        sources = []
-        for src in rag_result.get("sources", []):
-            # Ensure lines is a string
-            lines_value = src.get("lines")
-            if lines_value is not None:
-                if isinstance(lines_value, int):
-                    lines_str = str(lines_value)
-                else:
-                    lines_str = str(lines_value)
-            else:
-                lines_str = None
-            
-            sources.append(
-                SourceReference(
-                    file_path=src["file_path"],
-                    language=src["language"],
-                    relevance_score=src["relevance_score"],
-                    lines=lines_str
-                )
-            )
+        # Plain dicts are stored as-is; the response wraps them without re-validating
+        sources_dicts = source_dicts(rag_result.get("sources", []))
         
         # Save chat message to database
-        chat_message = ChatMessage(
+        chat_message = save_chat_message(
+            db,
             repo_id=repo_id,
             question=request.question,
             answer=rag_result["answer"],
-            sources=[src.dict() for src in sources],
+            sources=sources_dicts,
             metadata=rag_result.get("metadata")
         )
-        db.add(chat_message)
-        db.commit()
-        db.refresh(chat_message)
         
-        print(f"✅ Chat response saved with ID: {chat_message.id}")
+        logger.info("✅ Chat response saved with ID: %s", chat_message.id)
         
         return ChatResponse(
             id=chat_message.id,
-            question=chat_message.question,
-            answer=chat_message.answer,
-            sources=sources,
-            metadata=chat_message.metadata,
+            question=request.question,
+            answer=rag_result["answer"],
+            sources=[SourceReference.model_construct(**src) for src in sources_dicts],
+            metadata=rag_result.get("metadata"),
             created_at=chat_message.created_at
         )
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error in chat endpoint: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error in chat endpoint: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to process chat request: {str(e)}"
@@ -367,8 +553,8 @@ async def chat_with_repository(
 
 @router.post("/{repo_id}/chat/stream")
 async def chat_with_repository_stream(
-    repo_id: int,
     request: ChatRequest,
+    repo_id: int = Depends(get_ready_repo),
     db: Session = Depends(get_db)
 ):
     """
@@ -378,89 +564,50 @@ async def chat_with_repository_stream(
     The stream includes both the answer text and source references at the end.
     """
     try:
-        # Check if repository exists and is ready
-        repo = db.query(Repository).filter(Repository.id == repo_id).first()
-        
-        if not repo:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Repository with ID {repo_id} not found"
-            )
-        
-        if repo.status != "completed":
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Repository is not ready for chat. Current status: {repo.status}"
-            )
-        
         # Get chat history for context
-        recent_messages = db.query(ChatMessage)\
-            .filter(ChatMessage.repo_id == repo_id)\
-            .order_by(ChatMessage.created_at.desc())\
-            .limit(3)\
-            .all()
-        
-        chat_history = [
-            {"question": msg.question, "answer": msg.answer}
-            for msg in reversed(recent_messages)
-        ]
+        chat_history = get_recent_chat_history(db, repo_id, limit=3)
         
-        print(f"💬 Streaming chat request for repo {repo_id}: {request.question}")
+        logger.info("💬 Streaming chat request for repo %s: %s", repo_id, request.question)
         
         async def generate():
             full_answer = ""
             sources_data = []
             
             try:
-                for chunk in query_codebase_stream(
+                for kind, chunk in query_codebase_stream(
                     repo_id=repo_id,
                     query=request.question,
                     top_k=request.top_k,
                     chat_history=chat_history,
                     prompt_style=request.prompt_style
                 ):
-                    # Check if this is the sources marker
-                    if "[SOURCES]" in chunk and "[/SOURCES]" in chunk:
-                        # Extract and parse sources
-                        start = chunk.find("[SOURCES]") + len("[SOURCES]")
-                        end = chunk.find("[/SOURCES]")
-                        sources_json = chunk[start:end]
-                        sources_data = json.loads(sources_json)
-                        # Don't yield the marker to client
+                    # Sources arrive once, after the last token
+                    if kind == "sources":
+                        sources_data = chunk
                         continue
                     
                     full_answer += chunk
-                    yield f"data: {json.dumps({'type': 'token', 'content': chunk})}\n\n"
+                    yield sse_event({'type': 'token', 'content': chunk})
                 
                 # Send sources as separate event
                 if sources_data:
-                    yield f"data: {json.dumps({'type': 'sources', 'content': sources_data})}\n\n"
+                    yield sse_event({'type': 'sources', 'content': sources_data})
                 
                 # Save to database after streaming completes
-                sources = [
-                    SourceReference(
-                        file_path=src["file_path"],
-                        language=src["language"],
-                        relevance_score=src["relevance_score"]
-                    )
-                    for src in sources_data
-                ]
-                
-                chat_message = ChatMessage(
+                chat_message = save_chat_message(
+                    db,
                     repo_id=repo_id,
                     question=request.question,
                     answer=full_answer,
-                    sources=[src.dict() for src in sources],
+                    sources=source_dicts(sources_data),
                     metadata={"streaming": True, "prompt_style": request.prompt_style}
                 )
-                db.add(chat_message)
-                db.commit()
                 
-                yield f"data: {json.dumps({'type': 'done', 'message_id': chat_message.id})}\n\n"
+                yield sse_event({'type': 'done', 'message_id': chat_message.id})
                 
             except Exception as e:
                 error_msg = f"Error: {str(e)}"
-                yield f"data: {json.dumps({'type': 'error', 'content': error_msg})}\n\n"
+                yield sse_event({'type': 'error', 'content': error_msg})
         
         return StreamingResponse(
             generate(),
@@ -474,8 +621,7 @@ async def chat_with_repository_stream(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error in streaming chat endpoint: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error in streaming chat endpoint: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to process streaming chat request: {str(e)}"
@@ -484,8 +630,8 @@ async def chat_with_repository_stream(
 
 @router.post("/{repo_id}/search", response_model=List[CodeChunkResponse])
 async def search_code(
-    repo_id: int,
     request: CodeSearchRequest,
+    repo_id: int = Depends(get_ready_repo),
     db: Session = Depends(get_db)
 ):
     """
@@ -495,21 +641,6 @@ async def search_code(
     Useful for exploring the codebase or building custom interfaces.
     """
     try:
-        # Check if repository exists and is ready
-        repo = db.query(Repository).filter(Repository.id == repo_id).first()
-        
-        if not repo:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Repository with ID {repo_id} not found"
-            )
-        
-        if repo.status != "completed":
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Repository is not ready. Current status: {repo.status}"
-            )
-        
         # Search for similar code
         chunks = search_similar_code(
             repo_id=repo_id,
@@ -536,8 +667,7 @@ async def search_code(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error in search endpoint: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error in search endpoint: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to search code: {str(e)}"
@@ -577,8 +707,6 @@ async def get_chat_history(
 @router.delete("/{repo_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_repository(repo_id: int, db: Session = Depends(get_db)):
     """Delete a repository and all associated data."""
-    from app.models import CodeChunk, Symbol, IndexJob, SearchQuery, RepositoryFile  # Import all models
-    
     repo = db.query(Repository).filter(Repository.id == repo_id).first()
     
     if not repo:
@@ -588,78 +716,43 @@ async def delete_repository(repo_id: int, db: Session = Depends(get_db)):
         )
     
     try:
-        print(f"\n🗑️  Starting deletion of repository {repo_id}...")
+        logger.info("🗑️  Starting deletion of repository %s...", repo_id)
         
         # 1. Delete ChromaDB collection
         from app.services.embedding_service import chroma_client
         try:
             collection_name = f"repo_{repo_id}"
             chroma_client.delete_collection(name=collection_name)
-            print(f"✅ Deleted ChromaDB collection: {collection_name}")
+            logger.info("✅ Deleted ChromaDB collection: %s", collection_name)
         except ValueError:
-            print(f"ℹ️  ChromaDB collection doesn't exist (already deleted)")
+            logger.info("ℹ️  ChromaDB collection doesn't exist (already deleted)")
         except Exception as e:
-            print(f"⚠️  Warning: Could not delete ChromaDB collection: {str(e)}")
+            logger.warning("⚠️  Could not delete ChromaDB collection: %s", e)
         
         # 2. Delete local cloned files
         if repo.local_path and os.path.exists(repo.local_path):
             try:
-                shutil.rmtree(repo.local_path, ignore_errors=True)
-                print(f"✅ Deleted local files: {repo.local_path}")
+                remove_local_clone(repo.local_path)
+                logger.info("✅ Deleted local files: %s", repo.local_path)
             except Exception as e:
-                print(f"⚠️  Warning: Could not delete local files: {str(e)}")
-        
-        # 3. Delete all related records in order (to respect foreign keys)
-        
-        # Delete search queries
-        search_count = db.query(SearchQuery).filter(SearchQuery.repo_id == repo_id).count()
-        db.query(SearchQuery).filter(SearchQuery.repo_id == repo_id).delete()
-        print(f"✅ Deleted {search_count} search queries")
-        
-        # Delete index jobs
-        job_count = db.query(IndexJob).filter(IndexJob.repo_id == repo_id).count()
-        db.query(IndexJob).filter(IndexJob.repo_id == repo_id).delete()
-        print(f"✅ Deleted {job_count} index jobs")
-        
-        # Delete symbols (references code_files)
-        symbol_count = db.query(Symbol).filter(Symbol.repo_id == repo_id).count()
-        db.query(Symbol).filter(Symbol.repo_id == repo_id).delete()
-        print(f"✅ Deleted {symbol_count} symbols")
-        
-        # Delete code chunks (references code_files)
-        chunk_count = db.query(CodeChunk).filter(CodeChunk.repo_id == repo_id).count()
-        db.query(CodeChunk).filter(CodeChunk.repo_id == repo_id).delete()
-        print(f"✅ Deleted {chunk_count} code chunks")
-        
-        # Delete repository files
-        repo_file_count = db.query(RepositoryFile).filter(RepositoryFile.repo_id == repo_id).count()
-        db.query(RepositoryFile).filter(RepositoryFile.repo_id == repo_id).delete()
-        print(f"✅ Deleted {repo_file_count} repository files")
-        
-        # Get counts for code_files and chat_messages (these will cascade)
-        file_count = db.query(CodeFile).filter(CodeFile.repo_id == repo_id).count()
-        chat_count = db.query(ChatMessage).filter(ChatMessage.repo_id == repo_id).count()
+                logger.warning("⚠️  Could not delete local files: %s", e)
         
-        # 4. Delete repository (cascade will handle code_files and chat_messages)
-        db.delete(repo)
+        # 3. Delete all related records and the repository in one round trip
+        counts = delete_repository_rows(db, repo_id, delete_repository=True)
         db.commit()
+        invalidate_repo(repo_id)
         
-        print(f"✅ Deleted repository {repo_id}")
-        print(f"   - {search_count} search queries")
-        print(f"   - {job_count} index jobs")
-        print(f"   - {symbol_count} symbols")
-        print(f"   - {chunk_count} code chunks")
-        print(f"   - {repo_file_count} repository files")
-        print(f"   - {file_count} code files")
-        print(f"   - {chat_count} chat messages")
-        print(f"{'='*60}\n")
+        logger.info(
+            "✅ Deleted repository %s (%s)",
+            repo_id,
+            ", ".join(f"{count} {table_name.replace('_', ' ')}" for table_name, count in counts.items())
+        )
         
         return None  # 204 No Content
         
     except Exception as e:
         db.rollback()
-        print(f"❌ Error deleting repository: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error deleting repository: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to delete repository: {str(e)}"
@@ -699,7 +792,7 @@ async def check_rag_health():
         health_status = check_service_health()
         return HealthCheckResponse(**health_status)
     except Exception as e:
-        print(f"❌ Health check failed: {str(e)}")
+        logger.error("❌ Health check failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"RAG service is unhealthy: {str(e)}"
@@ -708,7 +801,6 @@ async def check_rag_health():
 @router.post("/{repo_id}/reingest", response_model=RepositoryIngestResponse)
 async def reingest_repository(
     repo_id: int,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
@@ -740,29 +832,27 @@ async def reingest_repository(
             )
         
         # Delete old data
-        from app.models import CodeChunk, Symbol, RepositoryFile
         from app.services.embedding_service import chroma_client
         
-        print(f"\n🔄 Re-ingesting repository {repo_id}...")
+        logger.info("🔄 Re-ingesting repository %s...", repo_id)
         
-        # Delete ChromaDB collection
-        try:
-            chroma_client.delete_collection(name=f"repo_{repo_id}")
-            print(f"✅ Deleted old embeddings")
-        except:
-            pass
-        
-        # Delete related records
-        db.query(Symbol).filter(Symbol.repo_id == repo_id).delete()
-        db.query(CodeChunk).filter(CodeChunk.repo_id == repo_id).delete()
-        db.query(RepositoryFile).filter(RepositoryFile.repo_id == repo_id).delete()
-        db.query(CodeFile).filter(CodeFile.repo_id == repo_id).delete()
-        db.query(ChatMessage).filter(ChatMessage.repo_id == repo_id).delete()
+        def delete_old_embeddings():
+            try:
+                chroma_client.delete_collection(name=f"repo_{repo_id}")
+                logger.info("✅ Deleted old embeddings")
+            except:
+                pass
+        
+        # Drop the ChromaDB collection while the related records are deleted
+        await asyncio.gather(
+            asyncio.to_thread(delete_old_embeddings),
+            asyncio.to_thread(delete_repository_rows, db, repo_id, REINGEST_MODELS)
+        )
         
         # Delete local files
         if repo.local_path and os.path.exists(repo.local_path):
             try:
-                shutil.rmtree(repo.local_path, ignore_errors=True)
+                remove_local_clone(repo.local_path)
             except:
                 pass
         
@@ -771,16 +861,12 @@ async def reingest_repository(
         repo.repo_metadata = {"re_ingest": True}
         repo.local_path = None
         db.commit()
+        invalidate_repo(repo_id)
         
-        print(f"✅ Cleaned old data for repository {repo_id}")
+        logger.info("✅ Cleaned old data for repository %s", repo_id)
         
         # Start background processing
-        background_tasks.add_task(
-            process_repository_ingestion,
-            repo.id,
-            repo.github_url,
-            db
-        )
+        submit_ingestion(repo.id, repo.github_url)
         
         return RepositoryIngestResponse(
             id=repo.id,
@@ -792,8 +878,7 @@ async def reingest_repository(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error in reingest endpoint: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ Error in reingest endpoint: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to start re-ingestion: {str(e)}"
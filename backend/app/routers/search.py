@@ -1,24 +1,35 @@
 # backend/app/routers/search.py
 
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
-from sqlalchemy.orm import Session
-from typing import Optional, List
+from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import select, update, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only, selectinload, undefer
+from typing import Optional, List, Tuple
+import asyncio
 import time
 
-from app.database import get_db
-from app.models import Repository, SearchQuery, CodeFile, CodeChunk, Symbol, IndexJob
+from app.database import get_db, get_async_db, AsyncSessionLocal
+from app.models import Repository, CodeFile, CodeChunk, Symbol, IndexJob
 from app.schemas.search import (
-    SearchRequest, SearchResponse, SearchResultItem,
+    SearchRequest, SearchResponse,
     SymbolSearchResponse, SymbolInfo,
     IndexJobRequest, IndexJobStatus,
     SearchMode, MatchType
 )
-from app.services.hybrid_search_service import hybrid_search_service
+from app.services.embedding_service import query_embedding_cache_status
+from app.services.hybrid_search_service import hybrid_search_service, context_window, symbol_name_filter
+from app.services.code_parser import slice_lines
 from app.services.indexing_service import indexing_service
+from app.services.search_log import search_log
+from app.config.vector_backend import decode_chunk_id
+from app.routers.repositories import delete_repository_rows, sse_event
+from app.services.repo_cache import get_latest_job, index_job_changed, watch_index_jobs, unwatch_index_jobs
 
 # Import ChromaDB client
 try:
     from app.config.chroma import get_chroma_client
+    from app.config.vector_backend import get_vector_store_count, delete_vector_store
     chroma_client = get_chroma_client()
 except Exception as e:
     print(f"Warning: ChromaDB client initialization failed: {e}")
@@ -30,6 +41,35 @@ router = APIRouter(
 )
 
 
+# Index job statuses after which nothing changes until a new job starts
+INDEX_JOB_FINAL_STATUSES = frozenset({"completed", "failed", "cancelled"})
+# Seconds between SSE comments that keep idle /index/events connections open
+INDEX_EVENTS_KEEPALIVE = 15
+SSE_KEEPALIVE = b": keep-alive\n\n"
+
+# Columns the symbol search list needs (the covering index includes them)
+SYMBOL_LIST_COLUMNS = (
+    Symbol.id, Symbol.file_id, Symbol.name, Symbol.qualified_name, Symbol.symbol_type,
+    Symbol.start_line, Symbol.end_line, Symbol.language, Symbol.scope
+)
+
+
+def _count_subquery(model, repo_id: int):
+    """Scalar subquery counting a model's rows for one repository."""
+    return (
+        select(func.count()).select_from(model).where(model.repo_id == repo_id)
+    ).scalar_subquery()
+
+
+async def _index_counts(db: AsyncSession, repo_id: int) -> Tuple[int, int, int]:
+    """Count a repository's files, chunks and symbols in one round-trip."""
+    return tuple((await db.execute(select(
+        _count_subquery(CodeFile, repo_id),
+        _count_subquery(CodeChunk, repo_id),
+        _count_subquery(Symbol, repo_id)
+    ))).one())
+
+
 @router.post("/index", response_model=IndexJobStatus, status_code=202)
 async def start_indexing(
     repo_id: int,
@@ -98,23 +138,26 @@ async def start_indexing(
 async def get_index_status(
     repo_id: int,
     job_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get indexing job status.
     
     If job_id not provided, returns latest job for this repo.
     """
-    if job_id:
-        job = db.query(IndexJob).filter(
+    if not job_id:
+        # Latest job (cached briefly for dashboards polling this endpoint)
+        latest_job = await get_latest_job(repo_id, db)
+        if not latest_job:
+            raise HTTPException(status_code=404, detail="No indexing job found")
+        return latest_job
+    
+    job = (await db.execute(
+        select(IndexJob).where(
             IndexJob.id == job_id,
             IndexJob.repo_id == repo_id
-        ).first()
-    else:
-        # Get latest job
-        job = db.query(IndexJob).filter(
-            IndexJob.repo_id == repo_id
-        ).order_by(IndexJob.created_at.desc()).first()
+        )
+    )).scalars().first()
     
     if not job:
         raise HTTPException(status_code=404, detail="No indexing job found")
@@ -133,7 +176,51 @@ async def get_index_status(
     )
 
 
-@router.get("/search", response_model=SearchResponse)
+@router.get("/index/events")
+async def stream_index_events(repo_id: int, request: Request):
+    """
+    Server-sent events with the latest indexing job status.
+    
+    Sends the current status immediately, then a new event each time the
+    job changes, until it completes, fails or is cancelled. Replaces
+    polling `GET /index/status`.
+    """
+    async def generate():
+        job_event = watch_index_jobs(repo_id)
+        try:
+            last_payload = None
+            while True:
+                job_event.clear()
+                async with AsyncSessionLocal() as db:
+                    job = await get_latest_job(repo_id, db)
+                
+                payload = job.model_dump(mode="json") if job else {"status": "none"}
+                if payload != last_payload:
+                    yield sse_event(payload)
+                    last_payload = payload
+                if job and job.status in INDEX_JOB_FINAL_STATUSES:
+                    break
+                
+                try:
+                    await asyncio.wait_for(job_event.wait(), timeout=INDEX_EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield SSE_KEEPALIVE
+                if await request.is_disconnected():
+                    break
+        finally:
+            unwatch_index_jobs(repo_id, job_event)
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+    )
+
+
+@router.get("/search", response_model=SearchResponse, response_class=ORJSONResponse)
 async def search_code(
     repo_id: int,
     q: str = Query(..., description="Search query", min_length=1),
@@ -146,7 +233,7 @@ async def search_code(
     per_page: int = Query(default=20, ge=1, le=100, description="Results per page"),
     include_tests: bool = Query(default=True, description="Include test files"),
     case_sensitive: bool = Query(default=False, description="Case sensitive search"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Search code in repository.
@@ -168,8 +255,8 @@ async def search_code(
     start_time = time.time()
     
     # Check repository exists
-    repo = db.query(Repository).filter(Repository.id == repo_id).first()
-    if not repo:
+    repo_exists = await db.scalar(select(Repository.id).where(Repository.id == repo_id))
+    if repo_exists is None:
         raise HTTPException(status_code=404, detail="Repository not found")
     
     # Build filters
@@ -189,41 +276,36 @@ async def search_code(
             query=q,
             mode=mode,
             filters=filters,
-            db=db
+            db=db,
+            limit=per_page,
+            offset=(page - 1) * per_page
         )
         
-        # Apply pagination
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        paginated_results = results[start_idx:end_idx]
-        
-        # Format results
+        # Format results (the service returns only the requested page).
+        # Plain dicts in SearchResultItem's shape, serialized by orjson
+        # without building a model per result.
         formatted_results = []
-        for result in paginated_results:
-            # Highlight snippet
-            highlighted_snippet = hybrid_search_service._highlight_snippet(
-                result['snippet'], q
-            )
-            
-            formatted_results.append(SearchResultItem(
-                chunk_id=result.get('chunk_id'),
-                file_id=result['file_id'],
-                file_path=result['file_path'],
-                snippet=result['snippet'],
-                highlighted_snippet=highlighted_snippet,
-                start_line=result['start_line'],
-                end_line=result['end_line'],
-                match_type=result['match_type'],
-                relevance_score=result['relevance_score'],
-                semantic_score=result.get('semantic_score'),
-                keyword_score=result.get('keyword_score'),
-                symbol_score=result.get('symbol_score'),
-                language=result['language'],
-                symbol_name=result.get('symbol_name'),
-                symbol_type=result.get('symbol_type'),
-                context_before=None,  # Can be fetched separately
-                context_after=None
-            ))
+        for result in results:
+            chunk_id = result.get('chunk_id')
+            formatted_results.append({
+                'chunk_id': str(chunk_id) if chunk_id is not None else None,
+                'file_id': result['file_id'],
+                'file_path': result['file_path'],
+                'snippet': result['snippet'],
+                'highlighted_snippet': hybrid_search_service._highlight_snippet(result['snippet'], q),
+                'start_line': result['start_line'],
+                'end_line': result['end_line'],
+                'match_type': result['match_type'],
+                'relevance_score': result['relevance_score'],
+                'semantic_score': result.get('semantic_score'),
+                'keyword_score': result.get('keyword_score'),
+                'symbol_score': result.get('symbol_score'),
+                'language': result['language'],
+                'symbol_name': result.get('symbol_name'),
+                'symbol_type': result.get('symbol_type'),
+                'context_before': None,  # Can be fetched separately
+                'context_after': None
+            })
         
         # Calculate total pages
         total_pages = (total_results + per_page - 1) // per_page
@@ -231,30 +313,35 @@ async def search_code(
         # Calculate latency
         latency_ms = int((time.time() - start_time) * 1000)
         
-        # Log search query
-        search_query = SearchQuery(
-            repo_id=repo_id,
-            query_text=q,
-            query_mode=mode.value,
-            results_count=total_results,
-            top_result_score=formatted_results[0].relevance_score if formatted_results else None,
-            latency_ms=latency_ms
-        )
-        db.add(search_query)
-        db.commit()
+        # Log search query (written in the background)
+        search_log.log({
+            "repo_id": repo_id,
+            "query_text": q,
+            "query_mode": mode.value,
+            "results_count": total_results,
+            "top_result_score": formatted_results[0]['relevance_score'] if formatted_results else None,
+            "latency_ms": latency_ms
+        })
         
-        return SearchResponse(
-            query=q,
-            mode=mode,
-            total_results=total_results,
-            page=page,
-            per_page=per_page,
-            total_pages=total_pages,
-            results=formatted_results,
-            latency_ms=latency_ms,
-            filters_applied=filters,
-            suggestions=None  # Can implement query suggestions
-        )
+        response = ORJSONResponse({
+            'query': q,
+            'mode': mode,
+            'total_results': total_results,
+            'page': page,
+            'per_page': per_page,
+            'total_pages': total_pages,
+            'results': formatted_results,
+            'latency_ms': latency_ms,
+            'filters_applied': filters,
+            'suggestions': None  # Can implement query suggestions
+        })
+        
+        # Report whether the query embedding was served from cache
+        cache_status = query_embedding_cache_status.get()
+        if cache_status:
+            response.headers["x-embedding-cache"] = cache_status
+        
+        return response
         
     except ValueError as e:
         # Invalid regex or other validation error
@@ -273,28 +360,23 @@ async def search_symbols(
     lang: Optional[str] = Query(None, description="Language filter"),
     symbol_type: Optional[str] = Query(None, description="Symbol type filter"),
     limit: int = Query(default=50, ge=1, le=200),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Search for symbols (functions, classes, variables, etc.)
     
     Examples:
     - `?q=get` - Find all symbols containing "get"
+    - `?q=get*` - Find symbols whose name starts with "get"
     - `?q=getUserById` - Find specific symbol
     - `?q=User&symbol_type=class` - Find classes containing "User"
     """
     start_time = time.time()
     
-    from sqlalchemy import or_, and_
+    from sqlalchemy import and_
     
     # Build query
-    query_filter = and_(
-        Symbol.repo_id == repo_id,
-        or_(
-            Symbol.name.ilike(f"%{q}%"),
-            Symbol.qualified_name.ilike(f"%{q}%")
-        )
-    )
+    query_filter = and_(Symbol.repo_id == repo_id, symbol_name_filter(q))
     
     if lang:
         query_filter = and_(query_filter, Symbol.language == lang)
@@ -302,34 +384,76 @@ async def search_symbols(
     if symbol_type:
         query_filter = and_(query_filter, Symbol.symbol_type == symbol_type)
     
-    # Execute query
-    symbols = db.query(Symbol).filter(query_filter).limit(limit).all()
+    # Execute query (signature/docstring are served by the details endpoint)
+    symbols = (await db.execute(
+        select(Symbol).where(query_filter)
+        .options(
+            load_only(*SYMBOL_LIST_COLUMNS),
+            selectinload(Symbol.file).load_only(CodeFile.file_path)
+        )
+        .limit(limit)
+    )).scalars().all()
     
-    # Format results
+    # Format results as plain dicts in SymbolInfo's shape; FastAPI validates
+    # the whole response once against response_model
     symbol_results = []
     for symbol in symbols:
-        symbol_results.append(SymbolInfo(
-            id=symbol.id,
-            name=symbol.name,
-            qualified_name=symbol.qualified_name,
-            symbol_type=symbol.symbol_type,
-            signature=symbol.signature,
-            docstring=symbol.docstring,
-            file_path=symbol.file.file_path if symbol.file else "unknown",
-            start_line=symbol.start_line,
-            end_line=symbol.end_line,
-            language=symbol.language,
-            scope=symbol.scope,
-            parent_symbol=None  # Can populate if needed
-        ))
+        symbol_results.append({
+            'id': symbol.id,
+            'name': symbol.name,
+            'qualified_name': symbol.qualified_name,
+            'symbol_type': symbol.symbol_type,
+            'signature': None,
+            'docstring': None,
+            'file_path': symbol.file.file_path if symbol.file else "unknown",
+            'start_line': symbol.start_line,
+            'end_line': symbol.end_line,
+            'language': symbol.language,
+            'scope': symbol.scope,
+            'parent_symbol': None  # Can populate if needed
+        })
     
     latency_ms = int((time.time() - start_time) * 1000)
     
-    return SymbolSearchResponse(
-        query=q,
-        total_results=len(symbol_results),
-        symbols=symbol_results,
-        latency_ms=latency_ms
+    return {
+        'query': q,
+        'total_results': len(symbol_results),
+        'symbols': symbol_results,
+        'latency_ms': latency_ms
+    }
+
+
+@router.get("/symbols/{symbol_id}/details", response_model=SymbolInfo)
+async def get_symbol_details(
+    repo_id: int,
+    symbol_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get one symbol including its signature and docstring.
+    """
+    symbol = (await db.execute(
+        select(Symbol)
+        .where(Symbol.id == symbol_id, Symbol.repo_id == repo_id)
+        .options(selectinload(Symbol.file).load_only(CodeFile.file_path))
+    )).scalars().first()
+    
+    if not symbol:
+        raise HTTPException(status_code=404, detail="Symbol not found")
+    
+    return SymbolInfo(
+        id=symbol.id,
+        name=symbol.name,
+        qualified_name=symbol.qualified_name,
+        symbol_type=symbol.symbol_type,
+        signature=symbol.signature,
+        docstring=symbol.docstring,
+        file_path=symbol.file.file_path if symbol.file else "unknown",
+        start_line=symbol.start_line,
+        end_line=symbol.end_line,
+        language=symbol.language,
+        scope=symbol.scope,
+        parent_symbol=None
     )
 
 
@@ -340,7 +464,7 @@ async def get_file_content(
     start: Optional[int] = Query(None, description="Start line (1-indexed)"),
     end: Optional[int] = Query(None, description="End line (1-indexed)"),
     context: int = Query(default=5, description="Context lines around selection"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get file content with optional line range.
@@ -350,24 +474,24 @@ async def get_file_content(
     - Jumping to specific lines
     - Getting context around a match
     """
-    file = db.query(CodeFile).filter(
-        CodeFile.id == file_id,
-        CodeFile.repo_id == repo_id
-    ).first()
+    file = (await db.execute(
+        select(CodeFile).options(undefer(CodeFile.content)).where(
+            CodeFile.id == file_id,
+            CodeFile.repo_id == repo_id
+        )
+    )).scalars().first()
     
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
     
-    lines = file.content.split('\n')
-    total_lines = len(lines)
+    total_lines = file.content.count('\n') + 1
     
     # If start/end specified, extract range with context
     if start is not None and end is not None:
         context_start = max(1, start - context)
         context_end = min(total_lines, end + context)
         
-        selected_lines = lines[context_start-1:context_end]
-        content = '\n'.join(selected_lines)
+        content = slice_lines(file.content, context_start, context_end)
         
         return {
             'file_id': file.id,
@@ -398,7 +522,7 @@ async def preview_search_results(
     repo_id: int,
     chunk_ids: List[str],
     context_lines: int = Query(default=5, description="Context lines"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get full snippets with context for specific chunk IDs.
@@ -408,41 +532,50 @@ async def preview_search_results(
     - Fetching more context on demand
     - Preview before opening file
     """
-    previews = []
-    
+    # Parse vector-store chunk ids (packed or legacy chunk_{repo}_{file}_{index})
+    keys = {}
     for chunk_id in chunk_ids:
-        # Parse chunk_id format: chunk_{repo_id}_{file_id}_{chunk_index}
-        parts = chunk_id.split('_')
-        if len(parts) != 4:
-            continue
-        
-        file_id = int(parts[2])
-        chunk_index = int(parts[3])
-        
-        chunk = db.query(CodeChunk).filter(
+        parsed = decode_chunk_id(chunk_id)
+        if parsed:
+            keys[chunk_id] = parsed[1:]
+    
+    if not keys:
+        return {'previews': []}
+    
+    # One query for all requested chunks, one for their files
+    chunk_rows = (await db.execute(
+        select(CodeChunk.file_id, CodeChunk.chunk_index, CodeChunk.start_line, CodeChunk.end_line).where(
             CodeChunk.repo_id == repo_id,
-            CodeChunk.file_id == file_id,
-            CodeChunk.chunk_index == chunk_index
-        ).first()
+            tuple_(CodeChunk.file_id, CodeChunk.chunk_index).in_(list(set(keys.values())))
+        )
+    )).all()
+    chunks = {(row.file_id, row.chunk_index): row for row in chunk_rows}
+    
+    file_rows = (await db.execute(
+        select(CodeFile.id, CodeFile.file_path, CodeFile.language, CodeFile.content).where(
+            CodeFile.id.in_({row.file_id for row in chunk_rows})
+        )
+    )).all()
+    files = {row.id: row for row in file_rows}
+    
+    previews = []
+    for chunk_id, key in keys.items():
+        chunk = chunks.get(key)
+        file = files.get(key[0])
+        if not chunk or not file:
+            continue
         
-        if chunk:
-            # Get context
-            context = await hybrid_search_service.get_context(
-                file_id=chunk.file_id,
-                start_line=chunk.start_line,
-                end_line=chunk.end_line,
-                context_lines=context_lines,
-                db=db
-            )
-            
-            previews.append({
-                'chunk_id': chunk_id,
-                'file_path': context['file_path'],
-                'language': context['language'],
-                'content': context['content'],
-                'start_line': context['start_line'],
-                'end_line': context['end_line']
-            })
+        content, start_line, end_line = context_window(
+            file.content, chunk.start_line, chunk.end_line, context_lines
+        )
+        previews.append({
+            'chunk_id': chunk_id,
+            'file_path': file.file_path,
+            'language': file.language,
+            'content': content,
+            'start_line': start_line,
+            'end_line': end_line
+        })
     
     return {'previews': previews}
 
@@ -450,58 +583,45 @@ async def preview_search_results(
 @router.delete("/index", status_code=200)
 async def clear_index(
     repo_id: int,
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Clear all indexing data for a repository.
     Use this before re-indexing if you want to start fresh.
     """
     try:
-        # Get counts before deleting
-        chunks_count = db.query(CodeChunk).filter(CodeChunk.repo_id == repo_id).count()
-        symbols_count = db.query(Symbol).filter(Symbol.repo_id == repo_id).count()
-        files_count = db.query(CodeFile).filter(CodeFile.repo_id == repo_id).count()
-        
-        # Delete chunks
-        db.query(CodeChunk).filter(
-            CodeChunk.repo_id == repo_id
-        ).delete(synchronize_session=False)
-        
-        # Delete symbols
-        db.query(Symbol).filter(
-            Symbol.repo_id == repo_id
-        ).delete(synchronize_session=False)
-        
-        # Delete code files
-        db.query(CodeFile).filter(
-            CodeFile.repo_id == repo_id
-        ).delete(synchronize_session=False)
+        # Delete chunks, symbols and code files (one CTE statement on PostgreSQL)
+        deleted = await db.run_sync(
+            delete_repository_rows, repo_id, (CodeChunk, Symbol, CodeFile)
+        )
         
         # Mark all index jobs as cancelled
-        db.query(IndexJob).filter(
-            IndexJob.repo_id == repo_id,
-            IndexJob.status.in_(['pending', 'running'])
-        ).update({'status': 'cancelled'}, synchronize_session=False)
+        await db.execute(
+            update(IndexJob)
+            .where(
+                IndexJob.repo_id == repo_id,
+                IndexJob.status.in_(['pending', 'running'])
+            )
+            .values(status='cancelled'),
+            execution_options={"synchronize_session": False}
+        )
         
-        db.commit()
+        await db.commit()
+        index_job_changed(repo_id)
         
-        # Delete ChromaDB collection
+        # Delete the vector collection after the response is sent
         if chroma_client:
-            collection_name = f"repo_{repo_id}_chunks"
-            try:
-                chroma_client.delete_collection(name=collection_name)
-                print(f"✅ Deleted ChromaDB collection: {collection_name}")
-            except Exception as e:
-                print(f"ℹ️  No ChromaDB collection to delete: {e}")
+            background_tasks.add_task(delete_vector_store, f"repo_{repo_id}_chunks")
         
         return {
             "message": "Index cleared successfully",
-            "files_deleted": files_count,
-            "chunks_deleted": chunks_count,
-            "symbols_deleted": symbols_count
+            "files_deleted": deleted[CodeFile.__tablename__],
+            "chunks_deleted": deleted[CodeChunk.__tablename__],
+            "symbols_deleted": deleted[Symbol.__tablename__]
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Failed to clear index: {str(e)}"
@@ -511,32 +631,25 @@ async def clear_index(
 @router.get("/index/stats")
 async def get_index_stats(
     repo_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get statistics about the current index.
     """
-    files_count = db.query(CodeFile).filter(CodeFile.repo_id == repo_id).count()
-    chunks_count = db.query(CodeChunk).filter(CodeChunk.repo_id == repo_id).count()
-    symbols_count = db.query(Symbol).filter(Symbol.repo_id == repo_id).count()
+    files_count, chunks_count, symbols_count = await _index_counts(db, repo_id)
     
     # Get latest index job
-    latest_job = db.query(IndexJob).filter(
-        IndexJob.repo_id == repo_id
-    ).order_by(IndexJob.created_at.desc()).first()
+    latest_job = await get_latest_job(repo_id, db)
     
-    # Check ChromaDB
-    collection_name = f"repo_{repo_id}_chunks"
+    # Check ChromaDB (count cached briefly, refreshed when the index is rewritten)
     collection_exists = False
     collection_count = 0
     
     if chroma_client:
-        try:
-            collection = chroma_client.get_collection(name=collection_name)
+        cached_count = get_vector_store_count(f"repo_{repo_id}_chunks")
+        if cached_count is not None:
             collection_exists = True
-            collection_count = collection.count()
-        except Exception:
-            pass
+            collection_count = cached_count
     
     return {
         "repo_id": repo_id,
@@ -558,7 +671,7 @@ async def get_file_content_by_id(
     start: Optional[int] = Query(None, description="Start line (1-indexed)"),
     end: Optional[int] = Query(None, description="End line (1-indexed)"),
     context: int = Query(default=5, description="Context lines around selection"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get file content by file ID.
@@ -574,10 +687,12 @@ async def get_file_content_by_id(
         File content with metadata
     """
     # Get the file
-    file = db.query(CodeFile).filter(
-        CodeFile.id == file_id,
-        CodeFile.repo_id == repo_id
-    ).first()
+    file = (await db.execute(
+        select(CodeFile).options(undefer(CodeFile.content)).where(
+            CodeFile.id == file_id,
+            CodeFile.repo_id == repo_id
+        )
+    )).scalars().first()
     
     if not file:
         raise HTTPException(
@@ -585,6 +700,8 @@ async def get_file_content_by_id(
             detail=f"File with ID {file_id} not found in repository {repo_id}"
         )
     
+    total_lines = file.content.count('\n') + 1
+    
     # If no line range specified, return entire file
     if start is None and end is None:
         return {
@@ -593,22 +710,17 @@ async def get_file_content_by_id(
             "language": file.language,
             "content": file.content,
             "start_line": 1,
-            "end_line": len(file.content.split('\n')),
-            "total_lines": len(file.content.split('\n')),
+            "end_line": total_lines,
+            "total_lines": total_lines,
             "metadata": file.file_metadata
         }
     
-    # Extract line range with context
-    lines = file.content.split('\n')
-    total_lines = len(lines)
-    
     # Add context lines
     actual_start = max(1, (start or 1) - context)
     actual_end = min(total_lines, (end or total_lines) + context)
     
-    # Extract lines (convert to 0-indexed)
-    selected_lines = lines[actual_start - 1:actual_end]
-    content_with_context = '\n'.join(selected_lines)
+    # Extract lines
+    content_with_context = slice_lines(file.content, actual_start, actual_end)
     
     return {
         "file_id": file.id,
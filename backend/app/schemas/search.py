@@ -1,7 +1,7 @@
 # backend/app/schemas/search.py
 
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Literal, Optional, Dict, Any
 from enum import Enum
 from datetime import datetime
 
@@ -25,6 +25,11 @@ class MatchType(str, Enum):
     FILENAME = "filename"
 
 
+# MatchType values as a Literal: validated by pydantic-core's string-set
+# fast path instead of enum coercion (MatchType members still validate)
+MatchTypeLiteral = Literal["semantic", "keyword", "symbol", "regex", "filename"]
+
+
 class SearchRequest(BaseModel):
     """Request for code search"""
     q: str = Field(..., description="Search query", min_length=1, max_length=1000)
@@ -44,16 +49,15 @@ class SearchRequest(BaseModel):
     include_tests: bool = Field(default=True, description="Include test files")
     case_sensitive: bool = Field(default=False, description="Case sensitive search")
     
-    class Config:
-        schema_extra = {
-            "example": {
-                "q": "Where is the HTTP handler defined?",
-                "mode": "hybrid",
-                "lang": "python",
-                "page": 1,
-                "per_page": 20
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "q": "Where is the HTTP handler defined?",
+            "mode": "hybrid",
+            "lang": "python",
+            "page": 1,
+            "per_page": 20
         }
+    })
 
 
 class SearchResultItem(BaseModel):
@@ -72,7 +76,7 @@ class SearchResultItem(BaseModel):
     end_line: int
     
     # Matching
-    match_type: List[MatchType] = Field(..., description="How this result matched")
+    match_type: List[MatchTypeLiteral] = Field(..., description="How this result matched")
     relevance_score: float = Field(..., ge=0.0, le=1.0, description="Overall relevance score")
     
     # Score breakdown
@@ -89,20 +93,19 @@ class SearchResultItem(BaseModel):
     context_before: Optional[str] = Field(None, description="Lines before match")
     context_after: Optional[str] = Field(None, description="Lines after match")
     
-    class Config:
-        schema_extra = {
-            "example": {
-                "chunk_id": 42,
-                "file_id": 10,
-                "file_path": "src/api/handlers.py",
-                "snippet": "def handle_request(req):\n    ...",
-                "start_line": 15,
-                "end_line": 25,
-                "match_type": ["semantic", "keyword"],
-                "relevance_score": 0.92,
-                "language": "python"
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "chunk_id": 42,
+            "file_id": 10,
+            "file_path": "src/api/handlers.py",
+            "snippet": "def handle_request(req):\n    ...",
+            "start_line": 15,
+            "end_line": 25,
+            "match_type": ["semantic", "keyword"],
+            "relevance_score": 0.92,
+            "language": "python"
         }
+    })
 
 
 class SearchResponse(BaseModel):
@@ -123,19 +126,18 @@ class SearchResponse(BaseModel):
     filters_applied: Dict[str, Any]
     suggestions: Optional[List[str]] = Field(None, description="Query suggestions")
     
-    class Config:
-        schema_extra = {
-            "example": {
-                "query": "HTTP handler",
-                "mode": "hybrid",
-                "total_results": 15,
-                "page": 1,
-                "per_page": 20,
-                "total_pages": 1,
-                "results": [],
-                "latency_ms": 245
-            }
+    model_config = ConfigDict(json_schema_extra={
+        "example": {
+            "query": "HTTP handler",
+            "mode": "hybrid",
+            "total_results": 15,
+            "page": 1,
+            "per_page": 20,
+            "total_pages": 1,
+            "results": [],
+            "latency_ms": 245
         }
+    })
 
 
 class SymbolInfo(BaseModel):
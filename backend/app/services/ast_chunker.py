@@ -1,9 +1,71 @@
 # backend/app/services/ast_chunker.py
-import hashlib
+import logging
 import re
-from typing import List, Dict
+from math import gcd
+from typing import List, Dict, Set, Tuple
+
+import numpy as np
 
 from app.config.search_config import search_config
+from app.services.embedding_cache import content_hash_bytes
+
+logger = logging.getLogger(__name__)
+
+IDENTIFIER_RE = re.compile(r'\b[a-zA-Z_][a-zA-Z0-9_]*\b')
+
+LANGUAGE_KEYWORDS = {
+    'python': frozenset({'def', 'class', 'import', 'from', 'async', 'await'}),
+    'javascript': frozenset({'function', 'class', 'const', 'let', 'import', 'export'}),
+    'typescript': frozenset({'function', 'class', 'interface', 'type', 'const', 'let'}),
+    'java': frozenset({'class', 'interface', 'public', 'private', 'static'}),
+    'go': frozenset({'func', 'type', 'struct', 'interface', 'var', 'const'}),
+    'php': frozenset({'function', 'class', 'public', 'private', 'protected'}),
+    'css': frozenset({'class', 'id', 'style'}),
+    'sql': frozenset({'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'CREATE'})
+}
+
+COMMON_WORDS = frozenset({'the', 'and', 'or', 'if', 'else', 'for', 'while', 'do', 'return'})
+
+
+def compute_chunk_windows(
+    content_bytes: bytes,
+    chunk_size: int,
+    overlap: int
+) -> List[Tuple[int, int, int, int]]:
+    """
+    Compute overlapping line windows over UTF-8 encoded content.
+    Newlines are located with one vectorised scan and all window bounds are
+    derived with array arithmetic, so there is no per-line Python work.
+    
+    Args:
+        content_bytes: Encoded file content
+        chunk_size: Lines per window
+        overlap: Lines shared by consecutive windows
+        
+    Returns:
+        List of (start_line, end_line, start_offset, end_offset) tuples:
+        0-indexed start line, exclusive end line, and the byte range of the
+        window without the newline that ends its last line
+    """
+    newlines = np.flatnonzero(np.frombuffer(content_bytes, dtype=np.uint8) == 0x0A)
+    total_lines = len(newlines) + 1
+    
+    # line_offsets[i] = byte offset where line i starts (plus one past the end)
+    line_offsets = np.empty(total_lines + 1, dtype=np.int64)
+    line_offsets[0] = 0
+    line_offsets[1:-1] = newlines + 1
+    line_offsets[-1] = len(content_bytes) + 1
+    
+    starts = np.arange(0, total_lines, chunk_size - overlap)
+    ends = np.minimum(starts + chunk_size, total_lines)
+    
+    return list(zip(
+        starts.tolist(),
+        ends.tolist(),
+        line_offsets[starts].tolist(),
+        (line_offsets[ends] - 1).tolist()
+    ))
+
 
 class ASTChunker:
     """
@@ -20,38 +82,49 @@ class ASTChunker:
         New approach: Use fixed line-based chunking (30 lines per chunk, 10 line overlap)
         This creates multiple chunks per file for better granularity.
         """
-        lines = content.split('\n')
-        total_lines = len(lines)
+        # Encode once; each window is then a single slice of the original
+        # bytes (newlines never occur inside a multi-byte UTF-8 sequence)
+        content_bytes = content.encode('utf-8')
         
         # Fixed chunk size: 30 lines per chunk with 10 line overlap
         # This handles most function/class definitions well
         chunk_size_lines = 30
         overlap_lines = 10  # 33% overlap for context continuity
         
+        windows = compute_chunk_windows(content_bytes, chunk_size_lines, overlap_lines)
+        total_lines = windows[-1][1]  # the last window ends at the last line
+        
+        # Tokenize once: windows overlap, so identifiers are collected per
+        # segment of gcd(size, step) lines and each window unions its segments
+        # (identifiers never span lines, so this matches per-window findall)
+        segment_lines = gcd(chunk_size_lines, chunk_size_lines - overlap_lines)
+        segment_identifiers = [
+            set(IDENTIFIER_RE.findall(content_bytes[seg_start:seg_end].decode('utf-8')))
+            for _, _, seg_start, seg_end in compute_chunk_windows(content_bytes, segment_lines, 0)
+        ]
+        
         chunks = []
         chunk_index = 0
         
-        print(f"  Chunking {file_path}: {total_lines} lines")
+        logger.debug("  Chunking %s: %d lines", file_path, total_lines)
         
         # Slide window across file
-        start = 0
-        while start < total_lines:
-            end = min(start + chunk_size_lines, total_lines)
-            chunk_lines = lines[start:end]
-            chunk_content = '\n'.join(chunk_lines)
+        for start, end, start_offset, end_offset in windows:
+            chunk_bytes = content_bytes[start_offset:end_offset]
+            chunk_content = chunk_bytes.decode('utf-8')
             
             # Skip empty chunks
             if not chunk_content.strip():
-                start += chunk_size_lines - overlap_lines
                 continue
             
             # Calculate content hash for incremental indexing
-            content_hash = hashlib.sha256(
-                chunk_content.encode('utf-8')
-            ).hexdigest()
+            content_hash = content_hash_bytes(chunk_bytes)
             
             # Extract keywords for text search
-            keywords = self._extract_keywords(chunk_content, language)
+            identifiers = set().union(
+                *segment_identifiers[start // segment_lines:(end - 1) // segment_lines + 1]
+            )
+            keywords = self._keywords_from_identifiers(identifiers, language)
             
             chunks.append({
                 'content': chunk_content,
@@ -66,42 +139,23 @@ class ASTChunker:
             })
             
             chunk_index += 1
-            
-            # Slide window with overlap (move forward by chunk_size - overlap)
-            start += chunk_size_lines - overlap_lines
         
-        print(f"  ✓ Created {len(chunks)} chunks for {file_path}")
+        logger.debug("  ✓ Created %d chunks for %s", len(chunks), file_path)
         return chunks 
     def _extract_keywords(self, content: str, language: str) -> List[str]:
         """Extract keywords from code"""
-        LANGUAGE_KEYWORDS = {
-            'python': ['def', 'class', 'import', 'from', 'async', 'await'],
-            'javascript': ['function', 'class', 'const', 'let', 'import', 'export'],
-            'typescript': ['function', 'class', 'interface', 'type', 'const', 'let'],
-            'java': ['class', 'interface', 'public', 'private', 'static'],
-            'go': ['func', 'type', 'struct', 'interface', 'var', 'const'],
-            'php': ['function', 'class', 'public', 'private', 'protected'],
-            'css': ['class', 'id', 'style'],
-            'sql': ['SELECT', 'INSERT', 'UPDATE', 'DELETE', 'CREATE']
-        }
-        
-        keywords = []
-        
+        return self._keywords_from_identifiers(set(IDENTIFIER_RE.findall(content)), language)
+    
+    def _keywords_from_identifiers(self, identifiers: Set[str], language: str) -> List[str]:
+        """Pick language keywords and up to 20 other identifiers from a chunk's identifiers"""
         # Extract language keywords
-        lang_keywords = LANGUAGE_KEYWORDS.get(language, [])
-        for keyword in lang_keywords:
-            if keyword in content:
-                keywords.append(keyword)
-        
-        # Extract identifiers
-        identifiers = re.findall(r'\b[a-zA-Z_][a-zA-Z0-9_]*\b', content)
+        keywords = list(identifiers & LANGUAGE_KEYWORDS.get(language, frozenset()))
         
         # Filter and limit
-        common_words = {'the', 'and', 'or', 'if', 'else', 'for', 'while', 'do', 'return'}
-        unique_identifiers = set(
+        unique_identifiers = {
             id for id in identifiers
-            if id not in common_words and len(id) > 2
-        )
+            if id not in COMMON_WORDS and len(id) > 2
+        }
         
         keywords.extend(list(unique_identifiers)[:20])
         
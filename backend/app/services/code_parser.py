@@ -1,66 +1,56 @@
 # backend/app/services/code_parser.py
 
+import fnmatch
+import logging
+import mmap
 import os
-from typing import List, Dict, Optional
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
 
+import numpy as np
 
-# File extensions to language mapping
-LANGUAGE_EXTENSIONS = {
-    '.py': 'python',
-    '.js': 'javascript',
-    '.jsx': 'javascript',
-    '.ts': 'typescript',
-    '.tsx': 'typescript',
-    '.java': 'java',
-    '.c': 'c',
-    '.cpp': 'cpp',
-    '.cc': 'cpp',
-    '.cxx': 'cpp',
-    '.h': 'c',
-    '.hpp': 'cpp',
-    '.cs': 'csharp',
-    '.go': 'go',
-    '.rs': 'rust',
-    '.rb': 'ruby',
-    '.php': 'php',
-    '.swift': 'swift',
-    '.kt': 'kotlin',
-    '.scala': 'scala',
-    '.r': 'r',
-    '.m': 'objective-c',
-    '.sql': 'sql',
-    '.sh': 'bash',
-    '.bash': 'bash',
-    '.zsh': 'zsh',
-    '.html': 'html',
-    '.css': 'css',
-    '.scss': 'scss',
-    '.sass': 'sass',
-    '.json': 'json',
-    '.xml': 'xml',
-    '.yaml': 'yaml',
-    '.yml': 'yaml',
-    '.md': 'markdown',
-    '.txt': 'text',
-    '.vue': 'vue',
-    '.dart': 'dart',
-}
+from app.config.search_config import search_config, LANG_BY_EXT
+
+logger = logging.getLogger(__name__)
+
+
+# File extensions to language mapping (kept for existing imports)
+LANGUAGE_EXTENSIONS = LANG_BY_EXT
 
 # Directories to ignore
-IGNORE_DIRS = {
+IGNORE_DIRS = frozenset({
     'node_modules', '.git', '.venv', 'venv', '__pycache__', 
     '.pytest_cache', 'dist', 'build', '.next', '.nuxt',
     'target', 'bin', 'obj', '.idea', '.vscode', 'coverage',
     '.DS_Store', 'vendor', 'packages'
-}
+})
 
 # Files to ignore
-IGNORE_FILES = {
+IGNORE_FILES = frozenset({
     '.gitignore', '.dockerignore', '.env', '.env.local',
     'package-lock.json', 'yarn.lock', 'poetry.lock', 'Pipfile.lock',
     'LICENSE', 'CHANGELOG'
-}
+})
+
+# Threads reading file contents in iter_repository_files
+PARSE_WORKERS = 16
+
+
+def _compile_globs(patterns: List[str]) -> Optional[re.Pattern]:
+    """Combine glob patterns into one precompiled alternation (None if empty)."""
+    if not patterns:
+        return None
+    return re.compile('|'.join(f'(?:{fnmatch.translate(p)})' for p in patterns))
+
+
+# IGNORE_PATTERNS compiled once: globs without '/' match the file name,
+# globs with '/' match the repo-relative path (gitignore-style)
+IGNORE_NAME_RE = _compile_globs([p for p in search_config.IGNORE_PATTERNS if '/' not in p])
+IGNORE_PATH_RE = _compile_globs([p for p in search_config.IGNORE_PATTERNS if '/' in p])
 
 
 def detect_language(file_path: str) -> Optional[str]:
@@ -73,8 +63,7 @@ def detect_language(file_path: str) -> Optional[str]:
     Returns:
         Language name or None if unknown
     """
-    ext = Path(file_path).suffix.lower()
-    return LANGUAGE_EXTENSIONS.get(ext)
+    return LANG_BY_EXT.get(os.path.splitext(file_path)[1].lower())
 
 
 def should_ignore(path: str, is_dir: bool = False) -> bool:
@@ -96,36 +85,95 @@ def should_ignore(path: str, is_dir: bool = False) -> bool:
         return name in IGNORE_FILES or name.startswith('.')
 
 
-def read_file_content(file_path: str, max_size_mb: int = 1) -> Optional[str]:
+def matches_ignore_pattern(relative_path: str) -> bool:
     """
-    Read file content safely.
+    Check a repo-relative file path against SearchConfig.IGNORE_PATTERNS.
+    
+    Args:
+        relative_path: Path relative to the repository root
+        
+    Returns:
+        True if any ignore pattern matches
+    """
+    relative_path = relative_path.replace(os.sep, '/')
+    if IGNORE_NAME_RE and IGNORE_NAME_RE.match(relative_path.rsplit('/', 1)[-1]):
+        return True
+    return bool(IGNORE_PATH_RE and IGNORE_PATH_RE.match(relative_path))
+
+
+def read_file_text(
+    file_path: str,
+    max_size_mb: int = 1,
+    file_size: Optional[int] = None
+) -> Optional[Tuple[str, int]]:
+    """
+    Read a file's text and line count safely.
+    The file is memory-mapped read-only and the text is decoded straight
+    from the page cache, without an intermediate bytes copy of the whole file.
     
     Args:
         file_path: Path to the file
         max_size_mb: Maximum file size in MB
+        file_size: Size from a stat the caller already did (avoids a second stat)
         
     Returns:
-        File content or None if unable to read
+        Tuple of (content, line count) or None if unable to read
     """
     try:
         # Check file size
-        file_size = os.path.getsize(file_path)
+        if file_size is None:
+            file_size = os.stat(file_path).st_size
         max_size_bytes = max_size_mb * 1024 * 1024
         
         if file_size > max_size_bytes:
-            print(f"⚠️  Skipping large file (>{max_size_mb}MB): {file_path}")
+            logger.warning("⚠️  Skipping large file (>%sMB): %s", max_size_mb, file_path)
             return None
         
-        # Try to read as text
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-            return content
+        if file_size == 0:
+            return "", 1  # empty files can't be mapped
+        
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            content = decode_file_bytes(mm)
+        # Lines are counted on the decoded text, where \r and \r\n endings
+        # are already \n, rather than with a second pass over the raw bytes
+        return content, content.count('\n') + 1
             
     except Exception as e:
-        print(f"⚠️  Could not read file {file_path}: {str(e)}")
+        logger.warning("⚠️  Could not read file %s: %s", file_path, e)
         return None
 
 
+def decode_file_bytes(data) -> str:
+    """
+    Decode file bytes (any bytes-like buffer) the way text-mode open()
+    would: UTF-8 ignoring undecodable bytes, with \r\n and \r translated to \n.
+    """
+    content = str(data, 'utf-8', 'ignore')
+    if '\r' in content:
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+    return content
+
+
+def read_file_content(
+    file_path: str,
+    max_size_mb: int = 1,
+    file_size: Optional[int] = None
+) -> Optional[str]:
+    """
+    Read file content safely.
+    
+    Args:
+        file_path: Path to the file
+        max_size_mb: Maximum file size in MB
+        file_size: Size from a stat the caller already did (avoids a second stat)
+        
+    Returns:
+        File content or None if unable to read
+    """
+    text = read_file_text(file_path, max_size_mb, file_size)
+    return None if text is None else text[0]
+
+
 def parse_repository_files(repo_path: str) -> List[Dict]:
     """
     Parse all code files in a repository.
@@ -145,63 +193,114 @@ def parse_repository_files(repo_path: str) -> List[Dict]:
             }
         }
     """
-    parsed_files = []
-    total_files = 0
-    skipped_files = 0
+    return list(iter_repository_files(repo_path))
+
+
+def iter_repository_files(repo_path: str) -> Iterator[Dict]:
+    """
+    Parse code files in a repository, yielding each one as soon as it is read
+    so later pipeline stages (insert, embed) can start before the walk ends.
+    Files are read on a thread pool (reading is I/O-bound); results are
+    yielded in walk order.
+    
+    Args:
+        repo_path: Path to the cloned repository
+        
+    Yields:
+        File information dicts (same shape as parse_repository_files)
+    """
+    stats = {'total': 0, 'skipped': 0}
+    parsed_count = 0
     
-    print(f"📖 Parsing repository: {repo_path}")
+    logger.info("📖 Parsing repository: %s", repo_path)
     
-    # Walk through the repository
+    candidates = _iter_candidate_files(repo_path, stats)
+    
+    # Keep a bounded window of reads in flight so a slow consumer doesn't
+    # pull the whole repository into memory
+    max_pending = PARSE_WORKERS * 4
+    with ThreadPoolExecutor(max_workers=PARSE_WORKERS) as pool:
+        pending = deque(pool.submit(_read_file_info, *task) for task in islice(candidates, max_pending))
+        
+        while pending:
+            file_info = pending.popleft().result()
+            for task in islice(candidates, 1):
+                pending.append(pool.submit(_read_file_info, *task))
+            
+            if file_info is None:
+                stats['skipped'] += 1
+                continue
+            
+            parsed_count += 1
+            logger.debug("✅ Parsed: %s (%s)", file_info['file_path'], file_info['language'])
+            if parsed_count % search_config.PROGRESS_LOG_INTERVAL == 0:
+                logger.info("📖 Parsed %d files", parsed_count)
+            yield file_info
+    
+    logger.info(
+        "📊 Parsing summary: %d files found, %d parsed, %d skipped",
+        stats['total'], parsed_count, stats['skipped']
+    )
+
+
+def _iter_candidate_files(repo_path: str, stats: Dict) -> Iterator[Tuple[str, str, str]]:
+    """
+    Walk the repository and yield (file_path, relative_path, language) for
+    every file that passes the ignore rules and has a known language.
+    Counts found and skipped files into stats.
+    """
     for root, dirs, files in os.walk(repo_path):
-        # Filter out ignored directories
-        dirs[:] = [d for d in dirs if not should_ignore(d, is_dir=True)]
+        # Filter out ignored directories (walk yields bare names, so the
+        # sets are probed directly instead of going through should_ignore)
+        dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
         
         for file in files:
-            total_files += 1
+            stats['total'] += 1
             
             # Skip ignored files
-            if should_ignore(file):
-                skipped_files += 1
+            if file in IGNORE_FILES or file.startswith('.'):
+                stats['skipped'] += 1
                 continue
             
             file_path = os.path.join(root, file)
             relative_path = os.path.relpath(file_path, repo_path)
             
+            if matches_ignore_pattern(relative_path):
+                stats['skipped'] += 1
+                continue
+            
             # Detect language
             language = detect_language(file_path)
             if not language:
-                skipped_files += 1
-                continue
-            
-            # Read file content
-            content = read_file_content(file_path)
-            if not content:
-                skipped_files += 1
+                stats['skipped'] += 1
                 continue
             
-            # Calculate metadata
-            file_size = os.path.getsize(file_path)
-            line_count = content.count('\n') + 1
-            
-            parsed_files.append({
-                'file_path': relative_path,
-                'content': content,
-                'language': language,
-                'metadata': {
-                    'size': file_size,
-                    'lines': line_count,
-                    'extension': Path(file_path).suffix
-                }
-            })
-            
-            print(f"✅ Parsed: {relative_path} ({language})")
+            yield file_path, relative_path, language
+
+
+def _read_file_info(file_path: str, relative_path: str, language: str) -> Optional[Dict]:
+    """Read one file and build its file information dict (None if unreadable or empty)."""
+    try:
+        file_size = os.stat(file_path).st_size
+    except OSError as e:
+        logger.warning("⚠️  Could not read file %s: %s", file_path, e)
+        return None
     
-    print(f"\n📊 Parsing Summary:")
-    print(f"   Total files found: {total_files}")
-    print(f"   Files parsed: {len(parsed_files)}")
-    print(f"   Files skipped: {skipped_files}")
+    text = read_file_text(file_path, file_size=file_size)
+    if text is None or not text[0]:
+        return None
+    content, line_count = text
     
-    return parsed_files
+    return {
+        'file_path': relative_path,
+        'content': content,
+        'language': language,
+        'metadata': {
+            'size': file_size,
+            'lines': line_count,
+            'extension': Path(file_path).suffix
+        }
+    }
 
 
 def chunk_code(content: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
@@ -228,4 +327,20 @@ def chunk_code(content: str, chunk_size: int = 1000, overlap: int = 200) -> List
         chunks.append(chunk)
         start += chunk_size - overlap
     
-    return chunks
\ No newline at end of file
+    return chunks
+
+
+def slice_lines(text: str, first: int, last: int) -> str:
+    """
+    Return lines first..last (1-indexed, inclusive) joined by newlines,
+    located via a vectorised newline scan instead of splitting every line.
+    """
+    if first > last:
+        return ""
+    data = text.encode('utf-8')
+    newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 0x0A)
+    if first - 2 >= len(newlines):
+        return ""
+    start = newlines[first - 2] + 1 if first > 1 else 0
+    end = newlines[last - 1] if last - 1 < len(newlines) else len(data)
+    return data[start:end].decode('utf-8')
@@ -0,0 +1,206 @@
+# backend/app/services/embedding_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from cachetools import TTLCache
+
+from app.config.search_config import search_config
+
+QUERY_CACHE_SIZE = 4096
+QUERY_CACHE_TTL = 3600  # seconds
+
+# On-disk content_hash -> vector store that survives restarts and re-indexes
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.sqlite3")
+SQLITE_MAX_PARAMS = 500  # keys per IN (...) lookup
+
+try:
+    from blake3 import blake3 as _hasher
+except ImportError:  # BLAKE3 is optional; fall back to OpenSSL SHA-256
+    _hasher = hashlib.sha256
+
+
+def content_hash(content: str) -> str:
+    """
+    64-char hex digest of chunk content (fits CodeChunk.content_hash).
+    BLAKE3 when installed, SHA-256 otherwise.
+    """
+    return content_hash_bytes(content.encode('utf-8'))
+
+
+def content_hash_bytes(data: bytes) -> str:
+    """content_hash() for content that is already UTF-8 encoded."""
+    return _hasher(data).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Bounded in-process LRU cache of content_hash -> embedding vector.
+    Vectors are stored as float32 arrays to keep the footprint small.
+    """
+
+    def __init__(self, maxsize: int = search_config.EMBEDDING_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._data.get(key)
+            if vector is not None:
+                self._data.move_to_end(key)
+            return vector
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Return the cached vectors for whichever keys are present."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._data.get(key)
+                if vector is not None:
+                    self._data.move_to_end(key)
+                    found[key] = vector
+        return found
+
+    def put(self, key: str, vector) -> None:
+        self.put_many([(key, vector)])
+
+    def put_many(self, items: Iterable[Tuple[str, List[float]]]) -> None:
+        with self._lock:
+            for key, vector in items:
+                self._data[key] = np.asarray(vector, dtype=np.float32)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class QueryEmbeddingCache:
+    """
+    TTL cache of search query -> embedding vector, keyed by the SHA-256
+    digest of the query so long queries don't bloat the key space.
+    """
+
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE, ttl: int = QUERY_CACHE_TTL):
+        self._data: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(query: str) -> bytes:
+        return hashlib.sha256(query.encode('utf-8')).digest()
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        with self._lock:
+            return self._data.get(self.key(query))
+
+    def put(self, query: str, vector) -> np.ndarray:
+        vector = np.ascontiguousarray(vector, dtype=np.float32)
+        with self._lock:
+            self._data[self.key(query)] = vector
+        return vector
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class PersistentEmbeddingCache:
+    """
+    SQLite-backed content_hash -> embedding vector store, keyed per model.
+    Sits behind EmbeddingCache so re-indexing unchanged code (even after a
+    restart or a collection reset) doesn't call Ollama again. Vectors are
+    stored as float32 bytes. Failures are logged and treated as misses.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened lazily so importing this module never touches the disk
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS emb ("
+                "model TEXT NOT NULL, hash TEXT NOT NULL, vec BLOB NOT NULL, "
+                "PRIMARY KEY (model, hash)) WITHOUT ROWID"
+            )
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, keys: List[str], model: str) -> Dict[str, np.ndarray]:
+        """
+        Look up stored vectors.
+        
+        Args:
+            keys: content_hash digests
+            model: Embedding model the vectors were produced with
+            
+        Returns:
+            Dict of content_hash -> float32 vector for the keys that were found
+        """
+        found = {}
+        if not keys:
+            return found
+        
+        try:
+            with self._lock:
+                conn = self._connect()
+                for start in range(0, len(keys), SQLITE_MAX_PARAMS):
+                    batch = keys[start:start + SQLITE_MAX_PARAMS]
+                    rows = conn.execute(
+                        f"SELECT hash, vec FROM emb WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                        [model, *batch]
+                    )
+                    for key, blob in rows:
+                        found[key] = np.frombuffer(blob, dtype=np.float32)
+        except sqlite3.Error as e:
+            print(f"⚠️  Embedding cache lookup failed: {e}")
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, List[float]]], model: str) -> None:
+        """
+        Store vectors, replacing existing ones for the same key.
+        
+        Args:
+            items: (content_hash, vector) pairs
+            model: Embedding model the vectors were produced with
+        """
+        rows = [
+            (model, key, np.asarray(vector, dtype=np.float32).tobytes())
+            for key, vector in items
+        ]
+        if not rows:
+            return
+        
+        try:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO emb (model, hash, vec) VALUES (?, ?, ?)", rows)
+        except sqlite3.Error as e:
+            print(f"⚠️  Embedding cache write failed: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Singleton instances
+chunk_embedding_cache = EmbeddingCache()
+query_embedding_cache = QueryEmbeddingCache()
+persistent_embedding_cache = PersistentEmbeddingCache()
@@ -1,36 +1,232 @@
 # backend/app/services/embedding_service.py
+import asyncio
+import logging
 import os
+import weakref
 os.environ['ANONYMIZED_TELEMETRY'] = 'False'
 
-import chromadb
-from chromadb.config import Settings
-from langchain_community.embeddings import OllamaEmbeddings
-from typing import List, Dict, Optional
+import httpx
+from chromadb.errors import IDAlreadyExistsError
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Sized, Tuple
 from dotenv import load_dotenv
+import numpy as np
 
 load_dotenv()
 
+from app.config.chroma import get_chroma_client
+from app.config.search_config import search_config
+from app.services.code_parser import read_file_content
+from app.services.embedding_cache import (
+    chunk_embedding_cache,
+    content_hash,
+    persistent_embedding_cache,
+    query_embedding_cache,
+)
+
+logger = logging.getLogger(__name__)
+
 # Configuration
-CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", "./chroma_data")
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+# Embedding requests in flight at once; Ollama queues the rest server-side
+OLLAMA_EMBED_CONCURRENCY = int(os.getenv("OLLAMA_EMBED_CONCURRENCY", "8"))
+OLLAMA_EMBED_TIMEOUT = 120.0  # seconds
+# Texts per /api/embed request
+OLLAMA_EMBED_REQUEST_SIZE = int(os.getenv("OLLAMA_EMBED_REQUEST_SIZE", "32"))
 
-# Initialize ChromaDB client
-chroma_client = chromadb.PersistentClient(
-    path=CHROMA_PERSIST_DIR,
-    settings=Settings(
-        anonymized_telemetry=False,
-        allow_reset=True
-    )
-)
+# Prompt prefixes, unchanged from the LangChain OllamaEmbeddings defaults
+DOCUMENT_PREFIX = "passage: "
+QUERY_PREFIX = "query: "
+
+# Persistent cache namespace: /api/embed returns unit-normalized vectors,
+# so they must not mix with ones cached from the legacy /api/embeddings.
+# Collections are not namespaced: repos indexed with the old endpoint must
+# be re-indexed (see README, "Upgrading existing repositories")
+EMBED_CACHE_KEY = f"{OLLAMA_EMBED_MODEL}@api/embed"
 
-# Initialize Ollama embeddings
-embeddings = OllamaEmbeddings(
-    model=OLLAMA_EMBED_MODEL,
-    base_url=OLLAMA_BASE_URL
+# Shared ChromaDB client (process-wide singleton)
+chroma_client = get_chroma_client()
+
+# "hit" / "miss" for the query embedding of the current request (if any)
+query_embedding_cache_status: ContextVar[Optional[str]] = ContextVar(
+    "query_embedding_cache_status", default=None
 )
 
 
+def _run_sync(coro):
+    """
+    Run a coroutine from synchronous code. Callers already running inside
+    an event loop (the indexing job) get it run on a helper thread, since
+    asyncio.run() can't nest.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+class OllamaEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Embeds text with Ollama's batched /api/embed endpoint.
+    Texts are sent OLLAMA_EMBED_REQUEST_SIZE per request with up to
+    OLLAMA_EMBED_CONCURRENCY requests in flight. Works as a ChromaDB
+    embedding function and provides embed_documents/embed_query.
+    """
+    
+    def __init__(self, model: str = OLLAMA_EMBED_MODEL, base_url: str = OLLAMA_BASE_URL):
+        self.model = model
+        self.base_url = base_url
+        # One pooled client per event loop (httpx clients are bound to the
+        # loop they were first used on), created on first use
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+    
+    def __call__(self, input: Documents) -> Embeddings:
+        return self.embed_documents(list(input))
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents (code chunks)."""
+        return _run_sync(self._aembed_once([f"{DOCUMENT_PREFIX}{text}" for text in texts]))
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a search query."""
+        return _run_sync(self._aembed_once([f"{QUERY_PREFIX}{text}"]))[0]
+    
+    def _client(self) -> httpx.AsyncClient:
+        """The running event loop's client, created on first use."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(base_url=self.base_url, timeout=OLLAMA_EMBED_TIMEOUT)
+            self._clients[loop] = client
+        return client
+    
+    async def aclose(self) -> None:
+        """Close the running event loop's client, if it has one."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+    
+    async def _aembed_once(self, inputs: List[str]) -> List[List[float]]:
+        """aembed on a short-lived loop (see _run_sync), closing its client after."""
+        try:
+            return await self.aembed(inputs)
+        finally:
+            await self.aclose()
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed a search query without blocking the event loop."""
+        return (await self.aembed([f"{QUERY_PREFIX}{text}"]))[0]
+    
+    async def aembed(self, inputs: List[str]) -> List[List[float]]:
+        """
+        Embed already-prefixed inputs.
+        
+        Args:
+            inputs: Texts to embed
+            
+        Returns:
+            List of embedding vectors in the same order as inputs
+        """
+        if not inputs:
+            return []
+        
+        semaphore = asyncio.Semaphore(OLLAMA_EMBED_CONCURRENCY)
+        client = self._client()
+        
+        async def embed_request(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                response = await client.post("/api/embed", json={"model": self.model, "input": batch})
+            if response.status_code != 200:
+                raise ValueError(
+                    f"Error raised by inference API HTTP code: {response.status_code}, {response.text}"
+                )
+            return response.json()["embeddings"]
+        
+        batches = await asyncio.gather(*(
+            embed_request(inputs[start:start + OLLAMA_EMBED_REQUEST_SIZE])
+            for start in range(0, len(inputs), OLLAMA_EMBED_REQUEST_SIZE)
+        ))
+        
+        return [vector for batch in batches for vector in batch]
+
+
+# Shared Ollama embedding function
+embeddings = OllamaEmbeddingFunction()
+
+
+async def embed_query_cached(query: str) -> Tuple[np.ndarray, bool]:
+    """
+    Embed a search query, reusing the vector for repeated queries.
+    Misses await Ollama directly, so the event loop stays free.
+    
+    Args:
+        query: Query text
+        
+    Returns:
+        Tuple of (float32 embedding, whether it came from the cache)
+    """
+    vector = query_embedding_cache.get(query)
+    cache_hit = vector is not None
+    if not cache_hit:
+        vector = query_embedding_cache.put(query, await embeddings.aembed_query(query))
+    query_embedding_cache_status.set("hit" if cache_hit else "miss")
+    return vector, cache_hit
+
+
+def embed_documents_cached(
+    texts: List[str],
+    content_hashes: Optional[List[str]] = None
+) -> List[List[float]]:
+    """
+    Embed texts, reusing cached vectors (in memory, then on disk) for content
+    that was embedded before.
+    Only cache misses are sent to Ollama (batched, see OllamaEmbeddingFunction),
+    and identical texts are embedded once.
+    
+    Args:
+        texts: Texts to embed
+        content_hashes: Precomputed content_hash() digests of the texts (optional)
+        
+    Returns:
+        List of embedding vectors in the same order as texts
+    """
+    if content_hashes is None:
+        content_hashes = [content_hash(text) for text in texts]
+    
+    found = chunk_embedding_cache.get_many(content_hashes)
+    
+    # Fall back to the on-disk cache for vectors evicted from (or never in) memory
+    not_in_memory = list(dict.fromkeys(key for key in content_hashes if key not in found))
+    if not_in_memory:
+        stored = persistent_embedding_cache.get_many(not_in_memory, EMBED_CACHE_KEY)
+        chunk_embedding_cache.put_many(stored.items())
+        found.update(stored)
+    
+    vectors = {key: vector.tolist() for key, vector in found.items()}
+    
+    missing = {}
+    for key, text in zip(content_hashes, texts):
+        if key not in vectors and key not in missing:
+            missing[key] = text
+    
+    if missing:
+        new_vectors = embeddings.embed_documents(list(missing.values()))
+        fresh = dict(zip(missing.keys(), new_vectors))
+        chunk_embedding_cache.put_many(fresh.items())
+        persistent_embedding_cache.put_many(fresh.items(), EMBED_CACHE_KEY)
+        vectors.update(fresh)
+    
+    return [vectors[key] for key in content_hashes]
+
+
 def initialize_chroma_collection(repo_id: int, reset: bool = False):
     """
     Initialize or get a ChromaDB collection for a repository.
@@ -48,26 +244,74 @@ def initialize_chroma_collection(repo_id: int, reset: bool = False):
         if reset:
             try:
                 chroma_client.delete_collection(name=collection_name)
-                print(f"🗑️  Deleted existing collection: {collection_name}")
+                logger.info("🗑️  Deleted existing collection: %s", collection_name)
             except:
                 pass
         
         collection = chroma_client.get_or_create_collection(
             name=collection_name,
-            metadata={"repo_id": str(repo_id)}
+            metadata={"repo_id": str(repo_id)},
+            embedding_function=embeddings
         )
         
-        print(f"✅ Initialized ChromaDB collection: {collection_name}")
+        logger.info("✅ Initialized ChromaDB collection: %s", collection_name)
         return collection
         
     except Exception as e:
-        print(f"❌ Error initializing collection: {str(e)}")
+        logger.error("❌ Error initializing collection: %s", e)
         raise
 
 
+def add_to_collection(
+    collection,
+    ids: List[str],
+    embeddings: List[List[float]],
+    documents: List[str],
+    metadatas: List[Dict]
+) -> None:
+    """
+    Add one batch of vectors to a ChromaDB collection.
+    IDs that already exist are skipped so re-runs stay idempotent.
+    """
+    if not ids:
+        return
+    
+    try:
+        collection.add(
+            ids=ids,
+            embeddings=embeddings,
+            documents=documents,
+            metadatas=metadatas
+        )
+    except IDAlreadyExistsError as e:
+        logger.info("ℹ️  Skipping %d already-stored chunks: %s", len(ids), e)
+
+
+def embed_and_store(
+    collection,
+    ids: List[str],
+    texts: List[str],
+    metadatas: List[Dict],
+    embed_batch_size: int
+) -> None:
+    """
+    Embed chunks embed_batch_size at a time and add them to the collection
+    with a single bulk add, so Chroma's per-call index update and metadata
+    validation overhead is paid once per slice rather than per embed batch.
+    """
+    if not ids:
+        return
+    
+    vectors = []
+    for start in range(0, len(texts), embed_batch_size):
+        vectors.extend(embed_documents_cached(texts[start:start + embed_batch_size]))
+    add_to_collection(collection, ids, vectors, texts, metadatas)
+    logger.debug("✅ Embedded %d chunks", len(ids))
+
+
 def create_embeddings(
     repo_id: int,
-    parsed_files: List[Dict],
+    parsed_files: Iterable[Dict],
     chunk_size: int = 1000,
     overlap: int = 200
 ) -> Dict:
@@ -76,7 +320,9 @@ def create_embeddings(
     
     Args:
         repo_id: Repository ID
-        parsed_files: List of parsed file dictionaries
+        parsed_files: Parsed file dictionaries; may be a lazy iterator
+            (e.g. fed by the ingestion pipeline) that is consumed once.
+            Entries without 'content' are read from their 'source_path'.
         chunk_size: Maximum characters per chunk
         overlap: Overlap between chunks
         
@@ -88,78 +334,91 @@ def create_embeddings(
         collection = initialize_chroma_collection(repo_id, reset=True)
         
         total_chunks = 0
-        total_files = len(parsed_files)
+        total_files = len(parsed_files) if isinstance(parsed_files, Sized) else "?"
+        files_processed = 0
+        add_batch_size = search_config.VECTOR_ADD_BATCH_SIZE
+        embed_batch_size = search_config.EMBED_BATCH_SIZE
         
-        print(f"🔄 Creating embeddings for {total_files} files...")
+        # Chunks waiting to be embedded and stored, accumulated across files
+        # so each collection.add carries up to add_batch_size chunks
+        pending_ids = []
+        pending_texts = []
+        pending_metadatas = []
+        
+        logger.info("🔄 Creating embeddings for %s files...", total_files)
         
         for idx, file_info in enumerate(parsed_files):
             file_path = file_info['file_path']
-            content = file_info['content']
             language = file_info['language']
+            # Pipelined ingestion passes a source_path instead of the content
+            content = file_info.get('content')
+            if content is None:
+                content = read_file_content(file_info['source_path']) or ""
             
             # Chunk the content
             chunks = chunk_code_content(content, chunk_size, overlap)
             
-            # Prepare data for ChromaDB
-            chunk_ids = []
-            chunk_texts = []
-            chunk_metadatas = []
-            
+            # Per-chunk metadata is serialized and stored for every chunk, so it
+            # only carries what readers use: repo_id is implied by the
+            # collection and file_size was never read
+            file_id = file_info.get('file_id', 0)  # GET FILE ID
+            file_lines = file_info['metadata']['lines']
             for chunk_idx, chunk in enumerate(chunks):
-                chunk_id = f"{repo_id}_{idx}_{chunk_idx}"
-                chunk_ids.append(chunk_id)
-                chunk_texts.append(chunk)
-                chunk_metadatas.append({
-                    "repo_id": repo_id,
-                    "file_id": file_info.get('file_id', 0),  # GET FILE ID
+                pending_ids.append(f"{repo_id}_{idx}_{chunk_idx}")
+                pending_texts.append(chunk)
+                pending_metadatas.append({
+                    "file_id": file_id,
                     "file_path": file_path,
                     "language": language,
                     "chunk_index": chunk_idx,
                     "start_line": 1,  # You might want to calculate this
-                    "end_line": len(chunk.split('\n')),
-                    "file_size": file_info['metadata']['size'],
-                    "lines": file_info['metadata']['lines']
+                    "end_line": chunk.count('\n') + 1,
+                    "lines": file_lines
                 })
             
-            # Create embeddings using Ollama
-            print(f"📝 Processing ({idx+1}/{total_files}): {file_path} ({len(chunks)} chunks)")
+            logger.debug("📝 Chunked (%d/%s): %s (%d chunks)", idx + 1, total_files, file_path, len(chunks))
+            if (idx + 1) % search_config.PROGRESS_LOG_INTERVAL == 0:
+                logger.info("📝 Chunked %d/%s files", idx + 1, total_files)
             
-            chunk_embeddings = embeddings.embed_documents(chunk_texts)
-            
-            # Add to ChromaDB
-            collection.add(
-                ids=chunk_ids,
-                embeddings=chunk_embeddings,
-                documents=chunk_texts,
-                metadatas=chunk_metadatas
-            )
+            # Embed and store full batches
+            while len(pending_ids) >= add_batch_size:
+                embed_and_store(
+                    collection,
+                    pending_ids[:add_batch_size],
+                    pending_texts[:add_batch_size],
+                    pending_metadatas[:add_batch_size],
+                    embed_batch_size
+                )
+                del pending_ids[:add_batch_size]
+                del pending_texts[:add_batch_size]
+                del pending_metadatas[:add_batch_size]
             
             total_chunks += len(chunks)
-            print(f"✅ [{idx + 1}/{total_files}] Embedded: {file_path}")
+            files_processed += 1
+        
+        # Flush the remainder
+        embed_and_store(collection, pending_ids, pending_texts, pending_metadatas, embed_batch_size)
         
-        print(f"\n🔍 Verifying embeddings in collection...")
         collection = get_collection(repo_id)
         count = collection.count()
-        print(f"✅ Collection has {count} items stored")
+        logger.info("✅ Collection has %d items stored", count)
 
         if count == 0:
-            print(f"❌ WARNING: Collection is empty despite successful embedding!")
+            logger.warning("❌ Collection is empty despite successful embedding!")
         
         stats = {
-            "total_files": total_files,
+            "total_files": files_processed,
             "total_chunks": total_chunks,
             "collection_name": f"repo_{repo_id}",
             "embedding_model": OLLAMA_EMBED_MODEL
         }
         
-        print(f"\n🎉 Embedding complete!")
-        print(f"   Files processed: {total_files}")
-        print(f"   Total chunks: {total_chunks}")
+        logger.info("🎉 Embedding complete: %d files, %d chunks", files_processed, total_chunks)
         
         return stats
         
     except Exception as e:
-        print(f"❌ Error creating embeddings: {str(e)}")
+        logger.error("❌ Error creating embeddings: %s", e)
         raise
 
 
@@ -202,7 +461,7 @@ def get_collection(repo_id: int):
     """
     try:
         collection_name = f"repo_{repo_id}"
-        return chroma_client.get_collection(name=collection_name)
+        return chroma_client.get_collection(name=collection_name, embedding_function=embeddings)
     except Exception as e:
-        print(f"⚠️  Collection not found for repo {repo_id}: {str(e)}")
+        logger.warning("⚠️  Collection not found for repo %s: %s", repo_id, e)
         return None
\ No newline at end of file
@@ -1,19 +1,47 @@
 # backend/app/services/file_service.py
 
+import asyncio
 import os
-from typing import List, Optional, Dict
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Dict, Tuple
 from pathlib import Path
+import orjson
+from sqlalchemy import select, delete, insert, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 
 from app.models import Repository, RepositoryFile
-from app.schemas.repository import FileTreeNode, FileContentResponse
-from app.services.code_parser import detect_language
+from app.schemas.repository import FileContentResponse
+from app.services.code_parser import detect_language, matches_ignore_pattern
+from app.services.repo_cache import get_repo_local_path, get_cached_file_tree, cache_file_tree
+
+# Larger files are served by the /raw route instead of being inlined in JSON
+MAX_JSON_CONTENT_BYTES = 256 * 1024
+
+# A NUL byte within this prefix marks a file as binary
+BINARY_SNIFF_BYTES = 8192
+
+# Lists repository directories concurrently (scandir/stat release the GIL, so
+# threads keep the disk busy even on a single core)
+SCAN_WORKERS = 8
+SCAN_POOL = ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix="repo-scan")
+
+# Directories left out of the file tree (hidden directories are skipped too)
+SKIP_DIRS = frozenset({'node_modules', '__pycache__'})
+
+# Rows fetched per round trip when streaming the file tree query
+TREE_FETCH_BATCH_SIZE = 5000
+
+# Rows per INSERT while streaming the scan into the database
+SCAN_INSERT_BATCH_SIZE = 2000
 
 class FileService:
     
     @staticmethod
-    def scan_repository_files(repo_id: int, repo_path: str, db: Session) -> List[RepositoryFile]:
+    def scan_repository_files(repo_id: int, repo_path: str, db: Session) -> int:
         """
         Scans the repository directory and stores file metadata in the database.
         Called during ingestion pipeline after cloning.
@@ -24,100 +52,228 @@ class FileService:
             db: Database session
             
         Returns:
-            List of created RepositoryFile objects
+            Number of inserted RepositoryFile rows
         """
         print(f"📂 Scanning file structure for repo {repo_id}...")
         
         if not os.path.exists(repo_path):
             raise Exception(f"Repository path does not exist: {repo_path}")
         
-        # Delete existing file records for this repo
-        db.query(RepositoryFile).filter(RepositoryFile.repo_id == repo_id).delete()
+        # Replace existing file records in one transaction; the Core table insert
+        # skips ORM bulk-save bookkeeping and is batched by the dialect
+        db.execute(delete(RepositoryFile.__table__).where(RepositoryFile.repo_id == repo_id))
+        # New updated_at retires file trees cached by any worker
+        db.execute(update(Repository.__table__).where(Repository.id == repo_id).values(updated_at=func.now()))
+        
+        # Insert while the walk is still running so only one batch is held at a time
+        rows = FileService._iter_repository_rows(repo_id, repo_path)
+        total = 0
+        while batch := list(islice(rows, SCAN_INSERT_BATCH_SIZE)):
+            db.execute(insert(RepositoryFile.__table__), batch)
+            total += len(batch)
         db.commit()
         
-        files_to_create = []
-        repo_path_obj = Path(repo_path)
+        print(f"✅ Scanned {total} files and directories")
+        return total
+    
+    @staticmethod
+    async def scan_repository_files_async(repo_id: int, repo_path: str, db: AsyncSession) -> int:
+        """
+        Async variant of scan_repository_files for request handlers.
+        Each batch is pulled from the directory walk in a worker thread so the
+        event loop stays free.
         
-        # Walk through directory tree
-        for root, dirs, files in os.walk(repo_path):
-            # Skip .git and other hidden directories
-            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in {'node_modules', '__pycache__'}]
+        Args:
+            repo_id: Repository ID
+            repo_path: Local path to cloned repository
+            db: Async database session
             
-            root_path = Path(root)
-            relative_root = root_path.relative_to(repo_path_obj)
+        Returns:
+            Number of inserted RepositoryFile rows
+        """
+        print(f"📂 Scanning file structure for repo {repo_id}...")
+        
+        if not os.path.exists(repo_path):
+            raise Exception(f"Repository path does not exist: {repo_path}")
+        
+        # Replace existing file records for this repo
+        await db.execute(delete(RepositoryFile.__table__).where(RepositoryFile.repo_id == repo_id))
+        await db.execute(update(Repository.__table__).where(Repository.id == repo_id).values(updated_at=func.now()))
+        
+        rows = FileService._iter_repository_rows(repo_id, repo_path)
+        total = 0
+        while batch := await asyncio.to_thread(lambda: list(islice(rows, SCAN_INSERT_BATCH_SIZE))):
+            await db.execute(insert(RepositoryFile.__table__), batch)
+            total += len(batch)
+        await db.commit()
+        
+        print(f"✅ Scanned {total} files and directories")
+        return total
+    
+    @staticmethod
+    def _iter_repository_rows(repo_id: int, repo_path: str) -> Iterator[Dict]:
+        """
+        Walks the repository directory and yields RepositoryFile row dicts.
+        Every directory is a separate SCAN_POOL task: as each listing finishes
+        its rows are yielded and its subdirectories are queued, so deep or
+        lopsided trees still keep all workers busy.
+        
+        Args:
+            repo_id: Repository ID
+            repo_path: Local path to cloned repository
             
-            # Add directories
-            for dir_name in dirs:
-                dir_relative_path = str(relative_root / dir_name) if str(relative_root) != "." else dir_name
-                parent = str(relative_root) if str(relative_root) != "." else None
+        Yields:
+            Row dicts for files, empty directories and directory symlinks
+        """
+        pending = {SCAN_POOL.submit(FileService._scan_directory, repo_id, repo_path, None)}
+        
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                rows, subdirs = future.result()
+                for subdir, relative_subdir in subdirs:
+                    pending.add(SCAN_POOL.submit(FileService._scan_directory, repo_id, subdir, relative_subdir))
+                yield from rows
+    
+    @staticmethod
+    def _scan_directory(
+        repo_id: int,
+        root: str,
+        parent: Optional[str]
+    ) -> Tuple[List[Dict], List[Tuple[str, str]]]:
+        """
+        Builds row dicts for the direct children of one directory.
+        Uses a single os.scandir pass; entry type and size come from the
+        DirEntry, so regular files cost no extra exists()/stat() calls.
+        Relative paths are built by string concatenation from `parent`.
+        
+        Args:
+            repo_id: Repository ID
+            root: Absolute path of the directory to list
+            parent: Its path relative to the repository root (None for the root)
+        
+        Returns:
+            Tuple of (row dicts, (absolute, relative) subdirectory paths still to walk)
+        """
+        rows = []
+        subdirs = []
+        prefix = f"{parent}/" if parent else ""
+        
+        try:
+            entries = os.scandir(root)
+        except OSError:
+            return rows, subdirs
+        
+        with entries:
+            for entry in entries:
+                name = entry.name
                 
-                files_to_create.append(RepositoryFile(
-                    repo_id=repo_id,
-                    file_path=dir_relative_path,
-                    file_name=dir_name,
-                    file_type="directory",
-                    is_directory=True,
-                    parent_path=parent,
-                    size_bytes=0
-                ))
-            
-            # Add files
-            for file_name in files:
-                if file_name.startswith('.'):
+                # Skip .git and other hidden entries
+                if name.startswith('.'):
                     continue
+                
+                relative_path = prefix + name
+                
+                # Walk directories; they get no row of their own, the tree
+                # derives them from their files. Symlinked ones are listed
+                # but not followed.
+                if entry.is_dir():
+                    if name in SKIP_DIRS:
+                        continue
+                    if not entry.is_symlink():
+                        subdirs.append((entry.path, relative_path))
+                        continue
                     
-                file_path = root_path / file_name
-                file_relative_path = str(file_path.relative_to(repo_path_obj))
-                parent = str(relative_root) if str(relative_root) != "." else None
+                    rows.append({
+                        "repo_id": repo_id,
+                        "file_path": relative_path,
+                        "file_name": name,
+                        "file_type": "directory",
+                        "is_directory": True,
+                        "parent_path": parent,
+                        "size_bytes": 0
+                    })
+                    continue
+                
+                # Add files
+                if matches_ignore_pattern(relative_path):
+                    continue
                 
-                # Get file extension and size
-                extension = file_path.suffix.lstrip('.') if file_path.suffix else "txt"
-                file_size = file_path.stat().st_size if file_path.exists() else 0
+                # Get file extension and size (broken symlinks count as empty).
+                # Extensions repeat across thousands of rows, so share one string each
+                extension = sys.intern(os.path.splitext(name)[1].lstrip('.') or "txt")
+                try:
+                    file_size = entry.stat().st_size
+                except OSError:
+                    file_size = 0
                 
-                files_to_create.append(RepositoryFile(
-                    repo_id=repo_id,
-                    file_path=file_relative_path,
-                    file_name=file_name,
-                    file_type=extension,
-                    is_directory=False,
-                    parent_path=parent,
-                    size_bytes=file_size
-                ))
-        
-        # Bulk insert
-        db.bulk_save_objects(files_to_create)
-        db.commit()
+                rows.append({
+                    "repo_id": repo_id,
+                    "file_path": relative_path,
+                    "file_name": name,
+                    "file_type": extension,
+                    "is_directory": False,
+                    "parent_path": parent,
+                    "size_bytes": file_size
+                })
         
-        print(f"✅ Scanned {len(files_to_create)} files and directories")
-        return files_to_create
+        # A directory with nothing to show below it is recorded itself so it
+        # still appears in the tree
+        if not rows and not subdirs and parent is not None:
+            grandparent, _, dir_name = parent.rpartition('/')
+            rows.append({
+                "repo_id": repo_id,
+                "file_path": parent,
+                "file_name": dir_name,
+                "file_type": "directory",
+                "is_directory": True,
+                "parent_path": grandparent or None,
+                "size_bytes": 0
+            })
+        
+        return rows, subdirs
     
     @staticmethod
-    def get_file_tree(repo_id: int, db: Session) -> FileTreeNode:
+    async def get_file_tree(repo_id: int, db: AsyncSession) -> bytes:
         """
         Returns hierarchical file tree structure for the repository.
+        The serialized tree is cached until the repository's updated_at
+        changes (every file scan bumps it).
         
         Args:
             repo_id: Repository ID
-            db: Database session
+            db: Async database session
             
         Returns:
-            Root FileTreeNode with nested children
+            Root node in FileTreeNode's shape with nested children, as JSON bytes
         """
-        repo = db.query(Repository).filter(Repository.id == repo_id).first()
+        repo = (await db.execute(select(Repository).filter_by(id=repo_id))).scalar_one_or_none()
         if not repo:
             raise HTTPException(status_code=404, detail="Repository not found")
         
-        files = db.query(RepositoryFile).filter(
-            RepositoryFile.repo_id == repo_id
-        ).all()
+        cached = get_cached_file_tree(repo_id, repo.updated_at)
+        if cached is not None:
+            return cached
         
-        if not files:
+        # Only the columns the tree needs, streamed as plain rows
+        files_query = (
+            select(
+                RepositoryFile.file_path,
+                RepositoryFile.file_name,
+                RepositoryFile.file_type,
+                RepositoryFile.is_directory,
+                RepositoryFile.size_bytes
+            )
+            .where(RepositoryFile.repo_id == repo_id)
+            .execution_options(yield_per=TREE_FETCH_BATCH_SIZE)
+        )
+        root_children = await FileService._stream_tree_rows(files_query, db)
+        
+        if not root_children:
             # Trigger file scan if not done yet
             if repo.local_path and os.path.exists(repo.local_path):
-                FileService.scan_repository_files(repo_id, repo.local_path, db)
-                files = db.query(RepositoryFile).filter(
-                    RepositoryFile.repo_id == repo_id
-                ).all()
+                await FileService.scan_repository_files_async(repo_id, repo.local_path, db)
+                root_children = await FileService._stream_tree_rows(files_query, db)
             else:
                 raise HTTPException(
                     status_code=404, 
@@ -126,109 +282,210 @@ class FileService:
         
         # Build tree structure
         repo_name = repo.repo_metadata.get('repo_name', 'repository') if repo.repo_metadata else 'repository'
-        return FileService._build_tree(files, repo_name)
+        tree_json = orjson.dumps(FileService._emit_tree(root_children, repo_name))
+        cache_file_tree(repo_id, repo.updated_at, tree_json)
+        return tree_json
+    
+    @staticmethod
+    async def _stream_tree_rows(files_query, db: AsyncSession) -> Dict:
+        """Streams file rows in yield_per partitions into a new tree trie."""
+        root_children = {}
+        result = await db.stream(files_query)
+        async for rows in result.partitions():
+            FileService._insert_tree_rows(root_children, rows)
+        return root_children
     
     @staticmethod
-    def _build_tree(files: List[RepositoryFile], root_name: str) -> FileTreeNode:
+    def _build_tree(files: Iterable, root_name: str) -> Dict:
         """
         Builds a hierarchical tree from flat file list.
+        Nodes are plain dicts in FileTreeNode's shape: the data is produced
+        here, so per-node model validation would only add overhead.
         
         Args:
-            files: List of RepositoryFile objects
+            files: RepositoryFile objects or rows with the same attributes
             root_name: Name for the root node
             
         Returns:
-            Root FileTreeNode with complete tree structure
-        """
-        # Create lookup dictionary
-        file_dict = {}
-        root = FileTreeNode(
-            name=root_name,
-            path="",
-            type="directory",
-            children=[]
-        )
-        file_dict[""] = root
-        file_dict[None] = root  # Handle None parent_path
-        
-        # Sort by path depth to ensure parents are created before children
-        sorted_files = sorted(files, key=lambda f: f.file_path.count('/'))
-        
-        for file in sorted_files:
-            node = FileTreeNode(
-                name=file.file_name,
-                path=file.file_path,
-                type="directory" if file.is_directory else "file",
-                extension=file.file_type if not file.is_directory else None,
-                size=file.size_bytes,
-                children=[] if file.is_directory else None
-            )
+            Root node dict with complete tree structure
+        """
+        root_children = {}
+        FileService._insert_tree_rows(root_children, files)
+        return FileService._emit_tree(root_children, root_name)
+    
+    @staticmethod
+    def _insert_tree_rows(root_children: Dict, files: Iterable) -> None:
+        """
+        Inserts file rows into a trie keyed by path component; ancestors
+        without a row of their own are created as directory nodes on the way.
+        Trie entries are (node, {child name: entry}); files have no child dict.
+        """
+        for file in files:
+            *ancestors, name = file.file_path.split('/')
             
-            file_dict[file.file_path] = node
+            level = root_children
+            prefix_len = 0
+            for part in ancestors:
+                prefix_len += len(part) + 1
+                entry = level.get(part)
+                if entry is None:
+                    entry = level[part] = (
+                        {
+                            "name": part,
+                            "path": file.file_path[:prefix_len - 1],
+                            "type": "directory",
+                            "extension": None,
+                            "size": 0,
+                            "children": []
+                        },
+                        {}
+                    )
+                level = entry[1]
             
-            # Find parent and attach
-            parent_path = file.parent_path if file.parent_path else None
-            if parent_path in file_dict:
-                file_dict[parent_path].children.append(node)
+            if file.is_directory:
+                # Already created as an ancestor of an earlier row
+                if name in level:
+                    continue
+                node = {
+                    "name": file.file_name,
+                    "path": file.file_path,
+                    "type": "directory",
+                    "extension": None,
+                    "size": file.size_bytes,
+                    "children": []
+                }
+                level[name] = (node, {})
+            else:
+                node = {
+                    "name": file.file_name,
+                    "path": file.file_path,
+                    "type": "file",
+                    "extension": sys.intern(file.file_type),
+                    "size": file.size_bytes,
+                    "children": None
+                }
+                level[name] = (node, None)
+    
+    @staticmethod
+    def _emit_tree(root_children: Dict, root_name: str) -> Dict:
+        """
+        Creates the root node and fills every directory's children from the
+        trie, sorted by name (rows arrive unordered).
+        """
+        root = {
+            "name": root_name,
+            "path": "",
+            "type": "directory",
+            "extension": None,
+            "size": 0,
+            "children": []
+        }
+        stack = [(root, root_children)]
+        while stack:
+            node, children = stack.pop()
+            entries = [children[name] for name in sorted(children)]
+            node["children"] = [child for child, _ in entries]
+            stack.extend(entry for entry in entries if entry[1] is not None)
         
         return root
     
     @staticmethod
-    def get_file_content(repo_id: int, file_path: str, db: Session) -> FileContentResponse:
+    async def get_file_content(repo_id: int, file_path: str, db: AsyncSession) -> FileContentResponse:
         """
         Returns the content of a specific file.
         
         Args:
             repo_id: Repository ID
             file_path: Relative file path from repository root
-            db: Database session
+            db: Async database session
             
         Returns:
             FileContentResponse with file content and metadata
         """
-        repo = db.query(Repository).filter(Repository.id == repo_id).first()
-        if not repo:
-            raise HTTPException(status_code=404, detail="Repository not found")
+        safe_path, full_path = await FileService.resolve_file_path(repo_id, file_path, db)
         
-        if not repo.local_path:
+        size_bytes = full_path.stat().st_size
+        if size_bytes > MAX_JSON_CONTENT_BYTES:
             raise HTTPException(
-                status_code=400, 
-                detail="Repository local path not found. Repository may need re-ingestion."
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File is larger than {MAX_JSON_CONTENT_BYTES // 1024}KB; fetch it from the /raw endpoint"
             )
         
-        # Security: prevent path traversal attacks
-        safe_path = Path(file_path).as_posix()
-        if ".." in safe_path or safe_path.startswith("/"):
-            raise HTTPException(status_code=400, detail="Invalid file path")
-        
-        full_path = Path(repo.local_path) / safe_path
-        
-        if not full_path.exists():
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        if full_path.is_dir():
-            raise HTTPException(status_code=400, detail="Cannot read directory as file")
-        
         try:
-            # Try UTF-8 first, fallback to latin-1 for binary-ish files
-            try:
-                content = full_path.read_text(encoding='utf-8')
-            except UnicodeDecodeError:
-                content = full_path.read_text(encoding='latin-1')
+            content = await asyncio.to_thread(FileService._read_text, full_path)
             
             # Determine language for syntax highlighting
-            language = detect_language(str(full_path)) or 'plaintext'
+            language = detect_language(full_path.name) or 'plaintext'
             
             return FileContentResponse(
                 file_path=safe_path,
                 content=content,
                 language=language,
-                size_bytes=len(content.encode('utf-8')),
-                lines=len(content.splitlines())
+                size_bytes=size_bytes,
+                # Same as len(splitlines()) for "\n"-only text, without building the list
+                lines=content.count('\n') + (bool(content) and not content.endswith('\n'))
             )
             
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Error reading file: {str(e)}"
             )
+    
+    @staticmethod
+    async def resolve_file_path(repo_id: int, file_path: str, db: AsyncSession) -> Tuple[str, Path]:
+        """
+        Resolves a repo-relative path to a readable file on disk.
+        
+        Args:
+            repo_id: Repository ID
+            file_path: Relative file path from repository root
+            db: Async database session
+            
+        Returns:
+            Tuple of (normalized relative path, absolute Path)
+        """
+        local_path = await get_repo_local_path(repo_id, db)
+        if not local_path:
+            raise HTTPException(
+                status_code=400, 
+                detail="Repository local path not found. Repository may need re-ingestion."
+            )
+        
+        # Security: prevent path traversal attacks
+        safe_path = Path(file_path).as_posix()
+        if ".." in safe_path or safe_path.startswith("/"):
+            raise HTTPException(status_code=400, detail="Invalid file path")
+        
+        full_path = Path(local_path) / safe_path
+        
+        if not full_path.exists():
+            raise HTTPException(status_code=404, detail="File not found")
+        
+        if full_path.is_dir():
+            raise HTTPException(status_code=400, detail="Cannot read directory as file")
+        
+        return safe_path, full_path
+    
+    @staticmethod
+    def _read_text(full_path: Path) -> str:
+        """
+        Reads a file as text with a single read, falling back to latin-1 when
+        it is not valid UTF-8. Files with a NUL byte in the first
+        BINARY_SNIFF_BYTES are rejected as binary.
+        """
+        data = full_path.read_bytes()
+        if data.find(b'\x00', 0, BINARY_SNIFF_BYTES) != -1:
+            raise HTTPException(status_code=400, detail="Cannot display binary file")
+        
+        try:
+            text = data.decode('utf-8')
+        except UnicodeDecodeError:
+            text = data.decode('latin-1')
+        
+        # Universal newlines, as read_text() would give
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        return text
@@ -1,11 +1,28 @@
 # backend/app/services/github_service.py
 import os
+import re
 import shutil
+import subprocess
 import tempfile
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from git import Repo, GitCommandError
 from urllib.parse import urlparse
 
+from app.config.search_config import search_config
+
+# Directories that neither the file tree scan nor the indexer reads; with a
+# partial clone their blobs are never downloaded
+SPARSE_EXCLUDE_DIRS = (
+    "node_modules", "__pycache__", ".venv", ".pytest_cache",
+    ".next", ".nuxt", ".idea", ".vscode"
+)
+
+# Canonical https://github.com/<owner>/<repo>[.git][/] form
+GITHUB_URL_RE = re.compile(r'^https?://github\.com/([^/]+)/([^/]+?)(?:\.git)?/?$')
+
+# `rm -rf` deletes a clone's tree in C, noticeably faster than shutil.rmtree
+RM_PATH = shutil.which("rm") if os.name == "posix" else None
+
 
 def extract_repo_info(github_url: str) -> Dict[str, str]:
     """
@@ -17,7 +34,16 @@ def extract_repo_info(github_url: str) -> Dict[str, str]:
     Returns:
         Dictionary with owner, repo_name, and full_name
     """
-    # Parse URL
+    match = GITHUB_URL_RE.match(github_url)
+    if match:
+        owner, repo_name = match.groups()
+        return {
+            "owner": owner,
+            "repo_name": repo_name,
+            "full_name": f"{owner}/{repo_name}"
+        }
+    
+    # Other shapes (extra path segments, other hosts): parse URL
     parsed = urlparse(github_url)
     path_parts = parsed.path.strip('/').split('/')
     
@@ -34,6 +60,21 @@ def extract_repo_info(github_url: str) -> Dict[str, str]:
     }
 
 
+def _sparse_checkout_patterns() -> List[str]:
+    """
+    Build non-cone sparse-checkout patterns: everything except the
+    directories above and the file-name globs in IGNORE_PATTERNS (which
+    git matches at any depth, like matches_ignore_pattern does).
+    
+    Returns:
+        List of gitignore-style patterns for `git sparse-checkout set --no-cone`
+    """
+    patterns = ["/*"]
+    patterns.extend(f"!{name}/" for name in SPARSE_EXCLUDE_DIRS)
+    patterns.extend(f"!{glob}" for glob in search_config.IGNORE_PATTERNS if '/' not in glob)
+    return patterns
+
+
 def clone_repository(github_url: str, target_dir: Optional[str] = None) -> str:
     """
     Clone a GitHub repository to a local directory.
@@ -62,13 +103,23 @@ def clone_repository(github_url: str, target_dir: Optional[str] = None) -> str:
         print(f"📥 Cloning repository: {repo_info['full_name']}")
         print(f"📂 Target directory: {target_dir}")
         
-        # Clone the repository
-        Repo.clone_from(
+        # Clone the repository: commit and trees only, blobs come with checkout
+        repo = Repo.clone_from(
             github_url,
             target_dir,
-            depth=1  # Shallow clone for faster download
+            depth=1,  # Shallow clone for faster download
+            filter="blob:none",
+            no_checkout=True
         )
         
+        # Check out only paths that are scanned or indexed; older git
+        # without non-cone sparse checkout gets the full tree
+        try:
+            repo.git.sparse_checkout("set", "--no-cone", *_sparse_checkout_patterns())
+        except GitCommandError as e:
+            print(f"⚠️  Sparse checkout unavailable, checking out everything: {str(e)}")
+        repo.git.checkout()
+        
         print(f"✅ Repository cloned successfully to: {target_dir}")
         return target_dir
         
@@ -83,23 +134,27 @@ def clone_repository(github_url: str, target_dir: Optional[str] = None) -> str:
 def cleanup_repository(repo_path: str) -> None:
     """
     Remove a cloned repository directory.
+    Uses `rm -rf` on POSIX; elsewhere shutil.rmtree with read-only handling.
     
     Args:
         repo_path: Path to the repository directory to remove
     """
     try:
         if os.path.exists(repo_path):
-            # On Windows, we need to handle read-only files
-            def handle_remove_readonly(func, path, exc):
-                """Error handler for Windows readonly files"""
-                import stat
-                if not os.access(path, os.W_OK):
-                    os.chmod(path, stat.S_IWUSR)
-                    func(path)
-                else:
-                    raise
-            
-            shutil.rmtree(repo_path, onerror=handle_remove_readonly)
+            if RM_PATH:
+                subprocess.run([RM_PATH, "-rf", "--", repo_path], check=True)
+            else:
+                # On Windows, we need to handle read-only files
+                def handle_remove_readonly(func, path, exc):
+                    """Error handler for Windows readonly files"""
+                    import stat
+                    if not os.access(path, os.W_OK):
+                        os.chmod(path, stat.S_IWUSR)
+                        func(path)
+                    else:
+                        raise
+                
+                shutil.rmtree(repo_path, onerror=handle_remove_readonly)
             print(f"🗑️  Cleaned up repository at: {repo_path}")
     except Exception as e:
         print(f"⚠️  Warning: Failed to cleanup repository at {repo_path}: {str(e)}")
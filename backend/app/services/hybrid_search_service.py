@@ -2,13 +2,86 @@
 
 import re
 import time
+from functools import lru_cache
+import numpy as np
 from typing import List, Dict, Optional, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, func, cast, String
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, or_, and_, func, cast, String
 from app.models import CodeChunk, Symbol, CodeFile, Repository
 from app.schemas.search import SearchMode, MatchType
-from app.services.embedding_service import embeddings, chroma_client
+from app.services.embedding_service import embed_query_cached
+from app.config.vector_backend import get_search_index
 from app.config.search_config import search_config
+from app.services.code_parser import slice_lines
+from app.services.rank_fusion import reciprocal_rank_fusion
+
+HYBRID_WEIGHTS = np.array(
+    [search_config.SEMANTIC_WEIGHT, search_config.KEYWORD_WEIGHT, search_config.SYMBOL_WEIGHT],
+    dtype=np.float64
+)
+
+
+def context_window(content: str, start_line: int, end_line: int, context_lines: int) -> Tuple[str, int, int]:
+    """
+    Cut lines start_line..end_line plus context_lines on each side.
+    Returns (snippet, first line, last line), 1-indexed.
+    """
+    total_lines = content.count('\n') + 1
+    context_start = max(1, start_line - context_lines)
+    context_end = min(total_lines, end_line + context_lines)
+    return slice_lines(content, context_start, context_end), context_start, context_end
+
+
+def symbol_name_filter(query: str):
+    """
+    WHERE clause matching symbol names against a user query.
+    
+    A trailing '*' (e.g. "get*") asks for a case-insensitive prefix match,
+    served by the idx_symbols_name_prefix B-tree; anything else is a
+    substring match on name/qualified_name, served by the trigram GIN index.
+    
+    Args:
+        query: Symbol query text
+        
+    Returns:
+        SQLAlchemy boolean clause
+    """
+    if query.endswith('*') and len(query) > 1:
+        return func.lower(Symbol.name).like(f"{query[:-1].lower()}%")
+    return or_(
+        Symbol.name.ilike(f"%{query}%"),
+        Symbol.qualified_name.ilike(f"%{query}%")
+    )
+
+
+@lru_cache(maxsize=256)
+def highlight_pattern(query: str) -> Optional[re.Pattern]:
+    """
+    Compile the query terms into one case-insensitive alternation.
+    Longer terms come first so they win over their own prefixes, and
+    inserted <mark> tags are never re-scanned by a later term.
+    
+    Args:
+        query: Raw search query
+        
+    Returns:
+        Compiled pattern, or None for a blank query
+    """
+    terms = {term.lower(): term for term in query.split()}
+    if not terms:
+        return None
+    alternation = '|'.join(re.escape(term) for term in sorted(terms.values(), key=len, reverse=True))
+    return re.compile(alternation, re.IGNORECASE)
+
+
+@lru_cache(maxsize=256)
+def compile_search_regex(query: str, case_sensitive: bool) -> re.Pattern:
+    """
+    Compile a regex-mode query, reusing the compiled program for repeated
+    (pattern, case_sensitive) pairs. Raises re.error for invalid patterns.
+    """
+    flags = re.MULTILINE if case_sensitive else re.MULTILINE | re.IGNORECASE
+    return re.compile(query, flags)
 
 
 class HybridSearchService:
@@ -25,11 +98,17 @@ class HybridSearchService:
         query: str,
         mode: SearchMode,
         filters: Dict,
-        db: Session
+        db: AsyncSession,
+        limit: Optional[int] = None,
+        offset: int = 0
     ) -> Tuple[List[Dict], int]:
         """
         Main search entry point.
         Returns (results, total_count)
+        
+        Results are ranked in full, then only the requested page
+        (offset, offset + limit) is returned and hydrated with snippets
+        that need file content. total_count covers all ranked results.
         """
         start_time = time.time()
 
@@ -56,6 +135,12 @@ class HybridSearchService:
 
         # Sort by relevance
         results = sorted(results, key=lambda x: x['relevance_score'], reverse=True)
+        total_count = len(results)
+
+        # Keep only the requested page
+        end = offset + limit if limit is not None else None
+        results = results[offset:end]
+        await self._load_snippets(results, db)
 
         # Calculate latency
         latency_ms = int((time.time() - start_time) * 1000)
@@ -64,7 +149,7 @@ class HybridSearchService:
         for result in results:
             result['latency_ms'] = latency_ms
 
-        return results, len(results)
+        return results, total_count
 
     def _detect_query_mode(self, query: str) -> SearchMode:
         """
@@ -91,7 +176,7 @@ class HybridSearchService:
         
         # Generate query embedding
         try:
-            query_embedding = embeddings.embed_query(query)
+            query_embedding, _ = await embed_query_cached(query)
         except Exception as e:
             print(f"⚠️  Embedding generation failed: {e}")
             return []
@@ -99,7 +184,7 @@ class HybridSearchService:
         # Get collection
         collection_name = f"repo_{repo_id}_chunks"
         try:
-            collection = chroma_client.get_collection(name=collection_name)
+            collection = get_search_index(collection_name)
         except Exception as e:
             print(f"⚠️  Collection not found: {e}")
             return []
@@ -120,7 +205,7 @@ class HybridSearchService:
         # Query vector DB
         try:
             results = collection.query(
-                query_embeddings=[query_embedding],
+                query_embeddings=[query_embedding.tolist()],
                 n_results=min(search_config.SEMANTIC_TOP_K, collection_count),
                 where=where_filter,
                 include=["documents", "metadatas", "distances"]
@@ -141,7 +226,9 @@ class HybridSearchService:
             return path.replace('\\', '/').replace('//', '/')
 
         # Pre-fetch all files for this repo to avoid repeated queries
-        all_files = db.query(CodeFile).filter(CodeFile.repo_id == repo_id).all()
+        all_files = (await db.execute(
+            select(CodeFile).where(CodeFile.repo_id == repo_id)
+        )).scalars().all()
         
         # Create lookup maps
         file_by_id = {f.id: f for f in all_files}
@@ -182,10 +269,12 @@ class HybridSearchService:
                         print(f"⚠️  file_id {file_id} not found, resolved by path to ID {file.id}")
                 else:
                     # Last resort: try direct path match
-                    file = db.query(CodeFile).filter(
-                        CodeFile.repo_id == repo_id,
-                        CodeFile.file_path == file_path
-                    ).first()
+                    file = (await db.execute(
+                        select(CodeFile).where(
+                            CodeFile.repo_id == repo_id,
+                            CodeFile.file_path == file_path
+                        )
+                    )).scalars().first()
                     
                     if not file:
                         print(f"❌ Could not resolve file: ID={file_id}, Path={file_path}")
@@ -220,7 +309,7 @@ class HybridSearchService:
         repo_id: int,
         query: str,
         filters: Dict,
-        db: Session
+        db: AsyncSession
     ) -> List[Dict]:
         """
         Keyword search using PostgreSQL full-text search.
@@ -241,13 +330,15 @@ class HybridSearchService:
 
         # Execute query
         try:
-            chunks = db.query(CodeChunk).filter(query_filter).limit(
-                search_config.KEYWORD_TOP_K
-            ).all()
+            chunks = (await db.execute(
+                select(CodeChunk).where(query_filter).limit(search_config.KEYWORD_TOP_K)
+            )).scalars().all()
         except Exception as e:
             print(f"⚠️  Keyword search failed: {e}")
             return []
 
+        file_paths = await self._get_file_paths({chunk.file_id for chunk in chunks}, db)
+
         # Calculate TF-IDF-like scores
         search_results = []
         for chunk in chunks:
@@ -264,7 +355,7 @@ class HybridSearchService:
             search_results.append({
                 'chunk_id': chunk.id,
                 'file_id': chunk.file_id,
-                'file_path': self._get_file_path(chunk.file_id, db),
+                'file_path': file_paths.get(chunk.file_id, "unknown"),
                 'snippet': chunk.content,
                 'start_line': chunk.start_line,
                 'end_line': chunk.end_line,
@@ -283,19 +374,13 @@ class HybridSearchService:
         repo_id: int,
         query: str,
         filters: Dict,
-        db: Session
+        db: AsyncSession
     ) -> List[Dict]:
         """
         Search for symbols (functions, classes, etc.)
         """
         # Build query with fuzzy matching
-        query_filter = and_(
-            Symbol.repo_id == repo_id,
-            or_(
-                Symbol.name.ilike(f"%{query}%"),
-                Symbol.qualified_name.ilike(f"%{query}%")
-            )
-        )
+        query_filter = and_(Symbol.repo_id == repo_id, symbol_name_filter(query))
 
         # Apply filters
         if filters.get('lang'):
@@ -305,13 +390,15 @@ class HybridSearchService:
 
         # Execute query
         try:
-            symbols = db.query(Symbol).filter(query_filter).limit(
-                search_config.SYMBOL_TOP_K
-            ).all()
+            symbols = (await db.execute(
+                select(Symbol).where(query_filter).limit(search_config.SYMBOL_TOP_K)
+            )).scalars().all()
         except Exception as e:
             print(f"⚠️  Symbol search failed: {e}")
             return []
 
+        file_paths = await self._get_file_paths({symbol.file_id for symbol in symbols}, db)
+
         # Format results
         search_results = []
         for symbol in symbols:
@@ -326,19 +413,13 @@ class HybridSearchService:
             else:
                 symbol_score = 0.7
 
-            # Get file content for snippet
-            file = db.query(CodeFile).get(symbol.file_id)
-            if file:
-                lines = file.content.split('\n')
-                snippet = '\n'.join(lines[symbol.start_line-1:symbol.end_line])
-            else:
-                snippet = symbol.signature or ""
-
             search_results.append({
                 'chunk_id': None,
                 'file_id': symbol.file_id,
-                'file_path': self._get_file_path(symbol.file_id, db),
-                'snippet': snippet,
+                'file_path': file_paths.get(symbol.file_id, "unknown"),
+                # Cut from the file body by _load_snippets if the result is on the returned page
+                'snippet': symbol.signature or "",
+                'snippet_lines': (symbol.start_line, symbol.end_line),
                 'start_line': symbol.start_line,
                 'end_line': symbol.end_line,
                 'language': symbol.language,
@@ -358,15 +439,14 @@ class HybridSearchService:
         repo_id: int,
         query: str,
         filters: Dict,
-        db: Session
+        db: AsyncSession
     ) -> List[Dict]:
         """
         Regex search across file contents.
         Rate-limited for security.
         """
         try:
-            # Compile regex with timeout
-            pattern = re.compile(query, re.MULTILINE if not filters.get('case_sensitive') else 0)
+            pattern = compile_search_regex(query, bool(filters.get('case_sensitive')))
         except re.error as e:
             raise ValueError(f"Invalid regex pattern: {e}")
 
@@ -375,7 +455,9 @@ class HybridSearchService:
         if filters.get('lang'):
             query_filter = and_(query_filter, CodeFile.language == filters['lang'])
 
-        files = db.query(CodeFile).filter(query_filter).all()
+        files = (await db.execute(
+            select(CodeFile.id, CodeFile.file_path, CodeFile.language, CodeFile.content).where(query_filter)
+        )).all()
 
         search_results = []
         match_count = 0
@@ -384,25 +466,30 @@ class HybridSearchService:
             if match_count >= search_config.MAX_REGEX_MATCHES:
                 break
 
-            # Search in file content
-            try:
-                matches = list(pattern.finditer(file.content))
-            except:
+            content = file.content
+            if not content:
                 continue
+            # Character offsets of every newline, found on the file's first
+            # match; each match's line number and context are read off these
+            # (UTF-32 is fixed width, so code unit index == str index)
+            newlines = None
 
-            for match in matches:
+            for match in pattern.finditer(content):
                 if match_count >= search_config.MAX_REGEX_MATCHES:
                     break
 
+                if newlines is None:
+                    newlines = np.flatnonzero(np.frombuffer(content.encode('utf-32-le'), dtype=np.uint32) == 0x0A)
+                    total_lines = len(newlines) + 1
+
                 # Get line number
-                start_pos = match.start()
-                line_num = file.content[:start_pos].count('\n') + 1
+                line_num = int(np.searchsorted(newlines, match.start())) + 1
 
-                # Extract context
-                lines = file.content.split('\n')
-                start_line = max(0, line_num - 3)
-                end_line = min(len(lines), line_num + 3)
-                snippet = '\n'.join(lines[start_line:end_line])
+                # Extract context: lines line_num - 2 .. line_num + 3
+                first, last = max(1, line_num - 2), min(total_lines, line_num + 3)
+                start = newlines[first - 2] + 1 if first > 1 else 0
+                end = newlines[last - 1] if last < total_lines else len(content)
+                snippet = content[start:end]
 
                 search_results.append({
                     'chunk_id': None,
@@ -428,7 +515,7 @@ class HybridSearchService:
         repo_id: int,
         query: str,
         filters: Dict,
-        db: Session
+        db: AsyncSession
     ) -> List[Dict]:
         """
         Hybrid search combining semantic, keyword, and symbol.
@@ -468,27 +555,69 @@ class HybridSearchService:
             else:
                 merged_results[key] = result
 
-        # Calculate hybrid scores
-        for key, result in merged_results.items():
-            semantic = result.get('semantic_score') or 0
-            keyword = result.get('keyword_score') or 0
-            symbol = result.get('symbol_score') or 0
-
-            # Weighted combination
-            combined_score = (
-                search_config.SEMANTIC_WEIGHT * semantic +
-                search_config.KEYWORD_WEIGHT * keyword +
-                search_config.SYMBOL_WEIGHT * symbol
+        if search_config.HYBRID_FUSION == "rrf":
+            return self._rank_by_rrf(
+                merged_results,
+                (
+                    (semantic_results, 'semantic_score'),
+                    (keyword_results, 'keyword_score'),
+                    (symbol_results, 'symbol_score'),
+                )
             )
 
-            # Boost if multiple match types
-            if len(result['match_type']) > 1:
-                combined_score *= 1.2
+        # Calculate hybrid scores: one (N, 3) score matrix times the weight vector
+        results = list(merged_results.values())
+        if not results:
+            return results
+
+        scores = np.array(
+            [
+                (
+                    result.get('semantic_score') or 0,
+                    result.get('keyword_score') or 0,
+                    result.get('symbol_score') or 0
+                )
+                for result in results
+            ],
+            dtype=np.float64
+        )
+        combined = scores @ HYBRID_WEIGHTS
 
-            # Normalize to 0-1
-            result['relevance_score'] = min(combined_score, 1.0)
+        # Boost if multiple match types
+        multi_match = np.fromiter((len(r['match_type']) > 1 for r in results), dtype=bool, count=len(results))
+        combined[multi_match] *= 1.2
+
+        # Normalize to 0-1
+        combined = np.minimum(combined, 1.0)
+
+        order = np.argsort(-combined, kind='stable')
+        for idx in order:
+            results[idx]['relevance_score'] = float(combined[idx])
+
+        return [results[idx] for idx in order]
 
-        return list(merged_results.values())
+    def _rank_by_rrf(self, merged_results: Dict, result_groups) -> List[Dict]:
+        """
+        Order merged hybrid results by Reciprocal Rank Fusion of each
+        method's own ranking. relevance_score is the RRF score scaled so
+        that ranking first in every method gives 1.0.
+        """
+        ranked_keys = [
+            [
+                (result['file_id'], result['start_line'])
+                for result in sorted(group, key=lambda r: -(r.get(score_key) or 0))
+            ]
+            for group, score_key in result_groups
+        ]
+        fused = reciprocal_rank_fusion(ranked_keys, search_config.RRF_K)
+
+        best_possible = len(ranked_keys) / (search_config.RRF_K + 1)
+        ranked = []
+        for key, score in fused:
+            result = merged_results[key]
+            result['relevance_score'] = min(score / best_possible, 1.0)
+            ranked.append(result)
+        return ranked
 
     def _apply_filters(self, results: List[Dict], filters: Dict) -> List[Dict]:
         """
@@ -515,24 +644,43 @@ class HybridSearchService:
 
         return filtered
 
-    def _get_file_path(self, file_id: int, db: Session) -> str:
-        """Get file path from file_id"""
-        file = db.query(CodeFile).get(file_id)
-        return file.file_path if file else "unknown"
+    async def _get_file_paths(self, file_ids, db: AsyncSession) -> Dict[int, str]:
+        """Get file paths for a set of file ids in one query"""
+        if not file_ids:
+            return {}
+        rows = await db.execute(
+            select(CodeFile.id, CodeFile.file_path).where(CodeFile.id.in_(file_ids))
+        )
+        return dict(rows.all())
+
+    async def _load_snippets(self, results: List[Dict], db: AsyncSession) -> None:
+        """
+        Fill in snippets that are cut from file content (symbol matches),
+        loading each file needed by the page once.
+        """
+        pending = [result for result in results if 'snippet_lines' in result]
+        if not pending:
+            return
+        rows = await db.execute(
+            select(CodeFile.id, CodeFile.content)
+            .where(CodeFile.id.in_({result['file_id'] for result in pending}))
+        )
+        contents = dict(rows.all())
+        for result in pending:
+            first, last = result.pop('snippet_lines')
+            content = contents.get(result['file_id'])
+            if content is not None:
+                result['snippet'] = slice_lines(content, max(1, first), last)
 
     def _highlight_snippet(self, snippet: str, query: str) -> str:
         """
         Add HTML highlighting to snippet.
         """
-        # Simple highlighting - wrap matches in <mark> tags
-        query_terms = query.split()
-        highlighted = snippet
-
-        for term in query_terms:
-            pattern = re.compile(f'({re.escape(term)})', re.IGNORECASE)
-            highlighted = pattern.sub(r'<mark>\1</mark>', highlighted)
-
-        return highlighted
+        # Wrap every query term match in <mark> tags in a single pass
+        pattern = highlight_pattern(query)
+        if pattern is None:
+            return snippet
+        return pattern.sub(r'<mark>\g<0></mark>', snippet)
 
     async def get_context(
         self,
@@ -540,24 +688,26 @@ class HybridSearchService:
         start_line: int,
         end_line: int,
         context_lines: int,
-        db: Session
+        db: AsyncSession
     ) -> Dict:
         """
         Get code snippet with context lines.
         """
-        file = db.query(CodeFile).get(file_id)
+        file = (await db.execute(
+            select(CodeFile.file_path, CodeFile.language, CodeFile.content).where(CodeFile.id == file_id)
+        )).first()
         if not file:
             return None
 
-        lines = file.content.split('\n')
-        context_start = max(0, start_line - context_lines - 1)
-        context_end = min(len(lines), end_line + context_lines)
+        content, context_start, context_end = context_window(
+            file.content, start_line, end_line, context_lines
+        )
 
         return {
             'file_path': file.file_path,
             'language': file.language,
-            'content': '\n'.join(lines[context_start:context_end]),
-            'start_line': context_start + 1,
+            'content': content,
+            'start_line': context_start,
             'end_line': context_end
         }
 
@@ -1,20 +1,25 @@
 # backend/app/services/indexing_service.py
 import asyncio
-import hashlib
+import logging
 import time
 import threading
 from datetime import datetime
 from typing import Dict, List, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.orm import Session, undefer
 
 from app.models import Repository, CodeFile, CodeChunk, Symbol, IndexJob
 from app.services.github_service import clone_repository, cleanup_repository
 from app.services.code_parser import parse_repository_files
 from app.services.ast_chunker import ast_chunker
 from app.services.symbol_extractor import symbol_extractor
-from app.services.embedding_service import embeddings, chroma_client
+from app.services.embedding_service import embed_documents_cached
+from app.services.embedding_cache import content_hash as compute_content_hash
+from app.config.vector_backend import create_vector_store, encode_chunk_id, persist_vector_store
 from app.config.search_config import search_config
 
+logger = logging.getLogger(__name__)
+
 # ============================================
 # TESTING FLAGS
 # ============================================
@@ -22,6 +27,17 @@ TESTING_MODE = False
 #MAX_FILES_FOR_TESTING = 10
 SKIP_EMBEDDINGS = False
 
+# Core UPDATE executed once per embedding batch with a list of parameter sets
+VECTOR_ID_UPDATE = (
+    update(CodeChunk.__table__)
+    .where(
+        CodeChunk.__table__.c.repo_id == bindparam('b_repo_id'),
+        CodeChunk.__table__.c.file_id == bindparam('b_file_id'),
+        CodeChunk.__table__.c.chunk_index == bindparam('b_chunk_index')
+    )
+    .values(vector_id=bindparam('b_vector_id'))
+)
+
 # ============================================
 # TIMEOUT HELPER
 # ============================================
@@ -287,13 +303,12 @@ class IndexingService:
         progress_end = 0.6
         progress_range = progress_end - progress_start
         
-        print(f"   Processing {total_files} files sequentially...\n")
+        logger.info("   Processing %d files sequentially...", total_files)
         
         # NUCLEAR OPTION: Skip first file if it's markdown (known to hang sometimes)
         if files_to_index and files_to_index[0].get('language') in ['markdown', 'md']:
             first_file = files_to_index[0]
-            print(f"   ⚠️  First file is markdown: {first_file['file_path']}")
-            print(f"   🔍 Attempting to process with 10s timeout...\n")
+            logger.info("   ⚠️  First file is markdown: %s, processing with 10s timeout", first_file['file_path'])
         
         for idx, file_info in enumerate(files_to_index):
             file_path = file_info.get('file_path', 'unknown')
@@ -301,15 +316,14 @@ class IndexingService:
             
             # Check file size
             if file_size > 1_000_000:  # 1MB limit
-                print(f"   [{idx+1}/{total_files}] ⏭️  Skipping: {file_path} (too large: {file_size/1024:.1f}KB)\n")
+                logger.warning("   [%d/%d] ⏭️  Skipping: %s (too large: %.1fKB)", idx + 1, total_files, file_path, file_size / 1024)
                 continue
             
             try:
-                print(f"   [{idx+1}/{total_files}] 📄 Processing: {file_path} ({file_size/1024:.1f}KB)")
+                logger.debug("   [%d/%d] 📄 Processing: %s (%.1fKB)", idx + 1, total_files, file_path, file_size / 1024)
                 start_time = time.time()
                 
                 # STEP 1: Save file to database with timeout
-                print(f"      → [1/3] Saving to DB...", end='', flush=True)
                 save_start = time.time()
                 
                 try:
@@ -318,13 +332,12 @@ class IndexingService:
                         args=(file_info, repo_id, db),
                         timeout_duration=10
                     )
-                    print(f" ✓ ({time.time() - save_start:.2f}s)")
+                    logger.debug("      → [1/3] Saved to DB ✓ (%.2fs)", time.time() - save_start)
                 except TimeoutException:
-                    print(f" ⏰ TIMEOUT after 10s!")
-                    print(f"      ❌ Database operation is hanging. Skipping file.\n")
+                    logger.warning("   [%d/%d] %s: saving to DB ⏰ TIMEOUT after 10s, skipping file", idx + 1, total_files, file_path)
                     continue
                 except Exception as e:
-                    print(f" ❌ FAILED: {str(e)}\n")
+                    logger.warning("   [%d/%d] %s: saving to DB ❌ FAILED: %s", idx + 1, total_files, file_path, e)
                     continue
                 
                 # Create chunks for the file (use ast_chunker if available, otherwise fall back to one chunk)
@@ -338,14 +351,14 @@ class IndexingService:
                     elif callable(ast_chunker):
                         chunks = ast_chunker(file_info['content'], file_info.get('language'), file_info.get('file_path'))
                 except Exception as e:
-                    print(f"      ⚠️  Chunking failed: {e} - falling back to single-chunk")
+                    logger.warning("   [%d/%d] %s: ⚠️  Chunking failed: %s - falling back to single-chunk", idx + 1, total_files, file_path, e)
                     chunks = []
                 
                 # Fallback: single chunk representing the whole file
                 if not chunks:
                     lines = file_info['content'].splitlines()
                     total_lines = len(lines) if lines else 1
-                    content_hash = hashlib.sha256(file_info['content'].encode()).hexdigest()
+                    content_hash = compute_content_hash(file_info['content'])
                     chunks = [{
                         'content': file_info['content'],
                         'chunk_index': 0,
@@ -368,7 +381,6 @@ class IndexingService:
                 # STEP 3: Extract symbols with timeout
                 symbols = []
                 if search_config.EXTRACT_SYMBOLS:
-                    print(f"      → [3/3] Extracting symbols...", end='', flush=True)
                     symbol_start = time.time()
                     
                     try:
@@ -381,13 +393,12 @@ class IndexingService:
                             },
                             timeout_duration=10
                         )
-                        print(f" ✓ {len(symbols)} symbols ({time.time() - symbol_start:.2f}s)")
+                        logger.debug("      → [3/3] Extracted %d symbols ✓ (%.2fs)", len(symbols), time.time() - symbol_start)
                     except TimeoutException:
-                        print(f" ⏰ TIMEOUT after 10s!")
-                        print(f"      ⚠️  Symbol extraction hanging. Skipping symbols.")
+                        logger.warning("   [%d/%d] %s: extracting symbols ⏰ TIMEOUT after 10s, skipping symbols", idx + 1, total_files, file_path)
                         symbols = []
                     except Exception as e:
-                        print(f" ❌ FAILED: {str(e)}")
+                        logger.warning("   [%d/%d] %s: extracting symbols ❌ FAILED: %s", idx + 1, total_files, file_path, e)
                         symbols = []
                     
                     # Add metadata to symbols
@@ -398,7 +409,9 @@ class IndexingService:
                     all_symbols.extend(symbols)
                 
                 elapsed = time.time() - start_time
-                print(f"   ✅ Complete: {len(chunks)} chunks, {len(symbols)} symbols ({elapsed:.2f}s)\n")
+                logger.debug("   ✅ Complete: %d chunks, %d symbols (%.2fs)", len(chunks), len(symbols), elapsed)
+                if (idx + 1) % search_config.PROGRESS_LOG_INTERVAL == 0:
+                    logger.info("   ⚙️  Processed %d/%d files", idx + 1, total_files)
                 
                 # Update progress
                 current_progress = progress_start + (progress_range * (idx + 1) / total_files)
@@ -406,10 +419,7 @@ class IndexingService:
                 db.commit()
                 
             except Exception as e:
-                print(f"   ❌ Unexpected error: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                print()
+                logger.exception("   [%d/%d] %s: ❌ Unexpected error: %s", idx + 1, total_files, file_path, e)
                 continue
         
         return all_chunks, all_symbols
@@ -467,9 +477,9 @@ class IndexingService:
         changed_files = []
         
         for file_info in parsed_files:
-            file_hash = hashlib.sha256(file_info['content'].encode()).hexdigest()
+            file_hash = compute_content_hash(file_info['content'])
             
-            existing_file = db.query(CodeFile).filter(
+            existing_file = db.query(CodeFile).options(undefer(CodeFile.content)).filter(
                 CodeFile.repo_id == repo_id,
                 CodeFile.file_path == file_info['file_path']
             ).first()
@@ -477,7 +487,7 @@ class IndexingService:
             if not existing_file:
                 changed_files.append(file_info)
             else:
-                existing_hash = hashlib.sha256(existing_file.content.encode()).hexdigest()
+                existing_hash = compute_content_hash(existing_file.content)
                 if existing_hash != file_hash:
                     changed_files.append(file_info)
         
@@ -496,21 +506,22 @@ class IndexingService:
         ).delete(synchronize_session=False)
         db.commit()
         
-        # Insert new chunks
-        for chunk in chunks:
-            db_chunk = CodeChunk(
-                repo_id=chunk['repo_id'],
-                file_id=chunk['file_id'],
-                content=chunk['content'],
-                chunk_index=chunk['chunk_index'],
-                start_line=chunk['start_line'],
-                end_line=chunk['end_line'],
-                language=chunk['language'],
-                chunk_type=chunk.get('chunk_type', 'block'),
-                keywords=chunk.get('keywords', []),
-                content_hash=chunk['content_hash']
-            )
-            db.add(db_chunk)
+        # Insert new chunks (single executemany)
+        db.execute(insert(CodeChunk), [
+            {
+                'repo_id': chunk['repo_id'],
+                'file_id': chunk['file_id'],
+                'content': chunk['content'],
+                'chunk_index': chunk['chunk_index'],
+                'start_line': chunk['start_line'],
+                'end_line': chunk['end_line'],
+                'language': chunk['language'],
+                'chunk_type': chunk.get('chunk_type', 'block'),
+                'keywords': chunk.get('keywords', []),
+                'content_hash': chunk['content_hash']
+            }
+            for chunk in chunks
+        ])
         
         db.commit()
     
@@ -527,25 +538,26 @@ class IndexingService:
         ).delete(synchronize_session=False)
         db.commit()
         
-        # Insert new symbols
-        for symbol in symbols:
-            db_symbol = Symbol(
-                repo_id=symbol['repo_id'],
-                file_id=symbol['file_id'],
-                name=symbol['name'],
-                qualified_name=symbol.get('qualified_name'),
-                symbol_type=symbol['symbol_type'],
-                signature=symbol.get('signature'),
-                start_line=symbol['start_line'],
-                end_line=symbol['end_line'],
-                start_column=symbol.get('start_column'),
-                end_column=symbol.get('end_column'),
-                docstring=symbol.get('docstring'),
-                comment=symbol.get('comment'),
-                language=symbol['language'],
-                scope=symbol.get('scope', 'public')
-            )
-            db.add(db_symbol)
+        # Insert new symbols (single executemany)
+        db.execute(insert(Symbol), [
+            {
+                'repo_id': symbol['repo_id'],
+                'file_id': symbol['file_id'],
+                'name': symbol['name'],
+                'qualified_name': symbol.get('qualified_name'),
+                'symbol_type': symbol['symbol_type'],
+                'signature': symbol.get('signature'),
+                'start_line': symbol['start_line'],
+                'end_line': symbol['end_line'],
+                'start_column': symbol.get('start_column'),
+                'end_column': symbol.get('end_column'),
+                'docstring': symbol.get('docstring'),
+                'comment': symbol.get('comment'),
+                'language': symbol['language'],
+                'scope': symbol.get('scope', 'public')
+            }
+            for symbol in symbols
+        ])
         
         db.commit()
     
@@ -562,26 +574,21 @@ class IndexingService:
         
         collection_name = f"repo_{repo_id}_chunks"
         
-        # Delete existing collection
-        try:
-            chroma_client.delete_collection(name=collection_name)
-        except:
-            pass
-        
-        # Create new collection
-        collection = chroma_client.create_collection(
-            name=collection_name,
+        # Replace existing collection (FAISS for very large repos, ChromaDB otherwise)
+        collection = create_vector_store(
+            collection_name,
+            expected_count=len(chunks),
             metadata={"repo_id": str(repo_id)}
         )
         
         # Process in batches
-        batch_size = 50
+        batch_size = search_config.BATCH_SIZE
         total_batches = (len(chunks) + batch_size - 1) // batch_size
         progress_start = 0.8
         progress_end = 0.95
         progress_range = progress_end - progress_start
         
-        print(f"   Processing {len(chunks)} chunks in {total_batches} batches...\n")
+        logger.info("   Processing %d chunks in %d batches...", len(chunks), total_batches)
         
         for batch_idx in range(0, len(chunks), batch_size):
             batch = chunks[batch_idx:batch_idx + batch_size]
@@ -591,11 +598,13 @@ class IndexingService:
                 # Generate embeddings
                 texts = [chunk['content'] for chunk in batch]
                 batch_start = time.time()
-                chunk_embeddings = embeddings.embed_documents(texts)
+                chunk_embeddings = embed_documents_cached(
+                    texts, [chunk['content_hash'] for chunk in batch]
+                )
                 batch_time = time.time() - batch_start
                 
                 # Prepare data
-                ids = [f"chunk_{c['repo_id']}_{c['file_id']}_{c['chunk_index']}" for c in batch]
+                ids = [encode_chunk_id(c['repo_id'], c['file_id'], c['chunk_index']) for c in batch]
                 metadatas = [{
                     'repo_id': c['repo_id'],
                     'file_id': c['file_id'],
@@ -615,13 +624,16 @@ class IndexingService:
                     metadatas=metadatas
                 )
                 
-                # Update vector_id in database
-                for idx, chunk in enumerate(batch):
-                    db.query(CodeChunk).filter(
-                        CodeChunk.repo_id == chunk['repo_id'],
-                        CodeChunk.file_id == chunk['file_id'],
-                        CodeChunk.chunk_index == chunk['chunk_index']
-                    ).update({'vector_id': ids[idx]})
+                # Update vector_id in database (single executemany)
+                db.connection().execute(VECTOR_ID_UPDATE, [
+                    {
+                        'b_repo_id': chunk['repo_id'],
+                        'b_file_id': chunk['file_id'],
+                        'b_chunk_index': chunk['chunk_index'],
+                        'b_vector_id': ids[idx]
+                    }
+                    for idx, chunk in enumerate(batch)
+                ])
                 
                 db.commit()
                 
@@ -630,11 +642,16 @@ class IndexingService:
                 job.progress = current_progress
                 db.commit()
                 
-                print(f"   ✓ Batch {current_batch}/{total_batches}: {batch_time:.2f}s ({batch_time/len(texts):.3f}s/chunk) [{current_progress*100:.0f}%]")
+                logger.info(
+                    "   ✓ Batch %d/%d: %.2fs (%.3fs/chunk) [%.0f%%]",
+                    current_batch, total_batches, batch_time, batch_time / len(texts), current_progress * 100
+                )
                 
             except Exception as e:
-                print(f"   ❌ Batch {current_batch} failed: {str(e)}")
+                logger.error("   ❌ Batch %d failed: %s", current_batch, e)
                 continue
+        
+        persist_vector_store(collection)
     
     def get_job_status(self, job_id: int, db: Session) -> Optional[IndexJob]:
         """Get indexing job status"""
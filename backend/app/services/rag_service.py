@@ -1,15 +1,13 @@
 # backend/app/services/rag_service.py
 import os
-import json
-from typing import Dict, List, Optional, Generator, Tuple
+from typing import Dict, List, Optional, Generator, Tuple, Union
 from functools import lru_cache
-from langchain_community.embeddings import OllamaEmbeddings
 from langchain_community.chat_models import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 from dotenv import load_dotenv
-from app.services.embedding_service import get_collection
+from app.services.embedding_service import embeddings as ollama_embeddings, get_collection
 
 load_dotenv()
 
@@ -20,19 +18,12 @@ OLLAMA_EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
 MAX_CONTEXT_LENGTH = int(os.getenv("MAX_CONTEXT_LENGTH", "4000"))
 MIN_RELEVANCE_SCORE = float(os.getenv("MIN_RELEVANCE_SCORE", "0.1"))
 
-# Cache embeddings model (singleton pattern)
-_embeddings_instance = None
+# Cache LLM (singleton pattern)
 _llm_instance = None
 
 def get_embeddings():
-    """Get or create embeddings instance (singleton)."""
-    global _embeddings_instance
-    if _embeddings_instance is None:
-        _embeddings_instance = OllamaEmbeddings(
-            model=OLLAMA_EMBED_MODEL,
-            base_url=OLLAMA_BASE_URL
-        )
-    return _embeddings_instance
+    """Get the shared Ollama embedding function (see embedding_service)."""
+    return ollama_embeddings
 
 def get_llm(streaming: bool = False):
     """Get or create LLM instance with optional streaming."""
@@ -452,16 +443,19 @@ def query_codebase_stream(
     top_k: int = 5,
     chat_history: List[Dict] = None,
     prompt_style: str = "senior_dev"
-) -> Generator[str, None, None]:
+) -> Generator[Tuple[str, Union[str, List[Dict]]], None, None]:
     """
     Streaming version with enhanced source formatting.
+    
+    Yields ("token", text) tuples while the answer streams, then a single
+    ("sources", [source dicts]) tuple once the answer is complete.
     """
     try:
         # 1. Retrieve chunks
         similar_chunks = search_similar_code(repo_id, query, top_k, rerank=True)
         
         if not similar_chunks:
-            yield "I couldn't find any relevant code in the repository to answer your question."
+            yield "token", "I couldn't find any relevant code in the repository to answer your question."
             return
 
         # 2. Format context
@@ -478,7 +472,7 @@ def query_codebase_stream(
             "chat_history": history_str,
             "question": query
         }):
-            yield chunk
+            yield "token", chunk
 
         # 4. Yield sources as JSON for frontend parsing
         sources = []
@@ -493,11 +487,10 @@ def query_codebase_stream(
                 })
                 seen_files.add(file_path)
         
-        # Signal sources with special marker
-        yield f"\n\n[SOURCES]{json.dumps(sources)}[/SOURCES]"
+        yield "sources", sources
 
     except Exception as e:
-        yield f"\n\n❌ Error: {str(e)}"
+        yield "token", f"\n\n❌ Error: {str(e)}"
 
 # Health check function
 def check_service_health() -> Dict:
@@ -0,0 +1,46 @@
+# backend/app/services/rank_fusion.py
+
+from typing import Hashable, List, Sequence, Tuple
+
+import numpy as np
+
+# Standard RRF damping constant (Cormack et al.)
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: Sequence[Sequence[Hashable]],
+    k: int = RRF_K
+) -> List[Tuple[Hashable, float]]:
+    """
+    Merge several rankings with Reciprocal Rank Fusion:
+    score(key) = sum over lists of 1 / (k + rank), rank starting at 1.
+    Keys are mapped to dense ints once and all contributions are summed
+    with a single np.bincount.
+
+    Args:
+        ranked_lists: Rankings of result keys, best first
+        k: Damping constant; larger values flatten the rank contribution
+
+    Returns:
+        List of (key, score) tuples, best first (ties keep first-seen order)
+    """
+    key_index = {}
+    positions = []
+    for ranked in ranked_lists:
+        positions.append(np.fromiter(
+            (key_index.setdefault(key, len(key_index)) for key in ranked),
+            dtype=np.int64,
+            count=len(ranked)
+        ))
+
+    if not key_index:
+        return []
+
+    ids = np.concatenate(positions)
+    ranks = np.concatenate([np.arange(1, len(p) + 1) for p in positions])
+    scores = np.bincount(ids, weights=1.0 / (k + ranks), minlength=len(key_index))
+
+    keys = list(key_index)
+    order = np.argsort(-scores, kind='stable')
+    return [(keys[idx], float(scores[idx])) for idx in order]
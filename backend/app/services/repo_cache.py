@@ -0,0 +1,226 @@
+# backend/app/services/repo_cache.py
+
+import asyncio
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from cachetools import LRUCache, TTLCache
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+
+from app.database import get_db
+from app.models import IndexJob, Repository
+from app.schemas.search import IndexJobStatus
+
+REPO_CACHE_TTL = 60  # seconds
+READY_REPO_TTL = 10  # seconds
+LATEST_JOB_TTL = 2  # seconds
+FILE_TREE_CACHE_SIZE = 128
+
+_local_path_cache: TTLCache = TTLCache(maxsize=1024, ttl=REPO_CACHE_TTL)
+# Ids of repositories seen with status "completed" (terminal until reingest)
+_ready_repo_cache: TTLCache = TTLCache(maxsize=1024, ttl=READY_REPO_TTL)
+# Latest index job per repository (None when it has none), for status polling
+_latest_job_cache: TTLCache = TTLCache(maxsize=1024, ttl=LATEST_JOB_TTL)
+# Serialized file tree per repository, stamped with the repository's updated_at
+_file_tree_cache: LRUCache = LRUCache(maxsize=FILE_TREE_CACHE_SIZE)
+# Per-repository events set whenever an index job change is committed
+_job_watchers: Dict[int, Dict[asyncio.Event, asyncio.AbstractEventLoop]] = {}
+_cache_lock = threading.Lock()
+
+
+async def get_repo_local_path(repo_id: int, db: AsyncSession) -> Optional[str]:
+    """
+    Get a repository's local clone path, cached for REPO_CACHE_TTL seconds.
+    
+    Args:
+        repo_id: Repository ID
+        db: Async database session
+        
+    Returns:
+        The local path, or None if the repository has no clone
+    """
+    with _cache_lock:
+        if repo_id in _local_path_cache:
+            return _local_path_cache[repo_id]
+    
+    result = await db.execute(select(Repository.local_path).where(Repository.id == repo_id))
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Repository not found")
+    
+    with _cache_lock:
+        _local_path_cache[repo_id] = row.local_path
+    return row.local_path
+
+
+def get_ready_repo(repo_id: int, db: Session = Depends(get_db)) -> int:
+    """
+    FastAPI dependency: ensure a repository exists and finished ingesting.
+    A completed repository is remembered for READY_REPO_TTL seconds so the
+    chat and search hot paths skip the lookup.
+    
+    Args:
+        repo_id: Repository ID (path parameter)
+        db: Database session
+        
+    Returns:
+        The repository ID
+    """
+    with _cache_lock:
+        if repo_id in _ready_repo_cache:
+            return repo_id
+    
+    repo_status = db.query(Repository.status).filter(Repository.id == repo_id).scalar()
+    
+    if repo_status is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Repository with ID {repo_id} not found"
+        )
+    
+    if repo_status != "completed":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Repository is not ready. Current status: {repo_status}"
+        )
+    
+    with _cache_lock:
+        _ready_repo_cache[repo_id] = True
+    return repo_id
+
+
+def invalidate_repo(repo_id: int) -> None:
+    """Drop cached fields for a repository after it is changed or deleted."""
+    with _cache_lock:
+        _local_path_cache.pop(repo_id, None)
+        _ready_repo_cache.pop(repo_id, None)
+        _file_tree_cache.pop(repo_id, None)
+
+
+def get_cached_file_tree(repo_id: int, version: Optional[datetime]) -> Optional[bytes]:
+    """
+    Get a repository's serialized file tree if it was cached for this version.
+    
+    Args:
+        repo_id: Repository ID
+        version: The repository's current updated_at (bumped by every file scan)
+        
+    Returns:
+        The tree as JSON bytes, or None on a miss
+    """
+    with _cache_lock:
+        entry: Optional[Tuple[Optional[datetime], bytes]] = _file_tree_cache.get(repo_id)
+    if entry is None or entry[0] != version:
+        return None
+    return entry[1]
+
+
+def cache_file_tree(repo_id: int, version: Optional[datetime], tree_json: bytes) -> None:
+    """Remember a repository's serialized file tree for its current version."""
+    with _cache_lock:
+        _file_tree_cache[repo_id] = (version, tree_json)
+
+
+async def get_latest_job(repo_id: int, db: AsyncSession) -> Optional[IndexJobStatus]:
+    """
+    Get a repository's most recent index job, cached for LATEST_JOB_TTL
+    seconds. Inserting or updating an IndexJob through the ORM drops the
+    entry, so new jobs and state changes show up immediately.
+    
+    Args:
+        repo_id: Repository ID
+        db: Async database session
+        
+    Returns:
+        Job status snapshot, or None if the repository was never indexed
+    """
+    with _cache_lock:
+        if repo_id in _latest_job_cache:
+            return _latest_job_cache[repo_id]
+    
+    job = (await db.execute(
+        select(IndexJob)
+        .where(IndexJob.repo_id == repo_id)
+        .order_by(IndexJob.created_at.desc())
+        .limit(1)
+    )).scalars().first()
+    
+    snapshot = None
+    if job is not None:
+        snapshot = IndexJobStatus(
+            job_id=job.id,
+            repo_id=job.repo_id,
+            status=job.status,
+            progress=job.progress,
+            files_processed=job.files_processed,
+            chunks_created=job.chunks_created,
+            symbols_extracted=job.symbols_extracted,
+            started_at=job.started_at,
+            completed_at=job.completed_at,
+            error_message=job.error_message
+        )
+    
+    with _cache_lock:
+        _latest_job_cache[repo_id] = snapshot
+    return snapshot
+
+
+def invalidate_latest_job(repo_id: int) -> None:
+    """Drop the cached latest index job for a repository."""
+    with _cache_lock:
+        _latest_job_cache.pop(repo_id, None)
+
+
+def watch_index_jobs(repo_id: int) -> asyncio.Event:
+    """
+    Register for index job changes of a repository. The returned event is
+    set after every committed change; clear it before waiting again.
+    Call unwatch_index_jobs when done.
+    """
+    job_event = asyncio.Event()
+    with _cache_lock:
+        _job_watchers.setdefault(repo_id, {})[job_event] = asyncio.get_running_loop()
+    return job_event
+
+
+def unwatch_index_jobs(repo_id: int, job_event: asyncio.Event) -> None:
+    """Stop delivering index job changes to an event from watch_index_jobs."""
+    with _cache_lock:
+        watchers = _job_watchers.get(repo_id, {})
+        watchers.pop(job_event, None)
+        if not watchers:
+            _job_watchers.pop(repo_id, None)
+
+
+def index_job_changed(repo_id: int) -> None:
+    """Drop the cached latest job and wake everyone watching the repository."""
+    invalidate_latest_job(repo_id)
+    with _cache_lock:
+        watchers = list(_job_watchers.get(repo_id, {}).items())
+    for job_event, loop in watchers:
+        # Commits can happen on worker threads
+        loop.call_soon_threadsafe(job_event.set)
+
+
+@event.listens_for(IndexJob, "after_insert")
+@event.listens_for(IndexJob, "after_update")
+def _index_job_flushed(mapper, connection, target: IndexJob) -> None:
+    invalidate_latest_job(target.repo_id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_job_repos", set()).add(target.repo_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _index_jobs_committed(session: Session) -> None:
+    for repo_id in session.info.pop("changed_job_repos", ()):
+        index_job_changed(repo_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _index_jobs_rolled_back(session: Session) -> None:
+    session.info.pop("changed_job_repos", None)
@@ -0,0 +1,99 @@
+# backend/app/services/search_log.py
+
+import asyncio
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert
+
+from app.database import AsyncSessionLocal
+from app.models import SearchQuery
+
+SEARCH_LOG_MAX_QUEUE = 10_000
+SEARCH_LOG_BATCH_SIZE = 500
+SEARCH_LOG_FLUSH_INTERVAL = 0.1  # seconds
+
+
+class SearchLogWriter:
+    """
+    Writes SearchQuery analytics rows off the request path.
+    Requests enqueue plain dicts; a background task bulk-inserts them
+    every SEARCH_LOG_FLUSH_INTERVAL seconds or SEARCH_LOG_BATCH_SIZE rows,
+    whichever comes first. Logging is best-effort telemetry: when the
+    queue is full the oldest row is dropped.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the flush task on the running event loop."""
+        if self._task is not None and not self._task.done():
+            return
+        self._queue = asyncio.Queue(maxsize=SEARCH_LOG_MAX_QUEUE)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush task and write whatever is still queued."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        pending = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        await self._flush(pending)
+
+    def log(self, row: Dict) -> None:
+        """
+        Queue one search_queries row without waiting for the database.
+
+        Args:
+            row: Column values for SearchQuery
+        """
+        if self._task is None:
+            self.start()
+        if self._queue.full():
+            self._queue.get_nowait()
+        self._queue.put_nowait(row)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        batch: List[Dict] = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = loop.time() + SEARCH_LOG_FLUSH_INTERVAL
+                while len(batch) < SEARCH_LOG_BATCH_SIZE:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                rows, batch = batch, []
+                await self._flush(rows)
+        except asyncio.CancelledError:
+            # Don't lose rows collected when stop() cancelled us mid-batch
+            await self._flush(batch)
+            raise
+
+    async def _flush(self, rows: List[Dict]) -> None:
+        if not rows:
+            return
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.execute(insert(SearchQuery), rows)
+                await session.commit()
+        except Exception as e:
+            print(f"⚠️  Failed to write {len(rows)} search log rows: {e}")
+
+
+# Singleton instance
+search_log = SearchLogWriter()
@@ -51,7 +51,7 @@ def migrate():
     
     with engine.connect() as conn:
         success_count = 0
-        total_steps = 9
+        total_steps = 17
         
         try:
             # ============================================
@@ -161,6 +161,82 @@ def migrate():
             ):
                 success_count += 1
             
+            # Step 10: Composite index for tree lookups by parent directory
+            if execute_migration(
+                conn,
+                "Creating index: idx_repo_parent",
+                "CREATE INDEX IF NOT EXISTS idx_repo_parent ON repository_files(repo_id, parent_path)",
+                "🔟"
+            ):
+                success_count += 1
+            
+            # Step 11: Partial index on in-flight index jobs
+            if execute_migration(
+                conn,
+                "Creating index: idx_active_jobs",
+                "CREATE INDEX IF NOT EXISTS idx_active_jobs ON index_jobs(repo_id) "
+                "WHERE status IN ('pending', 'running')",
+                "1️⃣1️⃣"
+            ):
+                success_count += 1
+            
+            # Step 12: Recent chat history lookups (ORDER BY created_at DESC LIMIT n)
+            if execute_migration(
+                conn,
+                "Creating index: idx_chat_repo_created",
+                "CREATE INDEX IF NOT EXISTS idx_chat_repo_created ON chat_messages(repo_id, created_at DESC)",
+                "1️⃣2️⃣"
+            ):
+                success_count += 1
+            
+            # Step 13: Trigram support for substring symbol search
+            if execute_migration(
+                conn,
+                "Enabling extension: pg_trgm",
+                "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+                "1️⃣3️⃣"
+            ):
+                success_count += 1
+            
+            # Step 14: GIN trigram index so ILIKE '%q%' on symbol names avoids a seq scan
+            if execute_migration(
+                conn,
+                "Creating index: idx_symbols_name_trgm",
+                "CREATE INDEX IF NOT EXISTS idx_symbols_name_trgm ON symbols "
+                "USING gin (name gin_trgm_ops, qualified_name gin_trgm_ops)",
+                "1️⃣4️⃣"
+            ):
+                success_count += 1
+            
+            # Step 15: B-tree index for prefix symbol search (lower(name) LIKE 'q%')
+            if execute_migration(
+                conn,
+                "Creating index: idx_symbols_name_prefix",
+                "CREATE INDEX IF NOT EXISTS idx_symbols_name_prefix ON symbols "
+                "(repo_id, lower(name) text_pattern_ops)",
+                "1️⃣5️⃣"
+            ):
+                success_count += 1
+            
+            # Step 16: Symbol search filtered by language and symbol type
+            if execute_migration(
+                conn,
+                "Creating index: idx_symbols_repo_lang_type",
+                "CREATE INDEX IF NOT EXISTS idx_symbols_repo_lang_type ON symbols(repo_id, language, symbol_type)",
+                "1️⃣6️⃣"
+            ):
+                success_count += 1
+            
+            # Step 17: Covering index so symbol search lists skip heap/TOAST reads
+            if execute_migration(
+                conn,
+                "Creating index: idx_symbols_covering",
+                "CREATE INDEX IF NOT EXISTS idx_symbols_covering ON symbols(repo_id) "
+                "INCLUDE (file_id, name, qualified_name, symbol_type, language, start_line, end_line, scope)",
+                "1️⃣7️⃣"
+            ):
+                success_count += 1
+            
             # ============================================
             # SUMMARY
             # ============================================
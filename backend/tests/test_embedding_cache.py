@@ -0,0 +1,88 @@
+# backend/tests/test_embedding_cache.py
+"""
+Tests for the in-process and on-disk chunk embedding caches.
+"""
+
+import numpy as np
+
+from app.services.embedding_cache import (
+    EmbeddingCache,
+    PersistentEmbeddingCache,
+    QueryEmbeddingCache,
+    content_hash,
+    content_hash_bytes,
+)
+
+
+class TestEmbeddingCache:
+    """Test LRU behaviour of EmbeddingCache"""
+    
+    def test_content_hash_is_64_char_hex(self):
+        """Hash matches the 64-char CodeChunk.content_hash column"""
+        digest = content_hash("def foo(): pass")
+        assert len(digest) == 64
+        assert digest == content_hash("def foo(): pass")
+        assert digest != content_hash("def bar(): pass")
+    
+    def test_content_hash_bytes_matches_str_hash(self):
+        """Hashing pre-encoded bytes gives the same digest"""
+        text = "def héllo(): pass"
+        assert content_hash_bytes(text.encode('utf-8')) == content_hash(text)
+    
+    def test_get_many_returns_only_hits(self):
+        """Only cached keys are returned"""
+        cache = EmbeddingCache(maxsize=10)
+        cache.put_many([("a", [1.0, 2.0]), ("b", [3.0, 4.0])])
+        
+        found = cache.get_many(["a", "c"])
+        
+        assert list(found) == ["a"]
+        assert found["a"].dtype == np.float32
+        assert found["a"].tolist() == [1.0, 2.0]
+    
+    def test_evicts_least_recently_used(self):
+        """Oldest untouched entry is evicted past maxsize"""
+        cache = EmbeddingCache(maxsize=2)
+        cache.put("a", [1.0])
+        cache.put("b", [2.0])
+        cache.get("a")
+        cache.put("c", [3.0])
+        
+        assert len(cache) == 2
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+
+
+class TestQueryEmbeddingCache:
+    """Test the search query embedding cache"""
+    
+    def test_put_then_get_returns_float32(self):
+        """Stored vectors come back as float32 and misses return None"""
+        cache = QueryEmbeddingCache(maxsize=10, ttl=60)
+        cache.put("where is auth", [0.5, 1.5])
+        
+        vector = cache.get("where is auth")
+        
+        assert vector.dtype == np.float32
+        assert vector.tolist() == [0.5, 1.5]
+        assert cache.get("where is routing") is None
+
+
+class TestPersistentEmbeddingCache:
+    """Test the SQLite-backed embedding cache"""
+    
+    def test_vectors_survive_reopen_and_are_per_model(self, tmp_path):
+        """Stored vectors are read back after reopening, scoped by model"""
+        path = str(tmp_path / "emb.sqlite3")
+        cache = PersistentEmbeddingCache(path)
+        cache.put_many([("a", [1.0, 2.0]), ("b", [3.0, 4.0])], "model-x")
+        cache.close()
+        
+        reopened = PersistentEmbeddingCache(path)
+        found = reopened.get_many(["a", "c"], "model-x")
+        
+        assert list(found) == ["a"]
+        assert found["a"].dtype == np.float32
+        assert found["a"].tolist() == [1.0, 2.0]
+        assert reopened.get_many(["a"], "model-y") == {}
+        reopened.close()
@@ -249,6 +249,88 @@ class TestChunkingLogic:
         assert 'def' in identifiers
         assert 'authenticate' in identifiers
         assert 'user' in identifiers
+    
+    def test_chunk_windows_match_line_slices(self):
+        """Window byte ranges cover the same lines as split-and-join"""
+        from app.services.ast_chunker import compute_chunk_windows
+        
+        content = "\n".join(f"línea {i}" for i in range(7))
+        content_bytes = content.encode('utf-8')
+        lines = content.split('\n')
+        
+        windows = compute_chunk_windows(content_bytes, 3, 1)
+        
+        assert [(start, end) for start, end, _, _ in windows] == [(0, 3), (2, 5), (4, 7), (6, 7)]
+        for start, end, start_offset, end_offset in windows:
+            assert content_bytes[start_offset:end_offset].decode('utf-8') == '\n'.join(lines[start:end])
+
+
+class TestSliceLines:
+    """Test line-range slicing used by the file content endpoints"""
+    
+    def test_matches_split_and_join(self):
+        """Same result as splitting on newlines, including non-ASCII text"""
+        from app.services.code_parser import slice_lines
+        
+        text = "a\nbé\n\nd\ne"
+        lines = text.split('\n')
+        
+        for first in range(1, len(lines) + 1):
+            for last in range(first, len(lines) + 1):
+                assert slice_lines(text, first, last) == '\n'.join(lines[first - 1:last])
+        assert slice_lines(text, 3, 2) == ""
+        assert slice_lines(text, 9, 12) == ""
+
+
+class TestSearchSchemas:
+    """Test the search result schemas"""
+    
+    def test_result_item_validates_result_dicts(self):
+        """Plain result dicts (as built by the search endpoint) validate as SearchResultItem"""
+        from pydantic import ValidationError
+        from app.schemas.search import SearchResultItem
+        
+        raw = [{
+            'chunk_id': 'c_1',
+            'file_id': 1,
+            'file_path': 'src/a.py',
+            'snippet': 'def foo(): pass',
+            'highlighted_snippet': 'def <mark>foo</mark>(): pass',
+            'start_line': 1,
+            'end_line': 1,
+            'match_type': ['semantic', 'keyword'],
+            'relevance_score': 0.9,
+            'language': 'python'
+        }]
+        
+        item = SearchResultItem.model_validate(raw[0])
+        
+        assert item.file_path == 'src/a.py'
+        assert item.model_dump(mode='json')['match_type'] == ['semantic', 'keyword']
+        with pytest.raises(ValidationError):
+            SearchResultItem.model_validate({**raw[0], 'match_type': ['fuzzy']})
+    
+    def test_match_type_literal_matches_enum(self):
+        """The Literal used for validation lists exactly the MatchType values"""
+        from typing import get_args
+        from app.schemas.search import MatchType, MatchTypeLiteral
+        
+        assert set(get_args(MatchTypeLiteral)) == {member.value for member in MatchType}
+
+
+class TestRankFusion:
+    """Test Reciprocal Rank Fusion"""
+    
+    def test_rrf_rewards_agreement_across_rankings(self):
+        """Keys ranked well by several lists beat keys found by one"""
+        from app.services.rank_fusion import reciprocal_rank_fusion
+        
+        fused = reciprocal_rank_fusion([['a', 'b', 'c'], ['b', 'a'], ['b']], k=60)
+        
+        assert [key for key, _ in fused] == ['b', 'a', 'c']
+        assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61 + 1 / 61)
+        assert fused[2][1] == pytest.approx(1 / 63)
+        assert reciprocal_rank_fusion([[], []]) == []
 
 
 @pytest.mark.asyncio
@@ -303,4 +385,4 @@ def test_string_operations():
 
 if __name__ == '__main__':
     print("Running fast search tests...")
-    pytest.main([__file__, '-v', '-s'])
\ No newline at end of file
+    pytest.main([__file__, '-v', '-s'])
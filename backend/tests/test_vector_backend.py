@@ -0,0 +1,135 @@
+# backend/tests/test_vector_backend.py
+"""
+Tests for the local vector stores (flat for small repos, FAISS for very large ones)
+and the FAISS query mirror of Chroma collections.
+"""
+
+import pytest
+
+from app.config import vector_backend
+from app.config.vector_backend import ChromaMirror, FaissStore, FlatStore, decode_chunk_id, encode_chunk_id
+
+
+class TestFlatStore:
+    """Test exact search in FlatStore"""
+    
+    @pytest.fixture(autouse=True)
+    def index_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(vector_backend, "FAISS_INDEX_DIR", str(tmp_path))
+    
+    def test_query_returns_exact_nearest(self):
+        """Nearest neighbours come back in distance order"""
+        store = FlatStore("repo_2_chunks")
+        store.add(
+            ids=["a", "b", "c", "d"],
+            embeddings=[[0.0, 0.0], [1.0, 0.0], [5.0, 5.0], [0.0, 3.0]],
+            documents=["doc a", "doc b", "doc c", "doc d"],
+            metadatas=[{"repo_id": 2}] * 4
+        )
+        
+        results = store.query(query_embeddings=[[0.9, 0.0]], n_results=2)
+        
+        assert results["ids"] == [["b", "a"]]
+        assert results["distances"][0] == pytest.approx([0.01, 0.81], abs=1e-5)
+        assert FlatStore.exists("repo_2_chunks")
+        assert not FaissStore.exists("repo_2_chunks")
+
+
+@pytest.mark.skipif(vector_backend.faiss is None, reason="faiss not installed")
+class TestFaissStore:
+    """Test the Chroma-compatible surface of FaissStore"""
+    
+    @pytest.fixture(autouse=True)
+    def index_dir(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(vector_backend, "FAISS_INDEX_DIR", str(tmp_path))
+    
+    def _store(self):
+        store = FaissStore("repo_1_chunks")
+        store.add(
+            ids=["a", "b", "c"],
+            embeddings=[[0.0, 0.0], [1.0, 0.0], [5.0, 5.0]],
+            documents=["doc a", "doc b", "doc c"],
+            metadatas=[
+                {"repo_id": 1, "language": "python"},
+                {"repo_id": 1, "language": "go"},
+                {"repo_id": 1, "language": "python"},
+            ]
+        )
+        return store
+    
+    def test_query_returns_chroma_shaped_results(self):
+        """Nearest ids come back with squared L2 distances"""
+        results = self._store().query(query_embeddings=[[0.9, 0.0]], n_results=2)
+        
+        assert results["ids"] == [["b", "a"]]
+        assert results["documents"][0][0] == "doc b"
+        assert results["distances"][0][0] == pytest.approx(0.01, abs=1e-5)
+    
+    def test_query_applies_where_filter(self):
+        """Metadata equality filter drops non-matching rows"""
+        results = self._store().query(
+            query_embeddings=[[0.9, 0.0]],
+            n_results=2,
+            where={"repo_id": 1, "language": "python"}
+        )
+        
+        assert results["ids"] == [["a", "c"]]
+    
+    def test_persist_and_reload(self):
+        """Persisted index is found and reloaded by name"""
+        store = self._store()
+        store.persist()
+        
+        assert FaissStore.exists("repo_1_chunks")
+        reloaded = FaissStore.load("repo_1_chunks")
+        assert reloaded.count() == 3
+        assert reloaded.get(ids=["c"])["metadatas"] == [{"repo_id": 1, "language": "python"}]
+
+
+@pytest.mark.skipif(vector_backend.faiss is None, reason="faiss not installed")
+class TestChromaMirror:
+    """Test HNSW search over a Chroma collection"""
+    
+    def test_matches_chroma_query(self, monkeypatch):
+        """Mirror pages vectors in and returns the same hits as Chroma"""
+        import chromadb
+        
+        monkeypatch.setattr(vector_backend, "MIRROR_PAGE_SIZE", 2)
+        collection = chromadb.EphemeralClient().get_or_create_collection("test_mirror_chunks")
+        collection.upsert(
+            ids=["a", "b", "c"],
+            embeddings=[[0.0, 0.0], [1.0, 0.0], [5.0, 5.0]],
+            documents=["doc a", "doc b", "doc c"],
+            metadatas=[
+                {"repo_id": 1, "language": "python"},
+                {"repo_id": 1, "language": "go"},
+                {"repo_id": 1, "language": "python"},
+            ]
+        )
+        
+        mirror = ChromaMirror(collection)
+        results = mirror.query(query_embeddings=[[0.9, 0.0]], n_results=2)
+        filtered = mirror.query(query_embeddings=[[0.9, 0.0]], n_results=2, where={"language": "python"})
+        
+        assert mirror.count() == 3
+        assert results["ids"] == collection.query(query_embeddings=[[0.9, 0.0]], n_results=2)["ids"]
+        assert results["documents"][0][0] == "doc b"
+        assert results["distances"][0][0] == pytest.approx(0.01, abs=1e-5)
+        assert filtered["ids"] == [["a", "c"]]
+
+
+class TestChunkIds:
+    """Test packed vector-store chunk ids"""
+    
+    def test_round_trip_and_legacy_format(self):
+        """Packed, oversized and legacy ids all decode to the same triple"""
+        packed = encode_chunk_id(3, 70000, 12)
+        oversized = encode_chunk_id(3, 1 << 24, 12)
+        
+        assert packed.startswith("c_")
+        assert decode_chunk_id(packed) == (3, 70000, 12)
+        assert oversized == "chunk_3_16777216_12"
+        assert decode_chunk_id(oversized) == (3, 1 << 24, 12)
+        assert decode_chunk_id("chunk_1_2_3") == (1, 2, 3)
+        assert decode_chunk_id("chunk_1_x_3") is None
+        assert decode_chunk_id("c_") is None
@@ -165,6 +165,23 @@ export async function getFileContent(
   const response = await fetch(
     `${API_BASE_URL}/repos/${repoId}/files/content?path=${encodeURIComponent(filePath)}`
   );
+  if (response.status === 413) {
+    // Large files are served as plain text from the raw endpoint
+    const raw = await fetch(
+      `${API_BASE_URL}/repos/${repoId}/files/raw?path=${encodeURIComponent(filePath)}`
+    );
+    if (!raw.ok) {
+      throw new Error('Failed to fetch file content');
+    }
+    const content = await raw.text();
+    return {
+      file_path: filePath,
+      content,
+      language: 'plaintext',
+      size_bytes: Number(raw.headers.get('content-length')) || content.length,
+      lines: content.split('\n').length,
+    };
+  }
   if (!response.ok) {
     throw new Error('Failed to fetch file content');
   }